@@ -0,0 +1,207 @@
+"""
+This module contains the background generation of the audio of the lists.
+
+When a list is created or copied, the audio played by the games (its words and their first example)
+is synthesized in the background into the audio cache, so it is not generated during the games.
+    - the audio is synthesized by AUDIO_WORKERS threads at most,
+    - a failed synthesis is retried MAX_ATTEMPTS times, waiting RETRY_DELAY seconds (doubled after each failure),
+      unless the TTS service is unavailable (circuit breaker open),
+    - the status of each list (pending, ready or failed) tells the games if the audio is ready.
+
+Imports:
+    - root: For the environment variables.
+    - metrics: For exposing the counters of the pipeline.
+    - tts_cache: For synthesizing the audio.
+    - http_client: For the errors of the TTS service.
+    - collections: For the status of the lists.
+    - concurrent.futures: For the workers.
+    - threading: For protecting the status of the lists.
+    - json: For reading the examples of the words.
+    - time: For waiting between two attempts.
+    - logging: For logging errors.
+
+Functions:
+    - list_clips: Get the texts of the audio played by the games for a list.
+    - schedule_list: Synthesize the missing audio of a list in the background.
+    - get_status: Get the status of the audio of a list.
+    - get_stats: Get the counters of the pipeline.
+"""
+from root import *
+from metrics import register_metrics
+from tts_cache import get_audio, is_cached
+from http_client import CircuitOpenError, is_available
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import json
+import time
+import logging
+
+# Maximum number of audio synthesized at the same time
+AUDIO_WORKERS = int(os.getenv('AUDIO_WORKERS', 2))
+# Maximum number of attempts to synthesize an audio
+MAX_ATTEMPTS = 3
+# Number of seconds before the second attempt (doubled after each failure)
+RETRY_DELAY = 1
+# Maximum number of lists whose status is kept
+MAX_LISTS = 1000
+# The language of the audio played by the games
+AUDIO_LANG = 'en'
+
+_jobs = OrderedDict()
+_stats = {"lists": 0, "generated": 0, "retries": 0, "failed": 0}
+_lock = threading.Lock()
+_executor = None
+
+
+def list_clips(words):
+    """
+    Get the texts of the audio played by the games for a list (each word and its first example).
+
+    Args:
+        words (list): The words of the list (dict with the word and its examples, as a list or as JSON).
+
+    Returns:
+        list: The texts of the audio, without duplicates.
+    """
+    texts = []
+    for word in words:
+        texts.append(word["word"])
+        examples = word.get("examples")
+        if isinstance(examples, str):
+            examples = json.loads(examples)
+        if examples:
+            texts.append(examples[0])
+    return list(dict.fromkeys(text for text in texts if text))
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=AUDIO_WORKERS, thread_name_prefix='audio')
+        return _executor
+
+
+def _generate(list_id, text):
+    """
+    Synthesize an audio of a list, retrying with an exponential backoff.
+
+    Args:
+        list_id (int): The id of the list.
+        text (string): The text of the audio.
+    """
+    delay = RETRY_DELAY
+    success = False
+    for attempt in range(MAX_ATTEMPTS):
+        try:
+            get_audio(text, AUDIO_LANG)
+            success = True
+            break
+        except CircuitOpenError as e:
+            # The TTS service is unavailable, the audio will be generated at the next game
+            logging.error(f"Error while generating the audio of the list {list_id}: {e}")
+            break
+        except Exception as e:
+            if attempt + 1 < MAX_ATTEMPTS:
+                with _lock:
+                    _stats["retries"] += 1
+                time.sleep(delay)
+                delay *= 2
+            else:
+                logging.error(f"Error while generating the audio of the list {list_id}: {e}")
+
+    with _lock:
+        _stats["generated" if success else "failed"] += 1
+        job = _jobs.get(list_id)
+        if job:
+            job["remaining"] -= 1
+            if not success:
+                job["failed"] += 1
+            if job["remaining"] == 0:
+                job["status"] = "ready" if job["failed"] == 0 else "failed"
+
+
+def schedule_list(list_id, words):
+    """
+    Synthesize the missing audio of a list in the background.
+
+    Args:
+        list_id (int): The id of the list.
+        words (list): The words of the list (dict with the word and its examples, as a list or as JSON).
+
+    Returns:
+        string: The status of the audio of the list (pending, ready, or failed if the TTS service is unavailable).
+    """
+    try:
+        texts = [text for text in list_clips(words) if not is_cached(text, AUDIO_LANG)]
+    except (KeyError, TypeError, ValueError) as e:
+        logging.error(f"Error while reading the words of the list {list_id}: {e}")
+        return "failed"
+
+    # The TTS service is unavailable (circuit breaker open), the audio will be generated at the next game
+    if texts and not is_available("tts"):
+        return "failed"
+
+    with _lock:
+        job = _jobs.get(list_id)
+        if job and job["status"] == "pending":
+            return "pending"
+        _jobs[list_id] = {"status": "pending" if texts else "ready", "remaining": len(texts), "failed": 0}
+        _jobs.move_to_end(list_id)
+        while len(_jobs) > MAX_LISTS:
+            _jobs.popitem(last=False)
+        _stats["lists"] += 1
+    if not texts:
+        return "ready"
+
+    executor = _get_executor()
+    for text in texts:
+        executor.submit(_generate, list_id, text)
+    return "pending"
+
+
+def get_status(list_id, words):
+    """
+    Get the status of the audio of a list.
+
+    The audio of a list is ready if every audio is in the cache (even if it was synthesized by another process).
+    Otherwise, the missing audio is synthesized in the background (lists created before the pipeline,
+    audio deleted from the cache, or failed syntheses).
+
+    Args:
+        list_id (int): The id of the list.
+        words (list): The words of the list (dict with the word and its examples, as a list or as JSON).
+
+    Returns:
+        string: The status of the audio of the list.
+            -> ready: Every audio is in the cache.
+            -> pending: The missing audio is being synthesized.
+            -> failed: The words of the list could not be read, or the TTS service is unavailable.
+    """
+    with _lock:
+        job = _jobs.get(list_id)
+        if job and job["status"] == "pending":
+            return "pending"
+    return schedule_list(list_id, words)
+
+
+def get_stats():
+    """
+    Get the counters of the pipeline since the start of the process.
+
+    Returns:
+        dict: The counters of the pipeline.
+            - lists (int): The number of lists checked or scheduled.
+            - generated (int): The number of audio synthesized.
+            - retries (int): The number of failed attempts that were retried.
+            - failed (int): The number of audio that could not be synthesized.
+            - pending (int): The number of lists whose audio is being synthesized.
+    """
+    with _lock:
+        stats = dict(_stats)
+        stats["pending"] = sum(1 for job in _jobs.values() if job["status"] == "pending")
+    return stats
+
+
+register_metrics("audio_pipeline", get_stats)
@@ -13,7 +13,7 @@ Imports:
     - jwt: For encoding and decoding JSON Web Tokens (JWT).
     - profanity_detector: For detecting profanity in text.
     - root: For the create_connection function.
-    - sendmails: For sending emails to users.
+    - outbox: For sending emails to users in the background.
     - logging: For logging errors and debugging information.
     
 Blueprints:
@@ -33,7 +33,7 @@ import jwt
 
 from profanity import profanity_detector
 from root import *
-from sendmails import send_mail
+from outbox import enqueue_mail, PRIORITY_2FA, PRIORITY_RECOVERY
 import logging
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/auth')
@@ -166,7 +166,8 @@ def login_post():
                             
                             # Send the 2FA code to the user's email
                             html = render_template('emails/2fa.html', name=data[1], code=totp.now())
-                            send_mail(email, "Code de vérification - WORD QUEST", html)
+                            if not enqueue_mail(email, "Code de vérification - WORD QUEST", html, PRIORITY_2FA):
+                                logging.error("The 2FA code email could not be stored in the outbox")
                             return redirect(url_for('auth.sys_2fa'))
                     else:
                         session["from_input"] = [email, password_input]
@@ -328,7 +329,8 @@ def register_post():
                     
                     # Send the 2FA code to the user's email
                     html = render_template('emails/2fa.html', name=name, code=totp.now())
-                    send_mail(email, "Code de vérification - WORD QUEST", html)
+                    if not enqueue_mail(email, "Code de vérification - WORD QUEST", html, PRIORITY_2FA):
+                        logging.error("The 2FA code email could not be stored in the outbox")
                     return redirect(url_for('auth.sys_2fa'))
                 else:
                     return redirect(url_for('auth.sys_2fa'))
@@ -384,7 +386,8 @@ def sys_2fa_sendCodeAgain():
         session["2fa"]["delay"] =  time.time() + 300
 
         html = render_template('emails/2fa.html', name="", code=totp.now())
-        send_mail(session["2fa"]["email"], "Code de vérification - WORD QUEST", html)
+        if not enqueue_mail(session["2fa"]["email"], "Code de vérification - WORD QUEST", html, PRIORITY_2FA):
+            logging.error("The 2FA code email could not be stored in the outbox")
         flash("Nouveau code envoyé")
         return redirect(url_for('auth.sys_2fa'))
     else:
@@ -580,7 +583,8 @@ def pass_recovery_send_link():
             # Otherwise, generate a new password recovery token and send the link to the user's email
             token = jwt.encode({'email': email, 'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=1)}, current_app.config['SECRET_KEY'], algorithm="HS256")
             url = request.host_url + "auth/pass-recovery/reset-password/" + token # Generate the password recovery link
-            send_mail(email, "Récupération de mot de passe - WORD QUEST", render_template('emails/password-recovery.html', url=url)) # Send the password recovery link to the user's email
+            if not enqueue_mail(email, "Récupération de mot de passe - WORD QUEST", render_template('emails/password-recovery.html', url=url), PRIORITY_RECOVERY): # Send the password recovery link to the user's email
+                logging.error("The password recovery link email could not be stored in the outbox")
             flash("Un email de récupération de mot de passe a été envoyé")
             return redirect(url_for('auth.pass_recovery'))
         else:
@@ -0,0 +1,231 @@
+"""
+Benchmark of the parser of the entries of the Collins API.
+
+The benchmark compares the previous parser (about fifteen XPath strings evaluated per sense and a recursive
+text concatenation) with the parser of the collins_parser module (compiled XPath expressions and one walk
+per example), over the entries of benchmarks/fixtures/collins:
+    - the synthetic entries (source "synthetic") are hand-written, following the markup of the entryContent
+      field of the Collins API (homographs, senses, translations, examples and expressions),
+    - the captured entries (source "captured", in benchmarks/fixtures/collins/captured) are real answers
+      of the Collins API, saved with --capture (COLLINS_API_KEY is required).
+It reports the mean time per entry of each parser and the number of entries where their senses differ,
+for each source.
+
+Usage (from the sources directory):
+    python benchmarks/collins_benchmark.py [--repeat 200] [--scale 1]
+    python benchmarks/collins_benchmark.py --capture [english-french:run french-english:temps ...]
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+import time
+
+SOURCES_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SOURCES_DIR)
+
+from lxml import html
+from unidecode import unidecode
+from collins_parser import parse_entry
+
+FIXTURES_DIR = os.path.join(SOURCES_DIR, "benchmarks", "fixtures", "collins")
+CAPTURED_DIR = os.path.join(FIXTURES_DIR, "captured")
+
+# The entries captured by default: words with alternative translations (", ") and citations nested in the examples
+DEFAULT_CAPTURES = [
+    "english-french:run", "english-french:fair", "english-french:light", "english-french:set", "english-french:take",
+    "french-english:temps", "french-english:faire", "french-english:prendre", "french-english:coup"
+]
+
+
+def legacy_parse_entry(content, language, x):
+    """
+    The previous parser (one XPath string per element, recursive text concatenation), kept for the comparison.
+    """
+    def get_text_recursive(element):
+        text = element.text or ""
+        for child in element:
+            text += get_text_recursive(child)
+        return text
+
+    # Parse the response (HTML)
+    dom = html.fromstring(content)
+    # Start html code analysis
+    entries = dom.xpath("//div[@class='hom']")
+    senses = []
+    for entry in entries:
+        for index, sense in enumerate(entry.iterchildren()):
+            # Skip if not an HtmlElement
+            if not isinstance(sense, html.HtmlElement):
+                continue
+
+            # Create the array with basic informations
+            if sense.get("class") == "sense":
+                type = entry.xpath(".//span[@class='pos']/text()")[0]
+                if type == "masculine noun" or type == "feminine noun":
+                    type = "noun"
+                array = {
+                    "type": type,
+                    "word": unidecode(x) if language == "english-french" else "",
+                    "french_translation": x if language == "french-english" else "",
+                    "examples": [],
+                    "french_translation_examples": []
+                }
+                # Retrieve the french translation
+                word = sense.xpath("./span[@class='cit lang_fr']") if language == "english-french" else sense.xpath("./span[@class='cit lang_en-gb']")
+                if word:
+                    word = word[0].xpath("./span[@class='quote']")
+                    
+                    word = ''.join(text for text in word[0].xpath(".//text()[not(parent::*[@class='hi' or @class='lbl'])]"))
+                    word = re.sub(r'[^a-zA-ZÀ-ÿ\s-]', '', word)
+                    if language == "english-french":
+                        array["french_translation"] = word.strip()
+                    else:
+                        array["word"] = unidecode(word.strip())
+                else:
+                    continue
+            else:
+                continue
+
+            # Retrieve the examples
+            for example in sense.iterchildren():
+                # Skip if not an HtmlElement
+                if not isinstance(example, html.HtmlElement):
+                    continue
+                if language == "english-french":
+                    if example.get("id", "").split(".")[0] == f"{x}_1":
+                        # Select all the french elements
+                        french_examples = example.xpath(".//span[@class='cit lang_fr']")
+                        for f in french_examples:
+                            # Check if there is many french examples for one english example
+                            if get_text_recursive(f.getprevious()).encode("utf-8") == b', ':
+                                continue
+                            array["french_translation_examples"].append(get_text_recursive(f))
+
+                        # Explore all the english elements
+                        english1 = example.xpath(".//span[@class='orth']/text()")
+                        if english1:
+                            array["examples"].append(english1[0])
+                        english2 = example.xpath("./span[@class='quote']/text()")
+                        if english2:
+                            array["examples"].append(english2[0])
+                        english3 = example.xpath(".//span[@class='cit']/span[@class='quote']/text()")
+                        for e in english3:
+                            array["examples"].append(e)
+                                           
+            if language == "french-english":
+                for example in sense.xpath(".//span[@class='re']"):
+                    # Select all the english elements
+                    english_examples = example.xpath(".//span[@class='cit lang_en-gb']")
+                    for f in english_examples:
+                        # Check if there is many english examples for one french example
+                        if get_text_recursive(f.getprevious()).encode("utf-8") == b', ':
+                            continue
+                        array["examples"].append(get_text_recursive(f))
+
+                    # Explore all the french elements
+                    french1 = example.xpath(".//span[@class='orth']/text()")
+                    if french1:
+                        array["french_translation_examples"].append(french1[0])
+                    french2 = example.xpath("./span[@class='quote']/text()")
+                    if french2:
+                        array["french_translation_examples"].append(french2[0])
+                    french3 = example.xpath(".//span[@class='cit']/span[@class='quote']/text()")
+                    for e in french3:
+                        array["french_translation_examples"].append(e)
+                    
+
+            senses.append(array)
+
+    return senses
+
+
+def capture(entries):
+    """
+    Save real answers of the Collins API as captured fixtures.
+    """
+    import http_client
+
+    os.makedirs(CAPTURED_DIR, exist_ok=True)
+    headers = {
+        "Accept": "application/json",
+        "accessKey": os.environ.get("COLLINS_API_KEY"),
+    }
+    for entry in entries:
+        direction, word = entry.split(":", 1)
+        url = f"https://api.collinsdictionary.com/api/v1/dictionaries/{direction}/entries/{word}_1"
+        response = http_client.get("collins", url, headers=headers)
+        if response.status_code != 200:
+            print(f"{entry}: HTTP {response.status_code}, skipped")
+            continue
+        fixture = {"direction": direction, "word": word, "source": "captured", "entryContent": response.json()["entryContent"]}
+        path = os.path.join(CAPTURED_DIR, f"{direction}_{word}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(fixture, f, ensure_ascii=False, indent=2)
+        print(f"{entry}: saved in {os.path.relpath(path, SOURCES_DIR)}")
+
+
+def load_fixtures(scale):
+    """
+    Load the entries of the fixtures (each entry repeated scale times, as a longer entry).
+    """
+    fixtures = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, "*.json")) + glob.glob(os.path.join(CAPTURED_DIR, "*.json"))):
+        with open(path, "r", encoding="utf-8") as f:
+            fixture = json.load(f)
+        fixture.setdefault("source", "synthetic")
+        fixture["entryContent"] = fixture["entryContent"] * scale
+        fixtures.append(fixture)
+    return fixtures
+
+
+def measure(parser, fixtures, repeat):
+    """
+    Get the mean time per entry of a parser and its senses (without their ids).
+    """
+    results = []
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [parser(fixture["entryContent"], fixture["direction"], fixture["word"]) for fixture in fixtures]
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    results = [[{key: value for key, value in sense.items() if key != "id"} for sense in senses] for senses in results]
+    return best / len(fixtures), results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of the parser of the entries of the Collins API.")
+    parser.add_argument("--repeat", type=int, default=200, help="Number of runs (the best one is kept)")
+    parser.add_argument("--scale", type=int, default=1, help="Number of times each entry is repeated")
+    parser.add_argument("--capture", nargs="*", metavar="DIRECTION:WORD", help="Save real answers of the Collins API as fixtures")
+    args = parser.parse_args()
+
+    if args.capture is not None:
+        capture(args.capture or DEFAULT_CAPTURES)
+        return
+
+    fixtures = load_fixtures(args.scale)
+    if not fixtures:
+        sys.exit(f"No fixture in {FIXTURES_DIR}")
+
+    legacy_time, legacy_results = measure(legacy_parse_entry, fixtures, args.repeat)
+    parser_time, parser_results = measure(parse_entry, fixtures, args.repeat)
+
+    senses = sum(len(senses) for senses in parser_results)
+    examples = sum(len(sense["examples"]) + len(sense["french_translation_examples"]) for senses in parser_results for sense in senses)
+    print(f"Entries:          {len(fixtures)} ({senses} senses, {examples} examples)")
+    print(f"Previous parser:  {legacy_time * 1e6:.1f} us/entry")
+    print(f"Parser:           {parser_time * 1e6:.1f} us/entry")
+    print(f"Speedup:          {legacy_time / parser_time if parser_time > 0 else 0:.1f}x")
+    for source in ("synthetic", "captured"):
+        pairs = [(a, b) for fixture, a, b in zip(fixtures, legacy_results, parser_results) if fixture["source"] == source]
+        print(f"Different ({source}): {sum(1 for a, b in pairs if a != b)} / {len(pairs)} entries")
+    if not any(fixture["source"] == "captured" for fixture in fixtures):
+        print("No captured entry: run with --capture to compare the parsers on real answers")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Benchmark of the profanity detector.
+
+The benchmark compares the previous detector (file read and one regular expression per censored word
+on every call) with the matcher of the profanity module, over a corpus of list names and descriptions.
+It reports the mean time per call of each detector and the number of texts where they disagree
+(the matcher also normalizes the censored words, so the uppercase and hyphenated ones are now detected).
+
+Usage (from the sources directory):
+    python benchmarks/profanity_benchmark.py [--texts 500] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+SOURCES_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SOURCES_DIR)
+
+import Levenshtein
+
+SAMPLE_WORDS = [
+    "animals", "vocabulary", "english", "french", "lesson", "colors", "numbers", "kitchen", "travel",
+    "holidays", "business", "verbs", "irregular", "weather", "family", "school", "animaux", "couleurs",
+    "vacances", "cuisine", "voyage", "famille", "vocabulaire", "anglais", "semaine", "chapitre",
+    "my", "list", "for", "the", "exam", "de", "la", "les", "mots", "pour", "apprendre"
+]
+
+
+def legacy_profanity_detector(text, path):
+    """
+    The previous detector, kept for the comparison.
+    """
+    with open(path, "r") as f:
+        profanity_words = f.read().splitlines()
+
+    text = text.lower()
+    text = re.sub(r'[^\w\s]', '', text)
+
+    for word in profanity_words:
+        if re.search(r"\b"+word+r"\b", text):
+            return True
+
+    profanity_coef = []
+    for word in text.split(" "):
+        if len(word) > 6:
+            for profanity_word in profanity_words:
+                profanity_coef.append([profanity_word, Levenshtein.ratio(profanity_word, word)])
+
+    profanity_coef = sorted(profanity_coef, key=lambda x: x[1], reverse=True)
+    if profanity_coef:
+        return True if profanity_coef[0][1] > 0.85 else False
+    return False
+
+
+def build_corpus(count, censored_words):
+    """
+    Build a corpus of list names and descriptions, a few of them containing a censored word
+    or a misspelled censored word.
+    """
+    corpus = []
+    long_words = [word for word in censored_words if len(word) >= 7]
+    for i in range(count):
+        words = random.choices(SAMPLE_WORDS, k=random.randint(2, 25))
+        if i % 20 == 0:
+            words.insert(random.randint(0, len(words)), random.choice(censored_words))
+        elif i % 20 == 10:
+            word = random.choice(long_words)
+            position = random.randrange(len(word))
+            words.insert(random.randint(0, len(words)), word[:position] + word[position] + word[position:])
+        corpus.append(" ".join(words).capitalize() + ".")
+    return corpus
+
+
+def measure(detector, corpus, repeat):
+    """
+    Get the mean time per call of a detector and its verdicts.
+    """
+    verdicts = []
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        verdicts = [detector(text) for text in corpus]
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / len(corpus), verdicts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of the profanity detector.")
+    parser.add_argument("--texts", type=int, default=500, help="Number of texts in the corpus")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of runs (the best one is kept)")
+    args = parser.parse_args()
+
+    os.chdir(SOURCES_DIR)
+    os.environ.setdefault("DIRECTORY_PATH", "")
+    import profanity
+
+    random.seed(0)
+    with open(profanity.PROFANITY_FILE, "r") as f:
+        censored_words = [word for word in f.read().splitlines() if word]
+    corpus = build_corpus(args.texts, censored_words)
+
+    legacy_time, legacy_verdicts = measure(lambda text: legacy_profanity_detector(text, profanity.PROFANITY_FILE), corpus, args.repeat)
+    matcher_time, matcher_verdicts = measure(profanity.profanity_detector, corpus, args.repeat)
+
+    print(f"Texts:              {len(corpus)} ({len(censored_words)} censored words)")
+    print(f"Previous detector:  {legacy_time * 1e6:.1f} us/call")
+    print(f"Matcher:            {matcher_time * 1e6:.1f} us/call")
+    print(f"Speedup:            {legacy_time / matcher_time if matcher_time > 0 else 0:.1f}x")
+    print(f"Flagged:            {sum(legacy_verdicts)} -> {sum(matcher_verdicts)} "
+          f"({sum(1 for a, b in zip(legacy_verdicts, matcher_verdicts) if a != b)} different verdicts)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Benchmark of the reminder job.
+
+The benchmark creates N synthetic users (with lists and today's lessons) in a scratch database,
+runs the reminder job against a local SMTP sink and reports:
+    - the throughput in messages per second,
+    - the number of DB queries per message,
+    - the p50 and p95 time to build a message (template rendering and MIME building).
+The synthetic data is deleted at the end. The emails are not spread over a window (REMINDER_WINDOW is forced to 0).
+
+Usage (from the sources directory, with a scratch database created from word_quest.sql):
+    python benchmarks/reminder_benchmark.py --database word_quest_bench --users 1000 [--latency 20] [--workers 4]
+"""
+import argparse
+import os
+import sys
+import time
+import random
+
+SOURCES_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SOURCES_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+BENCH_DOMAIN = "@bench.word-quest.local"
+
+
+class CountingCursor:
+    """
+    A cursor that counts the queries it executes.
+    """
+    def __init__(self, cursor, counter):
+        self._cursor = cursor
+        self._counter = counter
+
+    def execute(self, *args, **kwargs):
+        self._counter["queries"] += 1
+        return self._cursor.execute(*args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        self._counter["queries"] += 1
+        return self._cursor.executemany(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class CountingConnection:
+    """
+    A connection whose cursors count the queries they execute.
+    """
+    def __init__(self, conn, counter):
+        self._conn = conn
+        self._counter = counter
+
+    def cursor(self, *args, **kwargs):
+        return CountingCursor(self._conn.cursor(*args, **kwargs), self._counter)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def percentile(values, pct):
+    """
+    Get a percentile of a list of values.
+    """
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def create_users(root, count):
+    """
+    Create the synthetic users, their lists and today's lessons.
+    """
+    conn = root.create_connection()
+    cursor = conn.cursor()
+    cursor.executemany("INSERT INTO users (name, birthday, email, password, public, picture, activated) VALUES (%s, %s, %s, %s, %s, %s, %s)",
+                       [("bench" + str(i), "2000-01-01", "user" + str(i) + BENCH_DOMAIN, "-", 0, "default.png", 1) for i in range(count)])
+    cursor.execute("SELECT id FROM users WHERE email LIKE %s", ("%" + BENCH_DOMAIN,))
+    users_id = [row[0] for row in cursor.fetchall()]
+    cursor.executemany("INSERT INTO lists (user_id, creator_id, public, title, description, tgt_xp, tgt_games, tgt_time, notif_remind, notif_stats) \
+        VALUES (%s, %s, 0, 'Bench', '', 10, 1, 5, %s, %s)",
+                       [(user_id, user_id, random.randint(0, 1), random.randint(0, 1)) for user_id in users_id])
+    cursor.executemany("INSERT INTO lessons_log (user_id, list_id, lesson_id, xp, lost_lives, time) VALUES (%s, 0, 0, %s, 0, %s)",
+                       [(user_id, random.randint(0, 60), random.randint(30, 600)) for user_id in users_id if random.random() < 0.5])
+    conn.commit()
+    cursor.close()
+    conn.close()
+    return users_id
+
+
+def delete_users(root):
+    """
+    Delete the synthetic users and their data.
+    """
+    conn = root.create_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT id FROM users WHERE email LIKE %s", ("%" + BENCH_DOMAIN,))
+    users_id = [row[0] for row in cursor.fetchall()]
+    if users_id:
+        placeholders = ", ".join(["%s"] * len(users_id))
+        for table in ("lists", "lessons_log", "rewards"):
+            cursor.execute("DELETE FROM " + table + " WHERE user_id IN (" + placeholders + ")", tuple(users_id))
+        cursor.execute("DELETE FROM users WHERE id IN (" + placeholders + ")", tuple(users_id))
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of the reminder job against a local SMTP sink.")
+    parser.add_argument("--database", required=True, help="Scratch database (never the production one)")
+    parser.add_argument("--users", type=int, default=1000, help="Number of synthetic users")
+    parser.add_argument("--latency", type=float, default=0, help="Simulated relay latency per message in milliseconds")
+    parser.add_argument("--workers", type=int, default=4, help="Number of SMTP sessions and send workers")
+    args = parser.parse_args()
+
+    os.chdir(SOURCES_DIR)
+    os.environ["DB_NAME"] = args.database
+    os.environ.setdefault("DIRECTORY_PATH", "")
+    # Send every email at once (no time slot to wait for)
+    os.environ["REMINDER_WINDOW"] = "0"
+
+    import root
+    import mailer
+    import emailing
+    from flask import Flask
+    from smtp_sink import SMTPSink
+
+    app = Flask("benchmark", template_folder=os.path.join(SOURCES_DIR, "templates"))
+
+    # Count the queries of the job
+    counter = {"queries": 0}
+    create_connection = emailing.create_connection
+    emailing.create_connection = lambda: CountingConnection(create_connection(), counter)
+
+    # Time the building of each message
+    build_times = []
+    render_template = emailing.render_template
+    build_mail = emailing.build_mail
+    current = {}
+
+    def timed_render(*render_args, **render_kwargs):
+        current["start"] = time.perf_counter()
+        return render_template(*render_args, **render_kwargs)
+
+    def timed_build(*build_args, **build_kwargs):
+        message = build_mail(*build_args, **build_kwargs)
+        build_times.append(time.perf_counter() - current.pop("start", time.perf_counter()))
+        return message
+
+    emailing.render_template = timed_render
+    emailing.build_mail = timed_build
+
+    elapsed = 0.0
+    with SMTPSink(latency=args.latency / 1000) as sink:
+        mailer.set_transport(mailer.MailTransport(sink.host, sink.port, None, None, starttls=False, max_connections=args.workers))
+        delete_users(root)
+        print(f"Creating {args.users} synthetic users...")
+        create_users(root, args.users)
+        try:
+            conn = root.create_connection()
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM reminder_deliveries WHERE run_id IN (SELECT id FROM reminder_runs WHERE run_date = CURRENT_DATE())")
+            cursor.execute("DELETE FROM reminder_runs WHERE run_date = CURRENT_DATE()")
+            run_id, status = emailing.enqueue_reminder_run(cursor)
+            conn.commit()
+
+            start = time.perf_counter()
+            emailing.process_reminder_run(app, run_id)
+            elapsed = time.perf_counter() - start
+
+            cursor.execute("DELETE FROM reminder_deliveries WHERE run_id = %s", (run_id,))
+            cursor.execute("DELETE FROM reminder_runs WHERE id = %s", (run_id,))
+            conn.commit()
+            cursor.close()
+            conn.close()
+        finally:
+            delete_users(root)
+            mailer.get_transport().close()
+
+    messages = sink.received
+    print(f"Users:                 {args.users}")
+    print(f"Messages sent:         {messages}")
+    print(f"Elapsed:               {elapsed:.2f} s")
+    print(f"Throughput:            {messages / elapsed if elapsed > 0 else 0:.1f} messages/s")
+    print(f"DB queries:            {counter['queries']} ({counter['queries'] / messages if messages else 0:.3f} per message)")
+    print(f"Build time p50 / p95:  {percentile(build_times, 50) * 1000:.2f} ms / {percentile(build_times, 95) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+This module contains a local SMTP server that accepts and discards every email.
+
+It is used to measure the email throughput of the application without sending anything to the real relay.
+It speaks just enough SMTP for smtplib (no STARTTLS, no authentication).
+
+Imports:
+    - socketserver: For the TCP server.
+    - threading: For running the server in the background.
+    - time: For simulating the latency of a relay.
+
+Classes:
+    - SMTPSink: A local SMTP server that discards the emails.
+"""
+import socketserver
+import threading
+import time
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """
+    Handle one SMTP session.
+    """
+    def reply(self, line):
+        self.wfile.write((line + "\r\n").encode())
+
+    def handle(self):
+        sink = self.server.sink
+        self.reply("220 localhost SMTP sink")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors="replace").strip()
+            verb = command.split(" ", 1)[0].upper()
+            if verb == "EHLO":
+                self.wfile.write(b"250-localhost\r\n250-8BITMIME\r\n250 SIZE 52428800\r\n")
+            elif verb in ("HELO", "MAIL", "RCPT", "RSET", "NOOP"):
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                size = 0
+                while True:
+                    data = self.rfile.readline()
+                    if not data or data == b".\r\n":
+                        break
+                    size += len(data)
+                if sink.latency:
+                    time.sleep(sink.latency)
+                with sink.lock:
+                    sink.received += 1
+                    sink.bytes += size
+                self.reply("250 OK: queued")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class _ThreadingServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SMTPSink:
+    """
+    A local SMTP server that discards the emails.
+
+    Attributes:
+        - host: The host of the server.
+        - port: The port of the server (chosen by the system if 0).
+        - latency: The number of seconds waited before accepting each email (to simulate a relay).
+        - received: The number of emails received.
+        - bytes: The number of bytes received.
+
+    Methods:
+        - start: Start the server in a background thread.
+        - stop: Stop the server.
+    """
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.received = 0
+        self.bytes = 0
+        self.lock = threading.Lock()
+        self._server = None
+
+    def start(self):
+        """
+        Start the server in a background thread.
+
+        Returns:
+            SMTPSink: The sink itself.
+        """
+        self._server = _ThreadingServer((self.host, self.port), _SMTPHandler)
+        self._server.sink = self
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, name="smtp-sink", daemon=True).start()
+        return self
+
+    def stop(self):
+        """
+        Stop the server.
+        """
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
@@ -0,0 +1,179 @@
+"""
+This module contains the parser of the entries of the Collins API (used by the search of the create page).
+
+An entry (HTML) is made of homographs (div.hom), each with its part of speech (span.pos) and its senses (div.sense).
+Each sense has a translation (span.cit) and examples:
+    - english-french: the children of the sense identified as examples of the word (id "<word>_1.<n>"),
+    - french-english: the expressions of the sense (span.re).
+The XPath expressions are compiled once, and each example is read in a single walk of its elements.
+
+Imports:
+    - lxml: For parsing the HTML.
+    - unidecode: For removing the accents of the english words.
+    - re: For cleaning the translations.
+
+Functions:
+    - parse_entry: Parse the senses of an entry of the Collins API.
+"""
+from lxml import html, etree
+from unidecode import unidecode
+import re
+
+_HOMOGRAPHS = etree.XPath("//div[@class='hom']")
+_PART_OF_SPEECH = etree.XPath(".//span[@class='pos']/text()")
+_EXPRESSIONS = etree.XPath(".//span[@class='re']")
+# The text of a translation, without its grammatical indications and labels
+_TRANSLATION_TEXT = etree.XPath(".//text()[not(parent::*[@class='hi' or @class='lbl'])]")
+
+# The class of the translations of each dictionary
+_TRANSLATION_CLASS = {
+    "english-french": "cit lang_fr",
+    "french-english": "cit lang_en-gb"
+}
+
+
+def _inner_text(element):
+    """
+    Get the text of an element and of its descendants (without their tails).
+
+    Args:
+        element (lxml.etree._Element): The element.
+
+    Returns:
+        string: The text.
+    """
+    return "".join(descendant.text or "" for descendant in element.iter())
+
+
+def _own_text(element):
+    """
+    Get the text nodes of an element (its text and the tails of its children).
+
+    Args:
+        element (lxml.etree._Element): The element.
+
+    Returns:
+        list: The text nodes.
+    """
+    texts = [element.text] + [child.tail for child in element]
+    return [text for text in texts if text]
+
+
+def _translation(sense, translation_class):
+    """
+    Get the translation of a sense.
+
+    Args:
+        sense (lxml.html.HtmlElement): The sense.
+        translation_class (string): The class of the translations.
+
+    Returns:
+        string: The translation (letters, spaces and hyphens only), or None if the sense has no translation.
+    """
+    for citation in sense.iterchildren("span"):
+        if citation.get("class") == translation_class:
+            for quote in citation.iterchildren("span"):
+                if quote.get("class") == "quote":
+                    return re.sub(r'[^a-zA-ZÀ-ÿ\s-]', '', "".join(_TRANSLATION_TEXT(quote))).strip()
+            return None
+    return None
+
+
+def _read_example(example, translation_class, originals, translations):
+    """
+    Read an example in a single walk of its elements.
+
+    The example gives its translations (except the alternatives following a comma),
+    and the first form, the first quote and the quotes of the citations of the original language.
+
+    Args:
+        example (lxml.html.HtmlElement): The example.
+        translation_class (string): The class of the translations.
+        originals (list): The examples in the language of the searched word (completed).
+        translations (list): The translated examples (completed).
+    """
+    form = None
+    citations = []
+    for element in example.iterdescendants("span"):
+        element_class = element.get("class")
+        if element_class == translation_class:
+            previous = element.getprevious()
+            if previous is None or _inner_text(previous) != ", ":
+                translations.append(_inner_text(element))
+        elif element_class == "orth":
+            if form is None:
+                texts = _own_text(element)
+                if texts:
+                    form = texts[0]
+        elif element_class == "quote":
+            parent = element.getparent()
+            if parent is not example and parent.tag == "span" and parent.get("class") == "cit":
+                citations.extend(_own_text(element))
+
+    if form is not None:
+        originals.append(form)
+    for quote in example.iterchildren("span"):
+        if quote.get("class") == "quote":
+            texts = _own_text(quote)
+            if texts:
+                originals.append(texts[0])
+                break
+    originals.extend(citations)
+
+
+def parse_entry(content, language, x):
+    """
+    Parse the senses of an entry of the Collins API.
+
+    Args:
+        content (string): The HTML content of the entry.
+        language (string): The dictionary of the entry (english-french or french-english).
+        x (string): The searched word.
+
+    Returns:
+        list: The senses of the word (without id).
+            - type (string): The part of speech.
+            - word (string): The english word.
+            - french_translation (string): The french word.
+            - examples (list): The english examples.
+            - french_translation_examples (list): The french examples.
+    """
+    english = language == "english-french"
+    translation_class = _TRANSLATION_CLASS[language]
+    example_id = f"{x}_1"
+
+    senses = []
+    for entry in _HOMOGRAPHS(html.fromstring(content)):
+        part_of_speech = None
+        for sense in entry.iterchildren(etree.Element):
+            if sense.get("class") != "sense":
+                continue
+            translation = _translation(sense, translation_class)
+            if translation is None:
+                continue
+
+            # The part of speech of the homograph
+            if part_of_speech is None:
+                part_of_speech = _PART_OF_SPEECH(entry)
+                part_of_speech = part_of_speech[0] if part_of_speech else ""
+                if part_of_speech == "masculine noun" or part_of_speech == "feminine noun":
+                    part_of_speech = "noun"
+
+            array = {
+                "type": part_of_speech,
+                "word": unidecode(x) if english else unidecode(translation),
+                "french_translation": translation if english else x,
+                "examples": [],
+                "french_translation_examples": []
+            }
+
+            if english:
+                for example in sense.iterchildren():
+                    if isinstance(example, html.HtmlElement) and example.get("id", "").split(".")[0] == example_id:
+                        _read_example(example, translation_class, array["examples"], array["french_translation_examples"])
+            else:
+                for example in _EXPRESSIONS(sense):
+                    _read_example(example, translation_class, array["french_translation_examples"], array["examples"])
+
+            senses.append(array)
+    return senses
@@ -9,25 +9,37 @@ Imports:
     - datetime: For handling dates and times.
     - random: For generating random numbers.
     - logging: For logging errors and other information.
-    - profanity: For detecting the presence of profanity in a text.
+    - profanity: For detecting the presence of profanity in texts.
+    - targets: For updating the user's daily targets.
+    - distractors: For storing the similar words of the words of a list.
+    - audio_pipeline: For generating the audio of a list in the background.
+    - dictionary_cache: For caching the senses of the searched words.
+    - collins_parser: For parsing the entries of the Collins API.
+    - http_client: For calling the Collins API.
     - time: For handling time.
+    - concurrent.futures: For searching the words of a bulk import at the same time.
 
 Blueprint:
     - create_bp: The blueprint for the routes for creating a list.
 """
-from flask import Blueprint, render_template, redirect, url_for, jsonify, request, session, abort
+from flask import Blueprint, render_template, redirect, url_for, jsonify, request, session, abort, Response
 from flask_login import login_user, login_required, logout_user, current_user
-from profanity import profanity_detector
+from profanity import moderate_texts
+from targets import refresh_targets
+from distractors import prepare_distractors, ENGLISH_INDEX, FRENCH_INDEX
+from audio_pipeline import schedule_list
+from dictionary_cache import get_senses
+from collins_parser import parse_entry
+import http_client
 from root import *
 import random as random
-from lxml import html, etree
 import requests
 import uuid
 import re
 import json
 import logging
 import time
-from unidecode import unidecode
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 create_bp = Blueprint('create', __name__)
 """
@@ -42,6 +54,7 @@ Routes:
     - /dashboard/create/empty-word-box: To display the empty word box.
     - /dashboard/create/search/<string:x>: To search a word in the Collins API.
     - /dashboard/create/add/<string:id>: To add a word to the list under creation.
+    - /dashboard/create/bulk-add: To add many words to the list under creation.
     - /dashboard/create/remove/<string:id>: To remove a word from the list under creation.
     - /dashboard/create/word-in-list: To display the word in list.
     - /dashboard/create/create-list: To create a list.
@@ -49,6 +62,13 @@ Routes:
     - /dashboard/list/copy_link/<string:token>: To copy a list from a link.
 """
 
+# Maximum number of words of a bulk import
+MAX_BULK_WORDS = 100
+# Number of words of a bulk import searched at the same time
+BULK_WORKERS = 4
+# The characters allowed in the words of a bulk import
+BULK_WORD_REGEX = re.compile(r"^[a-zA-ZÀ-ÿ' -]{1,50}$")
+
 class WordList:
     """
     This class represents a list of words.
@@ -59,6 +79,9 @@ class WordList:
     
     Methods:
         - add: Add a word to the list.
+        - add_words: Add words to the list (bulk import).
+        - same_word: Check if two words are the same.
+        - contains: Check if a word is in the list.
         - remove: Remove a word from the list.
         - get_all: Get all the words in the list.
         - length: Get the length of the list.
@@ -85,6 +108,45 @@ class WordList:
                 return word
         return None
         
+    def add_words(self, words):
+        """
+        Add words to the list (bulk import).
+
+        Args:
+            words (list): The words to add (senses returned by the search, with their own IDs).
+
+        Returns:
+            list: The added words.
+        """
+        self._list.extend(words)
+        return words
+
+    @staticmethod
+    def same_word(word, other):
+        """
+        Check if two words are the same (same english word and same french translation).
+
+        Args:
+            word (dict): The first word.
+            other (dict): The second word.
+
+        Returns:
+            bool: True if the words are the same.
+        """
+        return word['word'].lower() == other['word'].lower() and word['french_translation'].lower() == other['french_translation'].lower()
+
+    def contains(self, word):
+        """
+        Check if a word is in the list.
+
+        Args:
+            word (dict): The word.
+
+        Returns:
+            bool: True if the same word is in the list.
+        """
+        return any(WordList.same_word(item, word) for item in self._list)
+
     def remove(self, id):
         """
         Remove a word from the list.
@@ -195,6 +257,32 @@ def empty_word_box():
     """
     return render_template('dashboard/content/empty-word-box.html')
 
+def fetch_senses(language, x):
+    """
+    Search a word in the Collins API.
+
+    Args:
+        language (string): The dictionary of the search (english-french or french-english).
+        x (string): The word to search.
+
+    Returns:
+        list: The senses of the word (empty if the word was not found).
+
+    Raises:
+        requests.exceptions.RequestException: If the Collins API did not answer (except if the word was not found).
+    """
+    url = f"https://api.collinsdictionary.com/api/v1/dictionaries/{language}/entries/{x}_1"
+    headers = {
+        "Accept": "application/json",
+        "accessKey": os.environ.get("COLLINS_API_KEY"),
+    }
+    response = http_client.get("collins", url, headers=headers)
+    if response.status_code == 404:
+        return []
+    response.raise_for_status()
+    return parse_entry(response.json()["entryContent"], language, x)
+
+
 @create_bp.route('/dashboard/create/search/<string:language>/<string:x>')
 @login_required
 def search(language, x): 
@@ -210,6 +298,7 @@ def search(language, x):
                 -> 200: Word found.
                 -> 404: Word not found.
                 -> 500: Internal server error.
+                -> 503: The Collins API did not answer or answered with an error (5xx, 401, 429...).
             - title (string): The title of the response.
             - result (list): The list of words if found, otherwise an empty list.
 
@@ -223,117 +312,12 @@ def search(language, x):
         language = "english-french"
         
     
-    # Remove the end spaces
-    x = x.strip()    
-        
-    url = f"https://api.collinsdictionary.com/api/v1/dictionaries/{language}/entries/{x}_1"
-    headers = {
-        "Accept": "application/json",
-        "accessKey": os.environ.get("COLLINS_API_KEY"),
-    }
     if session['list_under_creation'] is None:
         return jsonify({"code": 403, "title": "Access forbidden", "result": []}), 403
 
     try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        resp_json = response.json()
-
-        def get_text_recursive(element):
-            text = element.text or ""
-            for child in element:
-                text += get_text_recursive(child)
-            return text
-
-        # Parse the response (HTML)
-        dom = html.fromstring(resp_json["entryContent"])
-        # Start html code analysis
-        entries = dom.xpath("//div[@class='hom']")
-        senses = []
-        for entry in entries:
-            for index, sense in enumerate(entry.iterchildren()):
-                # Skip if not an HtmlElement
-                if not isinstance(sense, html.HtmlElement):
-                    continue
-
-                # Create the array with basic informations
-                if sense.get("class") == "sense":
-                    type = entry.xpath(".//span[@class='pos']/text()")[0]
-                    if type == "masculine noun" or type == "feminine noun":
-                        type = "noun"
-                    array = {
-                        "id": str(uuid.uuid4()),
-                        "type": type,
-                        "word": unidecode(x) if language == "english-french" else "",
-                        "french_translation": x if language == "french-english" else "",
-                        "examples": [],
-                        "french_translation_examples": []
-                    }
-                    # Retrieve the french translation
-                    word = sense.xpath("./span[@class='cit lang_fr']") if language == "english-french" else sense.xpath("./span[@class='cit lang_en-gb']")
-                    if word:
-                        word = word[0].xpath("./span[@class='quote']")
-                        
-                        word = ''.join(text for text in word[0].xpath(".//text()[not(parent::*[@class='hi' or @class='lbl'])]"))
-                        word = re.sub(r'[^a-zA-ZÀ-ÿ\s-]', '', word)
-                        if language == "english-french":
-                            array["french_translation"] = word.strip()
-                        else:
-                            array["word"] = unidecode(word.strip())
-                    else:
-                        continue
-                else:
-                    continue
-
-                # Retrieve the examples
-                for example in sense.iterchildren():
-                    # Skip if not an HtmlElement
-                    if not isinstance(example, html.HtmlElement):
-                        continue
-                    if language == "english-french":
-                        if example.get("id", "").split(".")[0] == f"{x}_1":
-                            # Select all the french elements
-                            french_examples = example.xpath(".//span[@class='cit lang_fr']")
-                            for f in french_examples:
-                                # Check if there is many french examples for one english example
-                                if get_text_recursive(f.getprevious()).encode("utf-8") == b', ':
-                                    continue
-                                array["french_translation_examples"].append(get_text_recursive(f))
-
-                            # Explore all the english elements
-                            english1 = example.xpath(".//span[@class='orth']/text()")
-                            if english1:
-                                array["examples"].append(english1[0])
-                            english2 = example.xpath("./span[@class='quote']/text()")
-                            if english2:
-                                array["examples"].append(english2[0])
-                            english3 = example.xpath(".//span[@class='cit']/span[@class='quote']/text()")
-                            for e in english3:
-                                array["examples"].append(e)
-                                               
-                if language == "french-english":
-                    for example in sense.xpath(".//span[@class='re']"):
-                        # Select all the english elements
-                        english_examples = example.xpath(".//span[@class='cit lang_en-gb']")
-                        for f in english_examples:
-                            # Check if there is many english examples for one french example
-                            if get_text_recursive(f.getprevious()).encode("utf-8") == b', ':
-                                continue
-                            array["examples"].append(get_text_recursive(f))
-
-                        # Explore all the french elements
-                        french1 = example.xpath(".//span[@class='orth']/text()")
-                        if french1:
-                            array["french_translation_examples"].append(french1[0])
-                        french2 = example.xpath("./span[@class='quote']/text()")
-                        if french2:
-                            array["french_translation_examples"].append(french2[0])
-                        french3 = example.xpath(".//span[@class='cit']/span[@class='quote']/text()")
-                        for e in french3:
-                            array["french_translation_examples"].append(e)
-                        
-
-                senses.append(array)
+        # Search the word (the senses of the popular words are cached)
+        senses = get_senses(language, x, fetch_senses)
 
         # Memorize the last searched words
         wordList = WordList.from_json(session['list_under_creation'])
@@ -344,8 +328,10 @@ def search(language, x):
             return jsonify({"code": 404, "title": "Word not found", "result": []})
         else:
             return jsonify({"code": 200, "title": "Word found", "result": senses})
-    except requests.exceptions.HTTPError as err:
-            return jsonify({"code": 404, "title": "Word not found", "result": []})
+    except requests.exceptions.RequestException as e:
+        # The Collins API did not answer in time or answered with an error (the words not found are not errors)
+        logging.error("Error while searching word: " + str(e))
+        return jsonify({"code": 503, "title": "Service unavailable", "result": []}), 503
     except Exception as e:
         logging.error("Error while searching word: " + str(e), exc_info=True)
         abort(500)
@@ -382,6 +368,107 @@ def add_to_list(id):
 
     return jsonify({"code": 404, "title": "Word not found", "result": []}), 404
 
+@create_bp.route('/dashboard/create/bulk-add', methods=['POST'])
+@login_required
+def bulk_add():
+    """
+    Add many words to the list under creation (pasted list of words).
+
+    The words are searched at the same time (BULK_WORKERS at most, from the cache if possible),
+    and the first sense of each word found is added to the list under creation, in one write of the session.
+    The session is written before the response is sent, so a word reported as added is never lost
+    (even if the client disconnects). As a consequence, there is no progress per word: the statuses arrive
+    only after every word has been resolved, in the order of the request (one JSON object per line).
+
+    Request (JSON):
+        - language (string): The language of the words (en or fr).
+        - words (string or list): The words, separated by new lines, commas or semicolons.
+
+    Returns:
+        flask.Response: One JSON object per line.
+            - word (string): The searched word.
+            - status (string): The status of the word.
+                -> added: Word added.
+                -> not_found: Word not found.
+                -> duplicate: Word already in the list.
+                -> invalid: Invalid characters.
+                -> unavailable: The Collins API did not answer.
+                -> error: Internal error.
+            - result (dict): The added word (only if the status is added).
+        The last line gives the number of added words (status done).
+        dict: The result of the request, if the request is invalid.
+            - code (int): The status code of the response.
+                -> 400: Bad request.
+                -> 403: Access forbidden.
+            - title (string): The title of the response.
+            - message (string): The message of the response.
+    """
+    if session['list_under_creation'] is None:
+        return jsonify({"code": 403, "title": "Access forbidden", "result": []}), 403
+
+    data = request.get_json(silent=True) or {}
+    language = "french-english" if data.get('language') == "fr" else "english-french"
+    words = data.get('words') or []
+    if isinstance(words, str):
+        words = re.split(r'[\n,;]', words)
+    if not isinstance(words, list) or not all(isinstance(word, str) for word in words):
+        return jsonify({"code": 400, "title": "Bad request", "message": "Liste de mots invalide"}), 400
+
+    # Remove the empty words and the duplicates
+    words = list(dict.fromkeys(word for word in (" ".join(word.split()) for word in words) if word))
+    if len(words) == 0:
+        return jsonify({"code": 400, "title": "Bad request", "message": "Aucun mot"}), 400
+    if len(words) > MAX_BULK_WORDS:
+        return jsonify({"code": 400, "title": "Bad request", "message": f"{MAX_BULK_WORDS} mots maximum"}), 400
+
+    wordList = WordList.from_json(session['list_under_creation'])
+    results = {}
+    found = {}
+    with ThreadPoolExecutor(max_workers=BULK_WORKERS) as executor:
+        futures = {}
+        for word in words:
+            if BULK_WORD_REGEX.match(word):
+                futures[executor.submit(get_senses, language, word, fetch_senses)] = word
+            else:
+                results[word] = {"word": word, "status": "invalid"}
+
+        for future in as_completed(futures):
+            word = futures[future]
+            try:
+                senses = future.result()
+            except requests.exceptions.RequestException as e:
+                logging.error("Error while searching word: " + str(e))
+                results[word] = {"word": word, "status": "unavailable"}
+                continue
+            except Exception as e:
+                logging.error("Error while searching word: " + str(e), exc_info=True)
+                results[word] = {"word": word, "status": "error"}
+                continue
+            if not senses:
+                results[word] = {"word": word, "status": "not_found"}
+            else:
+                found[word] = senses[0]
+
+    # Add the words to the list in the order of the request, in one write of the session
+    staged = []
+    for word in words:
+        if word not in found:
+            continue
+        if wordList.contains(found[word]) or any(WordList.same_word(sense, found[word]) for sense in staged):
+            results[word] = {"word": word, "status": "duplicate"}
+        else:
+            staged.append(found[word])
+            results[word] = {"word": word, "status": "added", "result": found[word]}
+    wordList.add_words(staged)
+    session['list_under_creation'] = wordList.to_json()
+
+    def generate():
+        for word in words:
+            yield json.dumps(results[word]) + "\n"
+        yield json.dumps({"status": "done", "added": len(staged), "total": len(words)}) + "\n"
+
+    return Response(generate(), mimetype='application/x-ndjson')
+
 @create_bp.route('/dashboard/create/remove/<string:id>')
 @login_required
 def remove_from_list(id):
@@ -483,7 +570,7 @@ def create_list():
         if len(name) == 0:
             return jsonify({"code": 400, "title": "Bad request", "message": "Nom invalide"})
         
-        if profanity_detector(name) or profanity_detector(desc):
+        if any(moderate_texts([name, desc])):
             return jsonify({"code": 400, "title": "Bad request", "message": "Contenu inapproprié"})
         
         # Check if time, xp and game are valid
@@ -505,11 +592,14 @@ def create_list():
         # Get the list ID
         list_id = cursor.lastrowid
         
-        # Add the words to the list
+        # Add the words to the list, with their similar words (used as wrong answers in the games)
         wordList = WordList.from_json(session['list_under_creation'])
-        for word in wordList.get_all():
-            cursor.execute("INSERT INTO list_content (word, word_type, trans_word, examples, trans_examples, list_id) VALUES (%s, %s, %s, %s, %s, %s)", 
-                            (word['word'], word['type'], word['french_translation'], json.dumps(word['examples']), json.dumps(word['french_translation_examples']), list_id))
+        words = wordList.get_all()
+        distractors = prepare_distractors(ENGLISH_INDEX, [word['word'] for word in words])
+        trans_distractors = prepare_distractors(FRENCH_INDEX, [word['french_translation'] for word in words])
+        cursor.executemany("INSERT INTO list_content (word, word_type, trans_word, examples, trans_examples, distractors, trans_distractors, list_id) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)", 
+                            [(word['word'], word['type'], word['french_translation'], json.dumps(word['examples']), json.dumps(word['french_translation_examples']), similar, trans_similar, list_id)
+                             for word, similar, trans_similar in zip(words, distractors, trans_distractors)])
             
         # Get the user level
         with open(str(os.getenv("DIRECTORY_PATH")) + 'static/games-data.json') as json_file:
@@ -529,7 +619,13 @@ def create_list():
         for key, level in enumerate(data_levels):
             cursor.execute("INSERT INTO lessons (list_id, lesson_id, odr) VALUES (%s, %s, %s)", 
                             (list_id, level["id"], key+1))
+
+        # Update the user's daily targets
+        refresh_targets(cursor, current_user.id)
             
+        # Generate the audio of the list in the background
+        schedule_list(list_id, words)
+        
         return jsonify({"code": 200, "title": "List created"}), 200
     except mysql.connector.Error as e:
         if conn:
@@ -595,11 +691,14 @@ def copy_list(id):
         cursor.execute("SELECT * FROM list_content WHERE list_id = %s", (id,))
         result = cursor.fetchall()
         columns = [i[0] for i in cursor.description]
+        words = [dict(zip(columns, word)) for word in result]
         
-        for word in result:
-            word = dict(zip(columns, word))
-            cursor.execute("INSERT INTO list_content (word, word_type, trans_word, examples, trans_examples, list_id) VALUES (%s, %s, %s, %s, %s, %s)", 
-                            (word['word'], word['word_type'], word['trans_word'], word['examples'], word['trans_examples'], list_id))
+        # The similar words are computed again, in case the dictionaries have changed
+        distractors = prepare_distractors(ENGLISH_INDEX, [word['word'] for word in words])
+        trans_distractors = prepare_distractors(FRENCH_INDEX, [word['trans_word'] for word in words])
+        cursor.executemany("INSERT INTO list_content (word, word_type, trans_word, examples, trans_examples, distractors, trans_distractors, list_id) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)", 
+                            [(word['word'], word['word_type'], word['trans_word'], word['examples'], word['trans_examples'], similar, trans_similar, list_id)
+                             for word, similar, trans_similar in zip(words, distractors, trans_distractors)])
         
         user_level = current_user.lvl
         with open(str(os.getenv("DIRECTORY_PATH")) + 'static/games-data.json') as json_file:
@@ -619,6 +718,12 @@ def copy_list(id):
         for key, level in enumerate(data_levels):
             cursor.execute("INSERT INTO lessons (list_id, lesson_id, odr) VALUES (%s, %s, %s)", 
                             (list_id, level["id"], key+1))
+
+        # Update the user's daily targets
+        refresh_targets(cursor, current_user.id)
+        
+        # Generate the audio of the list in the background
+        schedule_list(list_id, words)
         
         return jsonify({"code": 200, "title": "List copied"}), 200
         
@@ -678,11 +783,14 @@ def copy_list_link(token):
         cursor.execute("SELECT * FROM list_content WHERE list_id = %s", (initial_id,))
         result = cursor.fetchall()
         columns = [i[0] for i in cursor.description]
+        words = [dict(zip(columns, word)) for word in result]
         
-        for word in result:
-            word = dict(zip(columns, word))
-            cursor.execute("INSERT INTO list_content (word, word_type, trans_word, examples, trans_examples, list_id) VALUES (%s, %s, %s, %s, %s, %s)", 
-                            (word['word'], word['word_type'], word['trans_word'], word['examples'], word['trans_examples'], list_id))
+        # The similar words are computed again, in case the dictionaries have changed
+        distractors = prepare_distractors(ENGLISH_INDEX, [word['word'] for word in words])
+        trans_distractors = prepare_distractors(FRENCH_INDEX, [word['trans_word'] for word in words])
+        cursor.executemany("INSERT INTO list_content (word, word_type, trans_word, examples, trans_examples, distractors, trans_distractors, list_id) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)", 
+                            [(word['word'], word['word_type'], word['trans_word'], word['examples'], word['trans_examples'], similar, trans_similar, list_id)
+                             for word, similar, trans_similar in zip(words, distractors, trans_distractors)])
         
         user_level = current_user.lvl
         with open(str(os.getenv("DIRECTORY_PATH")) + 'static/games-data.json') as json_file:
@@ -702,6 +810,12 @@ def copy_list_link(token):
         for key, level in enumerate(data_levels):
             cursor.execute("INSERT INTO lessons (list_id, lesson_id, odr) VALUES (%s, %s, %s)", 
                             (list_id, level["id"], key+1))
+
+        # Update the user's daily targets
+        refresh_targets(cursor, current_user.id)
+        
+        # Generate the audio of the list in the background
+        schedule_list(list_id, words)
         
         return redirect(url_for('main.index', new_list=True))
         
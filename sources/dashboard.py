@@ -4,7 +4,8 @@ This module contains the main routes for the application.
 Imports:
     - flask: For handling requests and responses.
     - flask_login: For handling user sessions.
-    - profanity_detector: For detecting the presence of profanity in a text.
+    - moderate_texts: For detecting the presence of profanity in texts.
+    - targets: For updating the user's daily targets.
     - root: The root module of the application.
     - json: For parsing and generating JSON data.
     - datetime: For handling dates and times.
@@ -18,7 +19,8 @@ Blueprint:
 """
 from flask import Blueprint, render_template, redirect, url_for, jsonify, request, session, abort
 from flask_login import login_user, login_required, logout_user, current_user
-from profanity import profanity_detector
+from profanity import moderate_texts
+from targets import refresh_targets
 from root import *
 import json
 from datetime import datetime, timedelta
@@ -323,7 +325,7 @@ def update(list_id):
         if len(name) == 0:
             return jsonify({"code": 400, "message": "Nom invalide"})
         
-        if profanity_detector(name) or profanity_detector(description):
+        if any(moderate_texts([name, description])):
             return jsonify({"code": 400, "title": "Bad request", "message": "Contenu inapproprié"})
         
         time_normalized = [1, 3, 5]
@@ -337,6 +339,11 @@ def update(list_id):
         conn = create_connection()
         cursor = conn.cursor()
         cursor.execute("UPDATE lists SET title = %s, description = %s, tgt_time = %s, tgt_xp = %s, tgt_games = %s, notif_remind = %s, notif_stats = %s, public = %s WHERE id = %s", (name, description, time, xp, game, reminder, stats, public, list_id))
+        # Update the daily targets of the list's owner
+        cursor.execute("SELECT user_id FROM lists WHERE id = %s", (list_id,))
+        owner = cursor.fetchone()
+        if owner:
+            refresh_targets(cursor, owner[0])
         conn.commit()
     
         return jsonify({"code": 200, "message": "Liste mise à jour avec succès."})
@@ -372,6 +379,7 @@ def delete(list_id):
         cursor.execute("DELETE FROM lists WHERE id = %s", (list_id,))
         cursor.execute("DELETE FROM lessons WHERE list_id = %s", (list_id,))
         cursor.execute("DELETE FROM list_content WHERE list_id = %s", (list_id,))
+        refresh_targets(cursor, current_user.id)
         conn.commit()
         return redirect(url_for('main.index'))
     except Exception as e:
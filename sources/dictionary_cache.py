@@ -0,0 +1,255 @@
+"""
+This module contains the cache of the dictionary searches of the create page (Collins API).
+
+The senses parsed from the answer of the Collins API are kept for each direction and word:
+    - in the process, for the CACHE_SIZE most recently searched words,
+    - in the dictionary_cache table, shared by every process, if DICTIONARY_CACHE_SHARED is set to 1.
+The senses are kept SENSES_TTL days, the words without sense (not found) NEGATIVE_TTL days.
+Each sense gets a new id every time it is returned, because the ids identify the senses of one search.
+If the Collins API does not answer, the expired senses of the word are returned if they are still in the process.
+The hits, the misses and the time of the Collins API saved by the cache are counted.
+
+Imports:
+    - root: For the connection to the database.
+    - metrics: For exposing the counters of the cache.
+    - collections: For the cache of the process.
+    - threading: For protecting the cache.
+    - uuid: For identifying the senses.
+    - json: For storing the senses in the database.
+    - time: For the expiration of the senses and the latency of the Collins API.
+    - logging: For logging errors.
+
+Functions:
+    - normalize_word: Normalize a searched word.
+    - get_senses: Get the senses of a word, from the cache if possible.
+    - get_stats: Get the counters of the cache.
+"""
+from root import *
+from metrics import register_metrics
+from collections import OrderedDict
+import threading
+import uuid
+import json
+import time
+import logging
+
+# Number of days the senses of a word are kept
+SENSES_TTL = 7
+# Number of days a word without sense is kept
+NEGATIVE_TTL = 1
+# Maximum number of words in the cache of the process
+CACHE_SIZE = 5000
+# Share the cache between the processes (dictionary_cache table)
+SHARED = os.getenv('DICTIONARY_CACHE_SHARED', '0') == '1'
+# Number of new words between two cleanings of the dictionary_cache table
+EVICTION_INTERVAL = 100
+
+_cache = OrderedDict()
+_stats = {"hits": 0, "shared_hits": 0, "negative_hits": 0, "stale_hits": 0, "misses": 0, "errors": 0, "saved_seconds": 0.0, "upstream_seconds": 0.0}
+_stored = 0
+_lock = threading.Lock()
+
+
+def normalize_word(word):
+    """
+    Normalize a searched word.
+
+    Args:
+        word (string): The word.
+
+    Returns:
+        string: The normalized word.
+    """
+    return " ".join(word.lower().split())
+
+
+def _identify(senses):
+    """
+    Copy the senses of a word with new ids.
+
+    Args:
+        senses (list): The senses of the word.
+
+    Returns:
+        list: The senses of the word, with new ids.
+    """
+    return [dict(sense, id=str(uuid.uuid4())) for sense in senses]
+
+
+def _remember(key, senses, latency, ttl):
+    """
+    Store the senses of a word in the cache of the process.
+
+    Args:
+        key (tuple): The direction and the normalized word.
+        senses (list): The senses of the word.
+        latency (float): The time the Collins API took to answer, in seconds.
+        ttl (float): The number of seconds the senses are kept.
+    """
+    with _lock:
+        _cache[key] = (time.time() + ttl, senses, latency)
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def _hit(counter, senses, latency):
+    with _lock:
+        _stats[counter] += 1
+        if not senses:
+            _stats["negative_hits"] += 1
+        _stats["saved_seconds"] += latency
+
+
+def _read_shared(key):
+    """
+    Read the senses of a word in the dictionary_cache table.
+
+    Args:
+        key (tuple): The direction and the normalized word.
+
+    Returns:
+        tuple: The senses, the latency of the Collins API and the number of seconds before expiration, or None.
+    """
+    conn = None
+    cursor = None
+    try:
+        conn = create_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT senses, latency, TIMESTAMPDIFF(SECOND, NOW(), expires_at) FROM dictionary_cache WHERE direction = %s AND word = %s AND expires_at > NOW()", key)
+        result = cursor.fetchone()
+        if result:
+            return json.loads(result[0]), result[1], result[2]
+        return None
+    except (mysql.connector.Error, ValueError) as e:
+        logging.error(f"Error while reading the dictionary cache: {e}")
+        with _lock:
+            _stats["errors"] += 1
+        return None
+    finally:
+        if cursor:
+            cursor.close()
+        if conn:
+            conn.close()
+
+
+def _write_shared(key, senses, latency, ttl):
+    """
+    Store the senses of a word in the dictionary_cache table (and delete the expired words from time to time).
+
+    Args:
+        key (tuple): The direction and the normalized word.
+        senses (list): The senses of the word.
+        latency (float): The time the Collins API took to answer, in seconds.
+        ttl (int): The number of days the senses are kept.
+    """
+    global _stored
+    conn = None
+    cursor = None
+    try:
+        conn = create_connection()
+        cursor = conn.cursor()
+        cursor.execute("REPLACE INTO dictionary_cache (direction, word, senses, latency, expires_at) VALUES (%s, %s, %s, %s, NOW() + INTERVAL %s DAY)",
+                       (key[0], key[1], json.dumps(senses), latency, ttl))
+        with _lock:
+            _stored += 1
+            evict = _stored % EVICTION_INTERVAL == 0
+        if evict:
+            cursor.execute("DELETE FROM dictionary_cache WHERE expires_at < NOW()")
+        conn.commit()
+    except mysql.connector.Error as e:
+        logging.error(f"Error while writing the dictionary cache: {e}")
+        with _lock:
+            _stats["errors"] += 1
+    finally:
+        if cursor:
+            cursor.close()
+        if conn:
+            conn.close()
+
+
+def get_senses(direction, word, fetch):
+    """
+    Get the senses of a word, from the cache if possible.
+
+    The errors of the fetch function are not cached, the words without sense are.
+    If the fetch function fails, the expired senses of the word are returned if they are still in the process.
+
+    Args:
+        direction (string): The dictionary of the search (english-french or french-english).
+        word (string): The searched word.
+        fetch (function): The function searching the senses of a normalized word in the Collins API (direction, word).
+
+    Returns:
+        list: The senses of the word, with new ids (empty if the word was not found).
+
+    Raises:
+        Exception: The error of the fetch function, if the word is not in the cache.
+    """
+    key = (direction, normalize_word(word))
+
+    with _lock:
+        entry = _cache.get(key)
+        if entry:
+            _cache.move_to_end(key)
+    if entry and entry[0] > time.time():
+        _hit("hits", entry[1], entry[2])
+        return _identify(entry[1])
+
+    if SHARED:
+        shared = _read_shared(key)
+        if shared:
+            senses, latency, remaining = shared
+            _remember(key, senses, latency, remaining)
+            _hit("shared_hits", senses, latency)
+            return _identify(senses)
+
+    start = time.perf_counter()
+    try:
+        senses = fetch(*key)
+    except Exception:
+        # The Collins API is unavailable, use the expired senses if possible
+        if entry:
+            _hit("stale_hits", entry[1], 0)
+            return _identify(entry[1])
+        raise
+    latency = time.perf_counter() - start
+    with _lock:
+        _stats["misses"] += 1
+        _stats["upstream_seconds"] += latency
+
+    ttl = SENSES_TTL if senses else NEGATIVE_TTL
+    _remember(key, senses, latency, ttl * 24 * 3600)
+    if SHARED:
+        _write_shared(key, senses, latency, ttl)
+    return _identify(senses)
+
+
+def get_stats():
+    """
+    Get the counters of the cache since the start of the process.
+
+    Returns:
+        dict: The counters of the cache.
+            - hits (int): The number of words found in the cache of the process.
+            - shared_hits (int): The number of words found in the dictionary_cache table.
+            - negative_hits (int): The number of words without sense found in the cache.
+            - stale_hits (int): The number of expired words returned because the Collins API was unavailable.
+            - misses (int): The number of words searched in the Collins API.
+            - errors (int): The number of errors of the dictionary_cache table.
+            - saved_seconds (float): The time the Collins API took for the words found in the cache.
+            - upstream_seconds (float): The time spent waiting for the Collins API.
+            - hit_rate (float): The proportion of searches answered by the cache.
+            - size (int): The number of words in the cache of the process.
+    """
+    with _lock:
+        stats = dict(_stats)
+        stats["size"] = len(_cache)
+    total = stats["hits"] + stats["shared_hits"] + stats["stale_hits"] + stats["misses"]
+    stats["hit_rate"] = round((total - stats["misses"]) / total, 3) if total else 0.0
+    stats["saved_seconds"] = round(stats["saved_seconds"], 3)
+    stats["upstream_seconds"] = round(stats["upstream_seconds"], 3)
+    return stats
+
+
+register_metrics("dictionary_cache", get_stats)
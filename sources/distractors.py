@@ -0,0 +1,398 @@
+"""
+This module contains the dictionaries of similar words used as wrong answers (distractors) in the games.
+
+A dictionary is a binary file, read through mmap so that every worker shares the same pages:
+    - a header: the magic number, the version of the format and the number of words,
+    - a table of offsets (one per word, plus the end of the data), sorted by word,
+    - the records: the word (UTF-8), a tab, and its similar words separated by commas.
+The words are sorted by their UTF-8 bytes (the order of the strings), so a word is found
+with a binary search over the table of offsets, and many words with a single sorted pass.
+The words already searched are kept in a LRU cache of the process.
+
+The dictionaries are built from the text files (one "word:similar,similar,..." line per word) with:
+    python distractors.py build -o static/similar_words_levenshtein.idx static/similar_words_levenshtein_1.txt static/similar_words_levenshtein_2.txt
+
+Imports:
+    - root: For the environment variables.
+    - mmap: For mapping the dictionaries in memory.
+    - struct: For reading and writing the header and the table of offsets.
+    - threading: For protecting the opened dictionaries and the cache.
+    - random: For generating the fallback words.
+    - collections: For the cache of the similar words.
+    - argparse: For the command line.
+    - json: For storing the similar words with the lists.
+    - logging: For logging errors.
+
+Classes:
+    - DistractorIndex: A dictionary of similar words mapped in memory.
+
+Functions:
+    - write_index: Write a dictionary of similar words.
+    - build_index: Convert text files of similar words into a dictionary.
+    - get_index: Get an opened dictionary.
+    - fallback_words: Generate words close to a word without similar words.
+    - get_distractors: Get the similar words of many words.
+    - get_similar_words: Get the similar words of a word.
+    - prepare_distractors: Get the similar words of the words of a list, to store them with the list.
+"""
+from root import *
+import mmap
+import struct
+import threading
+import random
+from collections import OrderedDict
+import argparse
+import json
+import logging
+
+# The dictionaries of the english and french words
+ENGLISH_INDEX = str(os.getenv("DIRECTORY_PATH")) + "static/similar_words_levenshtein.idx"
+FRENCH_INDEX = str(os.getenv("DIRECTORY_PATH")) + "static/similar_mots_levenshtein.idx"
+
+# The header of a dictionary: magic number, version, reserved, number of words
+_MAGIC = b"WQDI"
+_VERSION = 1
+_HEADER = struct.Struct("<4sHHI")
+_OFFSET = struct.Struct("<I")
+
+# Maximum number of words kept in the cache of the similar words
+CACHE_SIZE = 10000
+# Number of words generated for a word without similar words
+FALLBACK_COUNT = 3
+# Number of similar words stored with each word of a list
+STORED_DISTRACTORS = 10
+_LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+
+class DistractorIndex:
+    """
+    A dictionary of similar words mapped in memory.
+
+    Attributes:
+        - path: The path to the dictionary.
+        - count: The number of words in the dictionary.
+
+    Methods:
+        - lookup: Get the similar words of a word.
+        - lookup_many: Get the similar words of many words in a single pass.
+        - close: Unmap the dictionary.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, reserved, self.count = _HEADER.unpack_from(self._mm, 0)
+        if magic != _MAGIC or version != _VERSION:
+            self._mm.close()
+            raise ValueError(f"{path} is not a dictionary of similar words (version {_VERSION})")
+        self._table = _HEADER.size
+        self._data = self._table + (self.count + 1) * _OFFSET.size
+
+    def __len__(self):
+        return self.count
+
+    def _record(self, position):
+        """
+        Get the bounds of a record.
+
+        Args:
+            position (int): The position of the word in the table.
+
+        Returns:
+            tuple: The start and the end of the record in the file.
+        """
+        start, = _OFFSET.unpack_from(self._mm, self._table + position * _OFFSET.size)
+        end, = _OFFSET.unpack_from(self._mm, self._table + (position + 1) * _OFFSET.size)
+        return self._data + start, self._data + end
+
+    def _key(self, position):
+        """
+        Get the word of a record.
+
+        Args:
+            position (int): The position of the word in the table.
+
+        Returns:
+            bytes: The word, encoded in UTF-8.
+        """
+        start, end = self._record(position)
+        return self._mm[start:self._mm.find(b"\t", start, end)]
+
+    def _search(self, key, low=0):
+        """
+        Find the position of a word (binary search over the table of offsets).
+
+        Args:
+            key (bytes): The word, encoded in UTF-8.
+            low (int): The position from which the word is searched.
+
+        Returns:
+            int: The position of the first word greater than or equal to the searched word.
+        """
+        high = self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _values(self, position, key):
+        """
+        Get the similar words of a record.
+
+        Args:
+            position (int): The position of the word in the table.
+            key (bytes): The word, encoded in UTF-8.
+
+        Returns:
+            list: The similar words, from the most similar.
+        """
+        start, end = self._record(position)
+        values = self._mm[start + len(key) + 1:end].decode("utf-8")
+        return values.split(",") if values else []
+
+    def lookup(self, word):
+        """
+        Get the similar words of a word.
+
+        Args:
+            word (string): The word to search.
+
+        Returns:
+            list: The similar words, from the most similar, or None if the word is not in the dictionary.
+        """
+        key = word.encode("utf-8")
+        position = self._search(key)
+        if position < self.count and self._key(position) == key:
+            return self._values(position, key)
+        return None
+
+    def lookup_many(self, words):
+        """
+        Get the similar words of many words in a single pass.
+
+        The words are sorted, so each search starts where the previous one ended.
+
+        Args:
+            words (list): The words to search.
+
+        Returns:
+            dict: The similar words of each word found in the dictionary.
+        """
+        result = {}
+        position = 0
+        for key in sorted(set(word.encode("utf-8") for word in words)):
+            position = self._search(key, position)
+            if position >= self.count:
+                break
+            if self._key(position) == key:
+                result[key.decode("utf-8")] = self._values(position, key)
+        return result
+
+    def close(self):
+        """
+        Unmap the dictionary.
+        """
+        self._mm.close()
+
+
+def write_index(path, entries):
+    """
+    Write a dictionary of similar words.
+
+    The file is written next to the destination and then moved, so the processes
+    that have mapped the previous version keep reading it.
+
+    Args:
+        path (string): The path to the dictionary.
+        entries (dict): The similar words (list) of each word.
+
+    Returns:
+        int: The number of words written.
+    """
+    keys = sorted(entries, key=lambda word: word.encode("utf-8"))
+    records = []
+    offsets = [0]
+    for key in keys:
+        record = key.encode("utf-8") + b"\t" + ",".join(entries[key]).encode("utf-8")
+        records.append(record)
+        offsets.append(offsets[-1] + len(record))
+    if offsets[-1] >= 2 ** 32:
+        raise ValueError("The dictionary is too large (4 GB maximum)")
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, _VERSION, 0, len(keys)))
+        f.write(b"".join(_OFFSET.pack(offset) for offset in offsets))
+        f.write(b"".join(records))
+    os.replace(tmp_path, path)
+    return len(keys)
+
+
+def build_index(sources, path):
+    """
+    Convert text files of similar words (one "word:similar,similar,..." line per word) into a dictionary.
+
+    Args:
+        sources (list): The paths to the text files.
+        path (string): The path to the dictionary.
+
+    Returns:
+        int: The number of words written.
+    """
+    entries = {}
+    for source in sources:
+        with open(source, "r", encoding="utf-8") as f:
+            for line in f:
+                word, separator, values = line.rstrip("\r\n").partition(":")
+                if not separator or not word or "\t" in word:
+                    continue
+                entries[word] = [value for value in values.split(",") if value]
+    return write_index(path, entries)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+# The similar words already searched, indexed by (dictionary, word)
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def get_index(path):
+    """
+    Get an opened dictionary (each dictionary is mapped once per process).
+
+    Args:
+        path (string): The path to the dictionary.
+
+    Returns:
+        DistractorIndex: The dictionary.
+    """
+    with _indexes_lock:
+        if path not in _indexes:
+            _indexes[path] = DistractorIndex(path)
+        return _indexes[path]
+
+
+def fallback_words(word, count=FALLBACK_COUNT):
+    """
+    Generate words close to a word without similar words, by changing one of its letters.
+
+    The words only depend on the word, so a word always gets the same distractors.
+
+    Args:
+        word (string): The word.
+        count (int): The number of words to generate.
+
+    Returns:
+        list: The generated words.
+    """
+    if not word:
+        return []
+    generator = random.Random(word)
+    words = []
+    for i in range(count * 10):
+        position = generator.randrange(len(word))
+        candidate = word[:position] + generator.choice(_LETTERS) + word[position + 1:]
+        if candidate != word and candidate not in words:
+            words.append(candidate)
+            if len(words) == count:
+                break
+    return words
+
+
+def get_distractors(path, words, fallback=True):
+    """
+    Get the similar words of many words.
+
+    The words that are not in the cache are searched in the dictionary in a single pass.
+    The returned lists are shared with the cache: they must not be modified.
+
+    Args:
+        path (string): The path to the dictionary (ENGLISH_INDEX or FRENCH_INDEX).
+        words (list): The words to search.
+        fallback (bool): Whether generated words are returned for the words without similar words.
+
+    Returns:
+        dict: The similar words (list, from the most similar) of each word, empty if none is found and fallback is False.
+    """
+    result = {}
+    missing = []
+    with _cache_lock:
+        for word in set(words):
+            similar = _cache.get((path, word))
+            if similar is None:
+                missing.append(word)
+            else:
+                _cache.move_to_end((path, word))
+                result[word] = similar
+
+    if missing:
+        try:
+            found = get_index(path).lookup_many(missing)
+        except (OSError, ValueError) as e:
+            logging.error(f"Error while reading the dictionary {path}: {e}")
+            result.update((word, []) for word in missing)
+        else:
+            with _cache_lock:
+                for word in missing:
+                    result[word] = _cache[(path, word)] = found.get(word, [])
+                while len(_cache) > CACHE_SIZE:
+                    _cache.popitem(last=False)
+
+    if fallback:
+        for word, similar in result.items():
+            if not similar:
+                result[word] = fallback_words(word)
+    return result
+
+
+def get_similar_words(path, word):
+    """
+    Get the similar words of a word.
+
+    Args:
+        path (string): The path to the dictionary (ENGLISH_INDEX or FRENCH_INDEX).
+        word (string): The word to search.
+
+    Returns:
+        list: The similar words, or None if the word is not found or the dictionary is unavailable.
+    """
+    return get_distractors(path, [word], fallback=False)[word] or None
+
+
+def prepare_distractors(path, words, count=STORED_DISTRACTORS):
+    """
+    Get the similar words of the words of a list, to store them with the list.
+
+    Args:
+        path (string): The path to the dictionary (ENGLISH_INDEX or FRENCH_INDEX).
+        words (list): The words of the list.
+        count (int): The maximum number of similar words stored for each word.
+
+    Returns:
+        list: The similar words of each word (JSON string), or None for each word if the dictionary
+        is unavailable (the similar words are then searched during the games).
+    """
+    try:
+        get_index(path)
+    except (OSError, ValueError) as e:
+        logging.error(f"Error while reading the dictionary {path}: {e}")
+        return [None] * len(words)
+    similar_words = get_distractors(path, words, fallback=False)
+    return [json.dumps(similar_words[word][:count]) for word in words]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dictionaries of similar words.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build_parser = subparsers.add_parser("build", help="Convert text files of similar words into a dictionary")
+    build_parser.add_argument("sources", nargs="+", help="The text files (one 'word:similar,similar,...' line per word)")
+    build_parser.add_argument("-o", "--output", required=True, help="The path to the dictionary")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        count = build_index(args.sources, args.output)
+        print(f"{count} words written to {args.output}")
@@ -0,0 +1,256 @@
+"""
+This module contains the builder of the dictionaries of similar words (see distractors.py).
+
+For each word of a word list, the builder finds its nearest words by edit distance and writes
+the dictionary directly. The words are not compared two by two: the words are indexed by their
+deletion variants (the word with up to `depth` letters removed), and only the words sharing a variant
+are compared. Two words sharing a variant have the same length give or take `depth` letters, and every
+pair of words at distance `depth` or less shares one.
+Most words (the long ones) have fewer than `neighbours` words that close, so the search is widened:
+    - the variants of the word with WIDEN_DEPTH more letters removed are looked up in the same index,
+    - if the word still has too few candidates, it is compared with every word of the nearby lengths
+      (its length first, then one letter more or less...), until no unscanned word can be closer than
+      its `neighbours` nearest ones (the edit distance is at least the difference of length).
+The similar words of the words found in the index are the nearest among the candidates (all the words at distance
+`depth` or less, and some farther words), the similar words of the scanned words are their exact nearest words.
+The comparisons are spread over a pool of processes.
+
+Usage:
+    python distractors_builder.py words.txt -o static/similar_words_levenshtein.idx [--neighbours 10] [--depth 1] [--workers 4]
+
+Imports:
+    - distractors: For writing the dictionary.
+    - Levenshtein: For computing the edit distances.
+    - rapidfuzz: For comparing a word with every word of a length.
+    - concurrent.futures: For the pool of processes.
+    - argparse: For the command line.
+    - time: For reporting the runtime.
+    - os: For the number of cores.
+
+Functions:
+    - read_words: Read a word list.
+    - deletions: Get the deletion variants of a word.
+    - build_deletion_index: Index the words by their deletion variants.
+    - scan_lengths: Find the nearest words of a word among the words of the nearby lengths.
+    - find_neighbours: Find the nearest words of a range of words.
+    - build_neighbours: Find the nearest words of every word of a word list.
+"""
+from distractors import write_index
+import Levenshtein
+from rapidfuzz import process
+from rapidfuzz.distance import Levenshtein as rapid_levenshtein
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import time
+import os
+
+# Number of similar words kept for each word
+NEIGHBOURS = 10
+# Number of letters removed from the words to index them
+DEPTH = 1
+# Number of letters removed in addition from the words without enough candidates
+WIDEN_DEPTH = 2
+# Number of words processed by a worker at once
+CHUNK_SIZE = 2000
+
+# The words, the deletion index and the words of each length of a worker
+_words = None
+_index = None
+_lengths = None
+
+
+def read_words(path):
+    """
+    Read a word list (one word per line, or one "word:..." line per word).
+
+    Args:
+        path (string): The path to the word list.
+
+    Returns:
+        list: The distinct words, sorted.
+    """
+    words = set()
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            word = line.rstrip("\r\n").split(":", 1)[0].strip()
+            if word and "\t" not in word and "," not in word:
+                words.add(word)
+    return sorted(words)
+
+
+def deletions(word, depth):
+    """
+    Get the deletion variants of a word.
+
+    Args:
+        word (string): The word.
+        depth (int): The maximum number of letters removed.
+
+    Returns:
+        set: The word and the words obtained by removing up to `depth` letters.
+    """
+    variants = {word}
+    current = {word}
+    for _ in range(depth):
+        current = {variant[:i] + variant[i + 1:] for variant in current for i in range(len(variant))}
+        variants |= current
+    return variants
+
+
+def build_deletion_index(words, depth):
+    """
+    Index the words by their deletion variants.
+
+    Args:
+        words (list): The words.
+        depth (int): The maximum number of letters removed.
+
+    Returns:
+        dict: The positions of the words sharing each variant.
+    """
+    index = {}
+    for position, word in enumerate(words):
+        for variant in deletions(word, depth):
+            index.setdefault(variant, []).append(position)
+    return index
+
+
+def _init_worker(words, index):
+    """
+    Store the words, the deletion index and the words of each length in a worker.
+    """
+    global _words, _index, _lengths
+    _words = words
+    _index = index
+    _lengths = {}
+    for word in words:
+        _lengths.setdefault(len(word), []).append(word)
+
+
+def _candidates(word, depth):
+    """
+    Get the words sharing a deletion variant of a word.
+    """
+    candidates = set()
+    for variant in deletions(word, depth):
+        candidates.update(_index.get(variant, ()))
+    return {_words[candidate] for candidate in candidates}
+
+
+def scan_lengths(word, neighbours):
+    """
+    Find the nearest words of a word among the words of the nearby lengths.
+
+    The words of the length of the word are compared first, then the words with one letter more or less, and so on,
+    until the `neighbours` nearest words found are closer than the difference of length of the next words.
+
+    Args:
+        word (string): The word.
+        neighbours (int): The number of similar words kept.
+
+    Returns:
+        set: The nearest words found (at least `neighbours` if the word list is long enough).
+    """
+    found = {}
+    longest = max(_lengths)
+    for difference in range(longest + 1):
+        distances = sorted(found.values())
+        if len(distances) >= neighbours and distances[neighbours - 1] <= difference:
+            break
+        for length in {len(word) - difference, len(word) + difference}:
+            for other, distance, _ in process.extract(word, _lengths.get(length, ()), scorer=rapid_levenshtein.distance, limit=neighbours + 1):
+                if other != word:
+                    found[other] = distance
+    return set(found)
+
+
+def find_neighbours(start, end, neighbours, depth):
+    """
+    Find the nearest words of a range of words.
+
+    The candidates are the words sharing a deletion variant of the word; the search is widened
+    (WIDEN_DEPTH, then scan_lengths) for the words with fewer than `neighbours` candidates.
+    The candidates are sorted by edit distance, then by Levenshtein ratio, then alphabetically.
+
+    Args:
+        start (int): The position of the first word.
+        end (int): The position after the last word.
+        neighbours (int): The number of similar words kept for each word.
+        depth (int): The maximum number of letters removed.
+
+    Returns:
+        list: The word, its similar words and the pass that found them (index, widened or scanned), for each word of the range.
+    """
+    result = []
+    for position in range(start, end):
+        word = _words[position]
+        found_by = "index"
+        candidates = _candidates(word, depth) - {word}
+        if len(candidates) < neighbours:
+            found_by = "widened"
+            candidates = _candidates(word, depth + WIDEN_DEPTH) - {word}
+        if len(candidates) < neighbours:
+            found_by = "scanned"
+            candidates = scan_lengths(word, neighbours)
+        scored = [(Levenshtein.distance(word, other), -Levenshtein.ratio(word, other), other) for other in candidates]
+        scored.sort()
+        result.append((word, [other for distance, ratio, other in scored[:neighbours]], found_by))
+    return result
+
+
+def build_neighbours(words, neighbours=NEIGHBOURS, depth=DEPTH, workers=None, chunk_size=CHUNK_SIZE, stats=None):
+    """
+    Find the nearest words of every word of a word list.
+
+    Args:
+        words (list): The words.
+        neighbours (int): The number of similar words kept for each word.
+        depth (int): The maximum number of letters removed to index the words.
+        workers (int): The number of processes (the number of cores by default).
+        chunk_size (int): The number of words processed by a worker at once.
+        stats (dict): If given, filled with the number of words found by each pass (index, widened, scanned).
+
+    Returns:
+        dict: The similar words (list) of each word.
+    """
+    index = build_deletion_index(words, depth)
+    entries = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(words, index)) as executor:
+        futures = [executor.submit(find_neighbours, start, min(start + chunk_size, len(words)), neighbours, depth)
+                   for start in range(0, len(words), chunk_size)]
+        for future in futures:
+            for word, similar, found_by in future.result():
+                entries[word] = similar
+                if stats is not None:
+                    stats[found_by] = stats.get(found_by, 0) + 1
+    return entries
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build a dictionary of similar words from a word list.")
+    parser.add_argument("words", help="The word list (one word per line)")
+    parser.add_argument("-o", "--output", required=True, help="The path to the dictionary")
+    parser.add_argument("--neighbours", type=int, default=NEIGHBOURS, help="Number of similar words kept for each word")
+    parser.add_argument("--depth", type=int, default=DEPTH, help="Number of letters removed from the words to index them")
+    parser.add_argument("--workers", type=int, default=None, help="Number of processes (number of cores by default)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    words = read_words(args.words)
+    read_time = time.perf_counter() - start
+
+    stats = {}
+    entries = build_neighbours(words, args.neighbours, args.depth, args.workers, stats=stats)
+    build_time = time.perf_counter() - start - read_time
+
+    write_index(args.output, entries)
+    total_time = time.perf_counter() - start
+
+    short = sum(1 for similar in entries.values() if len(similar) < args.neighbours)
+    print(f"Words:              {len(words)} ({short} with fewer than {args.neighbours} similar words)")
+    print(f"Found by:           index {stats.get('index', 0)}, widened {stats.get('widened', 0)}, scanned {stats.get('scanned', 0)}")
+    print(f"Workers:            {args.workers or os.cpu_count()}")
+    print(f"Reading:            {read_time:.2f} s")
+    print(f"Neighbours:         {build_time:.2f} s ({len(words) / build_time if build_time > 0 else 0:.0f} words/s)")
+    print(f"Total:              {total_time:.2f} s")
+    print(f"Dictionary:         {args.output}")
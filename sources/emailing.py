@@ -1,78 +1,72 @@
 """ 
 This module is used to handle the emailing service.
 Each day, at 6:00 PM, Google Cloud Scheduler triggers a POST request to the /api/automatisations/reminder route.
+The request only enqueues the run of the day: the emails are sent in the background, chunk by chunk.
 
 Imports:
-    - smtplib: SMTP protocol client.
     - flask: For handling HTTP requests.
     - flask_wtf.csrf: CSRF protection for the application.
     - email.mime.text: MIMEText class for creating email messages.
     - email.mime.multipart: MIMEMultipart class for creating email messages.
-    - email.mime.image: MIMEImage class for creating email messages.
     - os: Provides a way of using operating system dependent functionality.
     - random: Implements pseudo-random number generators for various distributions.
     - logging: Provides a flexible event logging system for applications.
     - functools: Provides tools for working with functions and other callable objects.
     - jwt: JSON Web Token implementation for Python.
+    - threading: For running the reminder job in the background.
+    - time: For waiting for the time slots of the reminder job.
+    - uuid: For identifying the worker of a reminder run.
     - root: Custom module for handling database connections. 
+    - mailer: The mail transport of the application.
+    - mail_assets: The cache of the images attached to the emails.
+    - metrics: For checking the token of the requests and exposing the counters of the mail transport.
 
 Functions:
-    - token_required: Decorator function to check if the request has a valid token.
+    - build_mail: Build an email.
     - send_mail: Send an email to the recipient.
-    - get_user_data: Get the user's data from the database.
+    - get_ranking: Get the rank of every user in the leaderboard.
+    - get_users_chunk: Get the next chunk of users who enabled the notifications.
+    - get_users_data: Get the data of a chunk of users from the database.
+    - enqueue_reminder_run: Enqueue the reminder run of the day.
+    - claim_reminder_run: Claim a reminder run for the current worker.
+    - keep_claim: Update the heartbeat of a reminder run, if the worker still owns it.
+    - claim_delivery: Claim the delivery of a reminder email to a user.
+    - wait_for_slot: Wait for the beginning of a time slot of a reminder run.
+    - process_reminder_run: Send the reminder emails of a run, chunk by chunk.
+    - get_reminder_status: Get the progress of a reminder run.
 """
-import smtplib
-from flask import Blueprint, render_template, redirect, url_for, jsonify, request, session, abort
+from flask import Blueprint, render_template, redirect, url_for, jsonify, request, session, abort, current_app
 from flask_wtf.csrf import CSRFProtect
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from email.mime.image import MIMEImage
 import os
 from root import *
 import random
 import logging
 from functools import wraps
 import jwt
-
-def token_required(f):
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        """
-        Decorator function to check if the request has a valid token.
-
-        Returns:
-            dict: The response object.
-                - code (int): The status code of the response.
-                    -> 401: Unauthorized.
-                - message (string): The message of the response.
-            function: The decorated function.
-        """
-        token = None
-        # Check if the token is in the request headers
-        if 'x-access-token' in request.headers:
-            token = request.headers['x-access-token'] 
-        if not token:
-            return jsonify({"code": 401, "message": "Unauthorized"}), 401
-        # Check if the token is valid
-        if token != os.environ.get('EMAILING_SERVICE_TOKEN'):
-            return jsonify({"code": 401, "message": "Unauthorized"}), 401
-        return f(*args, **kwargs)
-    return decorated
+import threading
+import time
+import uuid
+from mailer import get_transport, TokenBucket
+from mail_assets import get_image, preload
+from metrics import token_required, register_metrics
 
 emailing_bp = Blueprint('emailing', __name__)
 """ 
 The emailing_bp Blueprint object for handling the emailing service.
 
 Routes: 
-    - /api/automatisations/reminder: Send a reminder email to the users.
+    - /api/automatisations/reminder: Start the reminder job of the day.
+    - /api/automatisations/reminder/status: Get the progress of the reminder job.
     
 Attributes:
     - emailing_bp: Blueprint object for handling the emailing service.
 """
 
-def send_mail(to, subject, body, main_img, notif_remind, notif_stats):
+def build_mail(to, subject, body, main_img, notif_remind, notif_stats):
     """
-    Send an email.
+    Build an email.
 
     Args:
         to (string): The recipient's email address.
@@ -83,7 +77,7 @@ def send_mail(to, subject, body, main_img, notif_remind, notif_stats):
         notif_stats (bool): True if the statistics notification is enabled, False otherwise.
 
     Returns:
-        bool: True if the email was sent successfully, False otherwise.
+        email.mime.multipart.MIMEMultipart: The email message.
     """
     
     # Create the email message
@@ -95,58 +89,154 @@ def send_mail(to, subject, body, main_img, notif_remind, notif_stats):
     # Attach the body to the message
     mess.attach(MIMEText(body, 'html'))
     
-    with open(str(os.getenv("DIRECTORY_PATH")) + 'static/imgs/app-main-logo.png', 'rb') as fp:
-        img = MIMEImage(fp.read())
-        img.add_header('Content-ID', '<{}>'.format('app-main-logo'))
-        mess.attach(img)
-        
-    with open(main_img, 'rb') as fp:
-        img = MIMEImage(fp.read())
-        img.add_header('Content-ID', '<{}>'.format('main-picture'))
-        mess.attach(img)
+    # Attach the images (read and encoded once for all the emails)
+    mess.attach(get_image(str(os.getenv("DIRECTORY_PATH")) + 'static/imgs/app-main-logo.png', 'app-main-logo'))
+    mess.attach(get_image(main_img, 'main-picture'))
         
     if notif_remind:
-        with open(str(os.getenv("DIRECTORY_PATH")) + 'static/imgs/opened-chest.png', 'rb') as fp:
-            img = MIMEImage(fp.read())
-            img.add_header('Content-ID', '<{}>'.format('chest-illustration'))
-            mess.attach(img)
+        mess.attach(get_image(str(os.getenv("DIRECTORY_PATH")) + 'static/imgs/opened-chest.png', 'chest-illustration'))
     
     if notif_stats:
-        with open(str(os.getenv("DIRECTORY_PATH")) + 'static/imgs/3d-three-yelow-lightnings.png', 'rb') as fp:
-            img = MIMEImage(fp.read())
-            img.add_header('Content-ID', '<{}>'.format('lightnings-illustration'))
-            mess.attach(img)
-            
-        with open(str(os.getenv("DIRECTORY_PATH")) + 'static/imgs/3d-red-clock.png', 'rb') as fp:
-            img = MIMEImage(fp.read())
-            img.add_header('Content-ID', '<{}>'.format('red-clock-illustration'))
-            mess.attach(img)
+        mess.attach(get_image(str(os.getenv("DIRECTORY_PATH")) + 'static/imgs/3d-three-yelow-lightnings.png', 'lightnings-illustration'))
+        mess.attach(get_image(str(os.getenv("DIRECTORY_PATH")) + 'static/imgs/3d-red-clock.png', 'red-clock-illustration'))
+    
+    return mess
+
 
-    server = None
+def send_mail(to, subject, body, main_img, notif_remind, notif_stats):
+    """
+    Send an email.
+
+    Args:
+        to (string): The recipient's email address.
+        subject (string): The subject of the email.
+        body (string): The body of the email.
+        main_img (string): The path to the main image of the email.
+        notif_remind (bool): True if the reminder notification is enabled, False otherwise.
+        notif_stats (bool): True if the statistics notification is enabled, False otherwise.
+
+    Returns:
+        bool: True if the email was sent successfully, False otherwise.
+    """
     try:
-        # Send the email
-        server = smtplib.SMTP('smtp.ionos.fr', 587)
-        server.starttls()
-        server.login('no-reply@word-quest.com', os.environ.get('EMAILING_SERVICE_PASSWORD'))
-        server.sendmail(mess['From'], mess['To'], mess.as_string())
-        return True    
+        mess = build_mail(to, subject, body, main_img, notif_remind, notif_stats)
     except Exception as e:
         logging.error(e)
         return False
-    finally:
-        if server:
-            server.quit()
+    return get_transport().send(mess)
+
+
+# Number of users processed at once by the reminder job (one checkpoint per chunk)
+REMINDER_CHUNK_SIZE = 500
+# Number of minutes without progress after which a running reminder run is considered stalled
+REMINDER_STALL_TIMEOUT = 5
+# Maximum number of reminder emails sent between two heartbeats of the run
+REMINDER_SEND_BATCH = 50
+# Maximum number of reminder emails sent per second (0 for no limit) and size of the bursts allowed
+REMINDER_RATE_LIMIT = float(os.getenv('REMINDER_RATE_LIMIT', 0))
+REMINDER_RATE_BURST = int(os.getenv('REMINDER_RATE_BURST', 10))
+# Number of minutes over which the reminder emails are spread (one time slot per minute, 0 to send them all at once)
+REMINDER_WINDOW = int(os.getenv('REMINDER_WINDOW', 0))
+
+# Limiter of the sending rate of the reminder emails
+reminder_limiter = TokenBucket(REMINDER_RATE_LIMIT, REMINDER_RATE_BURST) if REMINDER_RATE_LIMIT > 0 else None
+
+# Main pictures and titles of the reminder email
+main_pictures = [
+    "static/imgs/emails/3d-business-female-student-with-notebooks.png",
+    "static/imgs/emails/3d-business-joyful-man-with-phone-waving-his-hand.png",
+    "static/imgs/emails/3d-business-joyful-woman-pointing-diagonally.png",
+    "static/imgs/emails/3d-business-joyful-woman-raising-her-fist-up.png",
+    "static/imgs/emails/3d-business-young-man-watching-something-in-vr-glasses.png",
+    "static/imgs/emails/3d-business-young-man-with-a-phone-in-his-hands-taking-a-selfie.png",
+    "static/imgs/emails/3d-business-young-woman-with-bag-pointing-up.png",
+    "static/imgs/emails/3d-casual-life-happy-thankful-man-holding-folded-hands-near-heart.png",
+]
+main_titles = [
+    "Bonne soirée !",
+    "Bonsoir !",
+    "Salut !",
+    "Hello !",
+    "Hi !",
+    "Good evening !"
+]
+
+# Load the images of the reminder email once at startup
+preload(
+    [(str(os.getenv("DIRECTORY_PATH")) + picture, 'main-picture') for picture in main_pictures] + [
+        (str(os.getenv("DIRECTORY_PATH")) + 'static/imgs/app-main-logo.png', 'app-main-logo'),
+        (str(os.getenv("DIRECTORY_PATH")) + 'static/imgs/opened-chest.png', 'chest-illustration'),
+        (str(os.getenv("DIRECTORY_PATH")) + 'static/imgs/3d-three-yelow-lightnings.png', 'lightnings-illustration'),
+        (str(os.getenv("DIRECTORY_PATH")) + 'static/imgs/3d-red-clock.png', 'red-clock-illustration')
+    ]
+)
+
+# Expose the counters of the mail transport
+register_metrics("mail", lambda: get_transport().get_stats())
+
+
+def get_ranking(cursor):
+    """
+    Get the rank of every user in the leaderboard.
+    
+    The leaderboard is computed once per job instead of once per user.
+
+    Args:
+        cursor (mysql.connector.cursor.MySQLCursor): The cursor to use.
+
+    Returns:
+        dict: The rank of each user, indexed by the user's ID.
+    """
+    cursor.execute("SELECT u.id as user_id, RANK() OVER (ORDER BY SUM(ll.xp) DESC) as user_rank \
+        FROM users u JOIN lessons_log ll ON u.id = ll.user_id GROUP BY u.id;")
+    return {int(row[0]): int(row[1]) for row in cursor.fetchall()}
 
 
-def get_user_data(user_id):
+def get_users_chunk(cursor, last_id, chunk_size=REMINDER_CHUNK_SIZE, slot=0, slots=1):
     """
-    Get the user's data from the database.
+    Get the next chunk of users who enabled the reminder or statistics notifications.
     
+    The users are paginated on their ID (keyset pagination), so each chunk costs the same whatever its position.
+    When the sends are spread over a window, each user is hashed into one of its time slots, and only the users of the given slot are returned.
+
     Args:
-        user_id (int): The ID of the user.
+        cursor (mysql.connector.cursor.MySQLCursor): The cursor to use.
+        last_id (int): The ID of the last user of the previous chunk (0 for the first chunk).
+        chunk_size (int): The maximum number of users to return.
+        slot (int): The time slot of the users to return.
+        slots (int): The number of time slots of the window.
+
+    Returns:
+        list: The users of the chunk, ordered by ID.
+            - id (int): The ID of the user.
+            - email (string): The email address of the user.
+            - notif_remind (bool): True if the reminder notification is enabled, False otherwise.
+            - notif_stats (bool): True if the statistics notification is enabled, False otherwise.
+    """
+    cursor.execute("SELECT u.id, u.email, MAX(l.notif_remind), MAX(l.notif_stats) FROM users u \
+        JOIN lists l ON l.user_id = u.id WHERE u.id > %s AND (l.notif_remind = 1 OR l.notif_stats = 1) AND MOD(CRC32(u.id), %s) = %s \
+        GROUP BY u.id, u.email ORDER BY u.id LIMIT %s;", (last_id, slots, slot, chunk_size))
+    return [{
+        "id": row[0],
+        "email": row[1],
+        "notif_remind": row[2] == 1,
+        "notif_stats": row[3] == 1
+    } for row in cursor.fetchall()]
+
+
+def get_users_data(cursor, users, ranking):
+    """
+    Get the data of a chunk of users from the database.
+    
+    The rewards and the statistics of the whole chunk are fetched with one query each.
+    
+    Args:
+        cursor (mysql.connector.cursor.MySQLCursor): The cursor to use.
+        users (list): The users of the chunk, as returned by get_users_chunk.
+        ranking (dict): The rank of each user, as returned by get_ranking.
         
     Returns:
-        dict: The user's data.
+        dict: The data of each user who has to receive an email, indexed by the user's ID.
             - notif_remind (bool): True if the reminder notification is enabled, False otherwise.
             - notif_stats (bool): True if the statistics notification is enabled, False otherwise.
             - got_rewards (bool): True if the user got rewards today, False otherwise.
@@ -157,153 +247,423 @@ def get_user_data(user_id):
             - main_picture (string): The path to the main image of the email.
             - main_title (string): The title of the email.
             - final_sentence (string): The final sentence of the email.
-        dict: An empty dictionary if an error occurred.
     """
-    targets = {"games": 0, "xp": 0,"time": 0}
+    if not users:
+        return {}
+    
+    users_id = [user["id"] for user in users]
+    placeholders = ", ".join(["%s"] * len(users_id))
+    
+    # Check which users got rewards today
+    cursor.execute("SELECT DISTINCT user_id FROM rewards WHERE user_id IN (" + placeholders + ") \
+        AND DATE(created_at) = CURRENT_DATE()", tuple(users_id))
+    rewarded = {row[0] for row in cursor.fetchall()}
     
+    # Check the users' statistics today
+    cursor.execute("SELECT user_id, COUNT(*), COALESCE(SUM(time), 0), COALESCE(SUM(xp), 0) FROM lessons_log \
+        WHERE user_id IN (" + placeholders + ") AND DATE(created_at) = CURRENT_DATE() GROUP BY user_id", tuple(users_id))
+    lessons_log = {row[0]: row[1:] for row in cursor.fetchall()}
+    
+    users_data = {}
+    for user in users:
+        notif_remind = user["notif_remind"]
+        notif_stats = user["notif_stats"]
+        got_rewards = user["id"] in rewarded
+        # Skip the users who have nothing to receive
+        if not (notif_remind and not got_rewards or notif_stats):
+            continue
+        
+        games, time, xp = lessons_log.get(user["id"], (0, 0, 0))
+        
+        # Get the main picture and title of the email
+        main_picture = str(os.getenv("DIRECTORY_PATH")) + random.choice(main_pictures)
+        main_title = random.choice(main_titles)
+        if xp > 50:
+            final_sentence = "Tu as déjà gagné plus de 50 points d'expérience aujourd'hui ! Impressionnant !"
+        elif xp > 25:
+            final_sentence = "Tu as déjà gagné plus de 25 points d'expérience aujourd'hui ! L'excellence est à portée de main !"
+        elif xp > 0:
+            final_sentence = "Tu as déjà gagné quelques points d'expérience aujourd'hui !  Tu es sur la bonne voie !"
+        else:
+            final_sentence = "Tu n'as pas encore gagné de points d'expérience aujourd'hui. N'oublie pas de jouer !"
+        
+        users_data[user["id"]] = {
+            "notif_remind": notif_remind,
+            "notif_stats": notif_stats,
+            "got_rewards": got_rewards,
+            "games": games,
+            "time": time,
+            "xp": xp,
+            "user_rank": ranking.get(int(user["id"]), 0),
+            "main_picture": main_picture,
+            "main_title": main_title,
+            "final_sentence": final_sentence
+        }
+    return users_data
+
+def enqueue_reminder_run(cursor):
+    """
+    Enqueue the reminder run of the day.
+    
+    There is one run per day. If the run of the day has already been created, it is queued again
+    unless it is finished, so that a new request resumes it from its last checkpoint.
+
+    Args:
+        cursor (mysql.connector.cursor.MySQLCursor): The cursor to use.
+
+    Returns:
+        tuple: The ID and the status of the run.
+    """
+    cursor.execute("INSERT IGNORE INTO reminder_runs (run_date, slots) VALUES (CURRENT_DATE(), %s)", (max(REMINDER_WINDOW, 1),))
+    cursor.execute("UPDATE reminder_runs SET status = 'queued' WHERE run_date = CURRENT_DATE() AND status = 'failed'")
+    cursor.execute("SELECT id, status FROM reminder_runs WHERE run_date = CURRENT_DATE()")
+    return cursor.fetchone()
+
+
+def claim_reminder_run(cursor, run_id):
+    """
+    Claim a reminder run for the current worker.
+    
+    A run can be claimed if it is queued, or if its worker has not reported any progress for a while (crashed worker).
+    The run gets a new claim token: the previous worker, if it is still alive, stops at its next heartbeat.
+
+    Args:
+        cursor (mysql.connector.cursor.MySQLCursor): The cursor to use.
+        run_id (int): The ID of the run.
+
+    Returns:
+        string: The claim token of the worker, or None if the run could not be claimed.
+    """
+    claim = str(uuid.uuid4())
+    cursor.execute("UPDATE reminder_runs SET status = 'running', claim_token = %s, started_at = COALESCE(started_at, NOW()), heartbeat_at = NOW() \
+        WHERE id = %s AND (status = 'queued' OR (status = 'running' AND heartbeat_at < NOW() - INTERVAL %s MINUTE))", (claim, run_id, REMINDER_STALL_TIMEOUT))
+    return claim if cursor.rowcount == 1 else None
+
+
+def keep_claim(cursor, conn, run_id, claim, sent=0, failed=0):
+    """
+    Update the heartbeat of a reminder run, if the worker still owns it, and its counters.
+
+    The counters are updated even if another worker has claimed the run, because each email is sent by one worker only.
+
+    Args:
+        cursor (mysql.connector.cursor.MySQLCursor): The cursor to use.
+        conn (mysql.connector.connection.MySQLConnection): The connection to use.
+        run_id (int): The ID of the run.
+        claim (string): The claim token of the worker.
+        sent (int): The number of emails sent since the last update.
+        failed (int): The number of emails that could not be sent since the last update.
+
+    Returns:
+        bool: True if the worker still owns the run, False if another worker has claimed it.
+    """
+    cursor.execute("UPDATE reminder_runs SET heartbeat_at = IF(claim_token = %s, NOW(), heartbeat_at), sent = sent + %s, failed = failed + %s WHERE id = %s",
+                   (claim, sent, failed, run_id))
+    conn.commit()
+    # The number of affected rows is 0 if nothing changed (same second), so the owner is read back
+    cursor.execute("SELECT claim_token FROM reminder_runs WHERE id = %s", (run_id,))
+    row = cursor.fetchone()
+    return row is not None and row[0] == claim
+
+
+def claim_delivery(cursor, run_id, user_id):
+    """
+    Claim the delivery of a reminder email to a user, before it is sent.
+
+    The delivery is claimed if it is not recorded yet, or if the previous attempt failed.
+    Only one worker can claim a delivery, so a user never gets the email of a run twice.
+
+    Args:
+        cursor (mysql.connector.cursor.MySQLCursor): The cursor to use.
+        run_id (int): The ID of the run.
+        user_id (int): The ID of the user.
+
+    Returns:
+        bool: True if the email can be sent by the current worker, False otherwise.
+    """
+    cursor.execute("INSERT IGNORE INTO reminder_deliveries (run_id, user_id) VALUES (%s, %s)", (run_id, user_id))
+    if cursor.rowcount == 1:
+        return True
+    cursor.execute("UPDATE reminder_deliveries SET status = 'sent' WHERE run_id = %s AND user_id = %s AND status = 'failed'", (run_id, user_id))
+    return cursor.rowcount == 1
+
+
+def wait_for_slot(cursor, conn, run_id, claim, slot_start):
+    """
+    Wait for the beginning of a time slot of a reminder run.
+    
+    The heartbeat of the run is updated while waiting, so that the run is not considered stalled.
+
+    Args:
+        cursor (mysql.connector.cursor.MySQLCursor): The cursor to use.
+        conn (mysql.connector.connection.MySQLConnection): The connection to use.
+        run_id (int): The ID of the run.
+        claim (string): The claim token of the worker.
+        slot_start (float): The timestamp of the beginning of the slot.
+
+    Returns:
+        bool: True if the worker still owns the run, False if another worker has claimed it.
+    """
+    while time.time() < slot_start:
+        time.sleep(min(slot_start - time.time(), 60))
+        if not keep_claim(cursor, conn, run_id, claim):
+            return False
+    return True
+
+
+def process_reminder_run(app, run_id):
+    """
+    Send the reminder emails of a run, time slot by time slot and chunk by chunk.
+    
+    The users of a slot are processed when the slot begins, so their statistics and rewards are read
+    just before their email is built. The emails are sent at the rate allowed by the reminder limiter.
+    
+    Before an email is sent, its delivery is claimed in reminder_deliveries, and the users already
+    recorded for the run are skipped: a resumed run never sends an email twice. The failed deliveries
+    are not skipped, so they are retried when their chunk is processed again (a run resumed before the checkpoint
+    of the chunk); a delivery that failed in a checkpointed chunk is final. The failed counter counts the failed attempts.
+    The emails of a chunk are sent in batches of REMINDER_SEND_BATCH (one minute of emails at most with a rate limit),
+    and the heartbeat and the counters of the run are updated after each batch. After each chunk, the checkpoint
+    (the current slot and the ID of the last processed user) is saved. Every update checks the claim token of the run:
+    if another worker has claimed the run (this worker was considered stalled), this worker stops.
+
+    Args:
+        app (flask.Flask): The application, for rendering the templates.
+        run_id (int): The ID of the run.
+    """
     conn = None
     cursor = None
+    claim = None
     try:
         conn = create_connection()
         cursor = conn.cursor()
+        claim = claim_reminder_run(cursor, run_id)
+        if claim is None:
+            return
+        conn.commit()
         
-        # Get the user's data
-        cursor.execute("SELECT * FROM lists WHERE user_id = %s AND (notif_remind = 1 OR notif_stats = 1)", (user_id,))
-        lists = cursor.fetchall()
-        if lists:
-            # Check if the user has the reminder and statistics notifications enabled
-            notif_remind = False if not any(lst[12] == 1 for lst in lists) else True
-            notif_stats = False if not any(lst[13] == 1 for lst in lists) else True
-            
-            # Check if the user got rewards today
-            cursor.execute("SELECT * FROM rewards WHERE user_id = %s AND DATE(created_at) = CURRENT_DATE()", (user_id,))
-            got_rewards = True if cursor.fetchall() else False
-            
-            # Check the user's statistics today
-            cursor.execute("SELECT COALESCE(COUNT(*), 0), COALESCE(SUM(time), 0), COALESCE(SUM(xp), 0) FROM lessons_log WHERE user_id = %s AND DATE(created_at) = CURRENT_DATE()", (user_id,))
-            lessons_log = cursor.fetchone()
-            if lessons_log:
-                games = lessons_log[0]
-                time = lessons_log[1]
-                xp = lessons_log[2]
-            else:
-                games = 0
-                time = 0
-                xp = 0
-            
-            # Get the user's rank
-            cursor.execute("SELECT u.id as user_id, u.name as username, SUM(ll.xp) as total_xp, \
-            RANK() OVER (ORDER BY SUM(ll.xp) DESC) as user_rank FROM users u JOIN lessons_log ll ON u.id = ll.user_id \
-            GROUP BY u.id, u.name ORDER BY total_xp DESC;")
-            ranking = cursor.fetchall()
-            user_rank = 0
-            
-            for item, rank in enumerate(ranking):
-                if int(rank[0]) == int(user_id):
-                    user_rank = int(rank[3])
-                    break   
-            
-            # Get the main picture and title of the email
-            main_pictures = [
-                "static/imgs/emails/3d-business-female-student-with-notebooks.png",
-                "static/imgs/emails/3d-business-joyful-man-with-phone-waving-his-hand.png",
-                "static/imgs/emails/3d-business-joyful-woman-pointing-diagonally.png",
-                "static/imgs/emails/3d-business-joyful-woman-raising-her-fist-up.png",
-                "static/imgs/emails/3d-business-young-man-watching-something-in-vr-glasses.png",
-                "static/imgs/emails/3d-business-young-man-with-a-phone-in-his-hands-taking-a-selfie.png",
-                "static/imgs/emails/3d-business-young-woman-with-bag-pointing-up.png",
-                "static/imgs/emails/3d-casual-life-happy-thankful-man-holding-folded-hands-near-heart.png",
-            ]
-            main_picture = str(os.getenv("DIRECTORY_PATH")) + random.choice(main_pictures)
-            main_titles = [
-                "Bonne soirée !",
-                "Bonsoir !",
-                "Salut !",
-                "Hello !",
-                "Hi !",
-                "Good evening !"
-            ]
-            main_title = random.choice(main_titles)
-            if xp > 50:
-                final_sentence = "Tu as déjà gagné plus de 50 points d'expérience aujourd'hui ! Impressionnant !"
-            elif xp > 25:
-                final_sentence = "Tu as déjà gagné plus de 25 points d'expérience aujourd'hui ! L'excellence est à portée de main !"
-            elif xp > 0:
-                final_sentence = "Tu as déjà gagné quelques points d'expérience aujourd'hui !  Tu es sur la bonne voie !"
-            else:
-                final_sentence = "Tu n'as pas encore gagné de points d'expérience aujourd'hui. N'oublie pas de jouer !"
+        # Count the recipients of the run
+        cursor.execute("SELECT last_slot, last_user_id, slots, UNIX_TIMESTAMP(started_at) FROM reminder_runs WHERE id = %s", (run_id,))
+        last_slot, last_id, slots, started_at = cursor.fetchone()
+        cursor.execute("SELECT COUNT(DISTINCT user_id) FROM lists WHERE notif_remind = 1 OR notif_stats = 1")
+        total_users = cursor.fetchone()[0]
+        cursor.execute("UPDATE reminder_runs SET total_users = %s WHERE id = %s", (total_users, run_id))
+        conn.commit()
+        
+        # Compute the leaderboard once for the whole run
+        ranking = get_ranking(cursor)
+        
+        # Number of emails sent between two heartbeats
+        batch_size = REMINDER_SEND_BATCH
+        if REMINDER_RATE_LIMIT > 0:
+            batch_size = max(1, min(batch_size, int(REMINDER_RATE_LIMIT * 60)))
+        
+        # One time slot per minute of the window
+        slot_length = 60 if slots > 1 else 0
+        for slot in range(last_slot, slots):
+            if slot != last_slot:
+                last_id = 0
+            # Wait for the beginning of the slot
+            if not wait_for_slot(cursor, conn, run_id, claim, float(started_at) + slot * slot_length):
+                logging.warning(f"The reminder run {run_id} has been claimed by another worker")
+                return
             
-            # Return the user's data
-            if notif_remind and not got_rewards or notif_stats:
-                return {
-                    "notif_remind": notif_remind,
-                    "notif_stats": notif_stats,
-                    "got_rewards": got_rewards,
-                    "games": games,
-                    "time": time,
-                    "xp": xp,
-                    "user_rank": user_rank,
-                    "main_picture": main_picture,
-                    "main_title": main_title,
-                    "final_sentence": final_sentence
-                }
-            else:
-                return {}
-        else:
-            return {}
+            while True:
+                users = get_users_chunk(cursor, last_id, slot=slot, slots=slots)
+                if not users:
+                    break
+                
+                # Skip the users already processed by a previous attempt of the run (the failed deliveries are retried)
+                placeholders = ", ".join(["%s"] * len(users))
+                cursor.execute("SELECT user_id FROM reminder_deliveries WHERE run_id = %s AND status <> 'failed' AND user_id IN (" + placeholders + ")",
+                               (run_id,) + tuple(user["id"] for user in users))
+                delivered = {row[0] for row in cursor.fetchall()}
+                users_data = get_users_data(cursor, [user for user in users if user["id"] not in delivered], ranking)
+                
+                recipients = []
+                messages = []
+                with app.app_context():
+                    for user in users:
+                        user_data = users_data.get(user["id"])
+                        # If the user's data is available, prepare the reminder email
+                        if user_data:
+                            html = render_template(
+                                "emails/remind-email-and-stats.html",
+                                notif_remind=user_data["notif_remind"],
+                                notif_stats=user_data["notif_stats"],
+                                got_rewards=user_data["got_rewards"],
+                                games=user_data["games"],
+                                time=user_data["time"],
+                                xp=user_data["xp"],
+                                user_rank=user_data["user_rank"],
+                                main_picture=user_data["main_picture"],
+                                main_title=user_data["main_title"],
+                                final_sentence=user_data["final_sentence"]
+                            )
+                            notif_remind = user_data["notif_remind"] and not user_data["got_rewards"]
+                            recipients.append(user["id"])
+                            messages.append(build_mail(user["email"], "Rappel quotidien", html, user_data["main_picture"], notif_remind, user_data["notif_stats"]))
+                
+                # Send the emails of the chunk over the pool of workers, at the allowed rate, batch by batch
+                emails = list(zip(recipients, messages))
+                for start in range(0, len(emails), batch_size):
+                    # Claim the deliveries just before sending, so that a crash or another worker never leads to a second email
+                    batch = [(user_id, message) for user_id, message in emails[start:start + batch_size] if claim_delivery(cursor, run_id, user_id)]
+                    conn.commit()
+                    report = get_transport().send_many([message for user_id, message in batch], reminder_limiter)
+                    failed = [user_id for (user_id, message), sent in zip(batch, report["results"]) if not sent]
+                    if failed:
+                        cursor.executemany("UPDATE reminder_deliveries SET status = 'failed' WHERE run_id = %s AND user_id = %s", [(run_id, user_id) for user_id in failed])
+                    if not keep_claim(cursor, conn, run_id, claim, report["sent"], report["failed"]):
+                        logging.warning(f"The reminder run {run_id} has been claimed by another worker")
+                        return
+                
+                # Save the checkpoint
+                last_id = users[-1]["id"]
+                cursor.execute("UPDATE reminder_runs SET last_slot = %s, last_user_id = %s, processed_users = processed_users + %s, heartbeat_at = NOW() \
+                    WHERE id = %s AND claim_token = %s", (slot, last_id, len(users), run_id, claim))
+                claimed = cursor.rowcount == 1
+                conn.commit()
+                if not claimed:
+                    logging.warning(f"The reminder run {run_id} has been claimed by another worker")
+                    return
         
+        cursor.execute("UPDATE reminder_runs SET status = 'done', finished_at = NOW() WHERE id = %s AND claim_token = %s", (run_id, claim))
+        conn.commit()
     except Exception as e:
-        logging.error(e)
-        return {}
+        logging.error("Error while sending the reminder emails: " + str(e), exc_info=True)
+        if cursor:
+            try:
+                cursor.execute("UPDATE reminder_runs SET status = 'failed' WHERE id = %s AND claim_token = %s", (run_id, claim))
+                conn.commit()
+            except Exception:
+                pass
     finally:
         if cursor:
             cursor.close()
         if conn:
             conn.close()
 
+
+def get_reminder_status(cursor, run_id=None):
+    """
+    Get the progress of a reminder run.
+
+    Args:
+        cursor (mysql.connector.cursor.MySQLCursor): The cursor to use.
+        run_id (int): The ID of the run, or None for the latest run.
+
+    Returns:
+        dict: The progress of the run, or None if the run does not exist.
+            - id (int): The ID of the run.
+            - date (string): The date of the run.
+            - status (string): The status of the run (queued, running, done or failed).
+            - total (int): The number of users to process.
+            - processed (int): The number of users processed.
+            - sent (int): The number of emails sent.
+            - failed (int): The number of emails that could not be sent.
+            - rate (float): The number of users processed per second.
+            - eta (int): The estimated number of seconds before the end of the run.
+    """
+    if run_id is None:
+        cursor.execute("SELECT id, run_date, status, total_users, processed_users, sent, failed, \
+            TIMESTAMPDIFF(SECOND, started_at, COALESCE(finished_at, NOW())), slots FROM reminder_runs ORDER BY run_date DESC LIMIT 1")
+    else:
+        cursor.execute("SELECT id, run_date, status, total_users, processed_users, sent, failed, \
+            TIMESTAMPDIFF(SECOND, started_at, COALESCE(finished_at, NOW())), slots FROM reminder_runs WHERE id = %s", (run_id,))
+    run = cursor.fetchone()
+    if not run:
+        return None
+    
+    elapsed = run[7] or 0
+    rate = round(run[4] / elapsed, 2) if elapsed > 0 else 0.0
+    remaining = max(run[3] - run[4], 0)
+    if run[2] == 'done':
+        eta = 0
+    else:
+        eta = round(remaining / rate) if rate > 0 else None
+        # The run cannot end before the last time slot of its window
+        if run[8] > 1:
+            window_left = max(run[8] * 60 - elapsed, 0)
+            eta = max(eta or 0, window_left)
+    return {
+        "id": run[0],
+        "date": str(run[1]),
+        "status": run[2],
+        "total": run[3],
+        "processed": run[4],
+        "sent": run[5],
+        "failed": run[6],
+        "rate": rate,
+        "eta": eta
+    }
+
+
 @emailing_bp.route('/api/automatisations/reminder', methods=["POST"])
 @token_required
 def reminder_auto():
     """
-    Send a reminder email to the users.
+    Enqueue the reminder run of the day and start it in the background.
     
     Returns:
         dict: The response object.
             - code (int): The status code of the response.
-                -> 200: OK.
+                -> 200: The run of the day is already done.
+                -> 202: The run has been enqueued.
                 -> 500: Internal Server Error.
             - message (string): The message of the response.
+            - result (dict): The progress of the run.
     """
     conn = None
     cursor = None
     try:
         conn = create_connection()
         cursor = conn.cursor()
+        run_id, status = enqueue_reminder_run(cursor)
+        conn.commit()
         
-        # Get the list of users
-        cursor.execute("SELECT id, email FROM users")
-        users_id = cursor.fetchall()
-        # For each user, get the user's data and check the availability of the reminder and statistics notifications
-        for user_id in users_id:
-            user_data = get_user_data(user_id[0])
-            # If the user's data is available, send the reminder email
-            if user_data:
-                html = render_template(
-                    "emails/remind-email-and-stats.html",
-                    notif_remind=user_data["notif_remind"],
-                    notif_stats=user_data["notif_stats"],
-                    got_rewards=user_data["got_rewards"],
-                    games=user_data["games"],
-                    time=user_data["time"],
-                    xp=user_data["xp"],
-                    user_rank=user_data["user_rank"],
-                    main_picture=user_data["main_picture"],
-                    main_title=user_data["main_title"],
-                    final_sentence=user_data["final_sentence"]
-                )
-                notif_remind = user_data["notif_remind"] and not user_data["got_rewards"]
-                send_mail(user_id[1], "Rappel quotidien", html, user_data["main_picture"], notif_remind, user_data["notif_stats"])
-        return jsonify({"code": 200, "message": "OK"})
+        if status != 'done':
+            # Start the worker in the background
+            app = current_app._get_current_object()
+            threading.Thread(target=process_reminder_run, args=(app, run_id), name='reminder-run', daemon=True).start()
+            return jsonify({"code": 202, "message": "Accepted", "result": get_reminder_status(cursor, run_id)}), 202
+        return jsonify({"code": 200, "message": "OK", "result": get_reminder_status(cursor, run_id)})
+    except Exception as e:
+        logging.error(e)
+        return jsonify({"code": 500, "message": "Internal Server Error"}), 500
+    finally:
+        if cursor:
+            cursor.close()
+        if conn:
+            conn.close()
+
+
+@emailing_bp.route('/api/automatisations/reminder/status')
+@token_required
+def reminder_status():
+    """
+    Get the progress of a reminder run.
+    
+    The run is given by the run_id query parameter (the latest run by default).
+    
+    Returns:
+        dict: The response object.
+            - code (int): The status code of the response.
+                -> 200: OK.
+                -> 404: No run found.
+                -> 500: Internal Server Error.
+            - message (string): The message of the response.
+            - result (dict): The progress of the run.
+    """
+    conn = None
+    cursor = None
+    try:
+        conn = create_connection()
+        cursor = conn.cursor()
+        status = get_reminder_status(cursor, request.args.get('run_id', type=int))
+        if not status:
+            return jsonify({"code": 404, "message": "Not Found"}), 404
+        return jsonify({"code": 200, "message": "OK", "result": status})
     except Exception as e:
         logging.error(e)
         return jsonify({"code": 500, "message": "Internal Server Error"}), 500
@@ -311,4 +671,4 @@ def reminder_auto():
         if cursor:
             cursor.close()
         if conn:
-            conn.close()
\ No newline at end of file
+            conn.close()
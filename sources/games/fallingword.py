@@ -5,6 +5,7 @@ Imports:
     - flask: For handling the requests and responses
     - flask_login: For managing the user sessions
     - root: For managing the database connection
+    - targets: For updating the user's daily targets
     - random: For generating random numbers
     - datetime: For managing the date and time
     - uuid: For generating unique identifiers
@@ -16,6 +17,7 @@ Imports:
     - BytesIO: For managing the audio bytes
     - logging: For logging errors
     - time: For managing the time
+    - distractors: For getting the similar words
     
 Blueprints:
     - fallingword_bp: The blueprint of the fallingword game
@@ -24,14 +26,15 @@ Blueprints:
 from flask import Blueprint, render_template, redirect, url_for, jsonify, request, session, abort, make_response, Response
 from flask_login import login_user, login_required, logout_user, current_user
 from root import *
+from targets import refresh_targets
 import random as random
 import datetime as datetime
 import uuid as uuid
 import json
 from functools import wraps
-import linecache
 import logging
 import time
+from distractors import get_distractors, fallback_words, ENGLISH_INDEX
 
 
 fallingword_bp = Blueprint('fallingword', __name__)
@@ -104,41 +107,9 @@ class fallingword():
                     - duoList (int): The list of all duos  
         """
         try:
-            def get_similar_words(file_path, word, max_len):
-                """
-                Use the dichotomic search to find the word in the list of words
-                
-                Args:
-                    word (string): The word to search
-                    
-                Returns:
-                    string: The list of similar words
-                """
-                # Set the list of words
-                min_len = 0
-                max_len = max_len
-                if file_path == "static/similar_words_levenshtein":
-                    if word < "micronization":
-                        file_path = str(os.getenv("DIRECTORY_PATH")) + file_path + "_1.txt"
-                    else:
-                        file_path = str(os.getenv("DIRECTORY_PATH")) + file_path + "_2.txt"
-                else:
-                    if word < "grand-mamans":
-                        file_path = str(os.getenv("DIRECTORY_PATH")) + file_path + "_1.txt"
-                        max_len = 185053
-                    else:
-                        file_path = str(os.getenv("DIRECTORY_PATH")) + file_path + "_2.txt"
-                while min_len < max_len:
-                    mid = (min_len + max_len) // 2
-                    line = linecache.getline(file_path, mid).split(":")
-                    if str(line[0]) == word:
-                        return line[1]
-                    elif str(line[0]) < word:
-                        min_len = mid + 1
-                    else:
-                        max_len = mid
-                return None
-            
+            # Get the similar words of all the words at once (if they have not been stored with the list)
+            similar_words = get_distractors(ENGLISH_INDEX, [word['word'] for word in self.words if word.get('distractors') is None])
+
             # Create 30 duos
             for i in range(30):
                 boolean = random.randint(0,5)
@@ -161,18 +132,9 @@ class fallingword():
                                         'checking': True})
                 else:
                     self.answers.append(False)
-                    # Select a similar word 
-                    words = 'static/similar_words_levenshtein'
-                    max_len = 185052 if words == 'static/similar_words_levenshtein' else 168266
-                    badduo = get_similar_words(words, word['word'], max_len)
-                    if not badduo:
-                        # Change only one ot=r to letter in word
-                        letters = 'abcdefghijklmnopqrstuvwxyz'
-                        random_pos = random.randint(0, len(word['word']) - 1)
-                        badduo = word['word'][:random_pos] + letters[random.randint(0, len(letters) - 1)] + word['word'][random_pos + 1:]
-                        badduo_tab = [badduo]
+                    # Select a similar word (or the word with one letter changed if there is none)
+                    badduo_tab = word.get('distractors') or similar_words.get(word['word']) or fallback_words(word['word'])
                     self.shuffle.insert(newindex, word)
-                    badduo_tab = badduo.split(',')
                     english_word = badduo_tab[random.randint(0,len(badduo_tab)-1)]
                     self.duoList.append({'indice': indice,
                                         'duo': [english_word,word['trans_word']],
@@ -333,6 +295,9 @@ class fallingword():
             # Save the results in the database
             cursor.execute("INSERT INTO lessons_log (user_id, list_id, lesson_id, xp, lost_lives, time) VALUES (%s, %s, %s, %s, %s, %s)", (current_user.id, self.list_id, self.lesson_id, xp, lives_to_lose, time_passed))
             cursor.execute("INSERT INTO user_statements SET user_id= %s, transaction_type = 'xp', transaction = %s", (current_user.id, xp))
+            # Update the user's daily targets if the lesson has been completed
+            if lives_to_lose == 0:
+                refresh_targets(cursor, current_user.id)
             conn.commit()
             response = jsonify({
                 "code": 201,
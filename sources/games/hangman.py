@@ -5,6 +5,7 @@ Imports:
     - flask: For handling the requests and responses
     - flask_login: For managing the user sessions
     - root: For managing the database connection
+    - targets: For updating the user's daily targets
     - random: For generating random numbers
     - datetime: For managing the date and time
     - uuid: For generating unique identifiers
@@ -19,6 +20,7 @@ Blueprints:
 from flask import Blueprint, render_template, redirect, url_for, jsonify, request, session, abort, make_response
 from flask_login import login_user, login_required, logout_user, current_user
 from root import *
+from targets import refresh_targets
 import random as random
 import datetime as datetime
 import uuid as uuid
@@ -431,6 +433,9 @@ class hangman():
             # Save the results in the database
             cursor.execute("INSERT INTO lessons_log (user_id, list_id, lesson_id, xp, lost_lives, time) VALUES (%s, %s, %s, %s, %s, %s)", (current_user.id, self.list_id, self.lesson_id, xp, lives_lost, time_passed))
             cursor.execute("INSERT INTO user_statements SET user_id= %s, transaction_type = 'xp', transaction = %s", ( current_user.id, xp))
+            # Update the user's daily targets if the lesson has been completed
+            if lives_lost == 0:
+                refresh_targets(cursor, current_user.id)
             conn.commit()
             
             response = jsonify({
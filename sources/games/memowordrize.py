@@ -5,13 +5,15 @@ Imports:
     - flask: For handling the requests and responses
     - flask_login: For managing the user sessions
     - root: For managing the database connection
+    - targets: For updating the user's daily targets
     - random: For generating random numbers
     - datetime: For managing the date and time
     - uuid: For generating unique identifiers
     - json: For managing JSON data
     - functools: For managing the decorators
-    - gTTS: For generating audio from text
-    - BytesIO: For managing the audio bytes
+    - tts_cache: For generating audio from text (once per text)
+    - gtts: For the errors of the TTS service
+    - requests: For the errors of the TTS service (unavailable or circuit breaker open)
     - logging: For logging errors
     - time: For managing the time
     
@@ -22,13 +24,15 @@ Blueprints:
 from flask import Blueprint, render_template, redirect, url_for, jsonify, request, session, abort, make_response, Response
 from flask_login import login_user, login_required, logout_user, current_user
 from root import *
+from targets import refresh_targets
 import random as random
 import datetime as datetime
 import uuid as uuid
 import json
 from functools import wraps
-from gtts import gTTS
-from io import BytesIO
+from tts_cache import send_audio
+from gtts import gTTSError
+import requests
 import logging
 import time
 
@@ -395,6 +399,9 @@ class memowordrize():
             # Save the results in the database
             cursor.execute("INSERT INTO lessons_log (user_id, list_id, lesson_id, xp, lost_lives, time) VALUES (%s, %s, %s, %s, %s, %s)", (current_user.id, self.list_id, self.lesson_id, xp, lives_to_lose, time_passed))
             cursor.execute("INSERT INTO user_statements SET user_id= %s, transaction_type = 'xp', transaction = %s", ( current_user.id, xp))
+            # Update the user's daily targets if the lesson has been completed
+            if lives_to_lose == 0:
+                refresh_targets(cursor, current_user.id)
             conn.commit()
             
             response = jsonify({
@@ -627,25 +634,27 @@ def audio(session_id, id):
         current_game_index = [index for index, item in enumerate(game.current_path["path"]) if item["id"] == id]
         if current_game_index:
             word = game.current_path["path"][current_game_index[0]]["word"]["word"]
-            # Generate the audio
-            tts = gTTS(word, lang='en')
-            # Save the audio in a BytesIO object
-            audio_bytes = BytesIO()
-            # Write the audio in the BytesIO object
-            tts.write_to_fp(audio_bytes)
-            # Set the position of the BytesIO object to 0
-            audio_bytes.seek(0)
+            # Get the audio (synthesized only if it is not in the cache)
+            response = send_audio(word, lang='en')
             
             game.current_path["path"][current_game_index[0]]["id"] = str(uuid.uuid4())
             session["game"] = game.to_json()
             time.sleep(1/100) # To avoid session concurrency
             # Return the audio
-            return Response(audio_bytes, mimetype="audio/mp3")
+            return response
         return jsonify({
             "code": 404,
             "message": "Le mot n'a pas été trouvé!",
             "result": []
         }), 404
+    except (requests.exceptions.RequestException, gTTSError) as e:
+        # The TTS service is unavailable (or its circuit breaker is open): the game goes on without audio
+        logging.error("Error while generating the audio: " + str(e))
+        return jsonify({
+            "code": 503,
+            "message": "Le fichier audio n'est pas disponible pour le moment!",
+            "result": []
+        }), 503
     except Exception as e:
         logging.error("An error has occured: " + str(e))
         return jsonify({
@@ -5,17 +5,23 @@ Imports:
     - flask: For handling the requests and responses
     - flask_login: For managing the user sessions
     - root: For managing the database connection
+    - targets: For updating the user's daily targets
     - random: For generating random numbers
     - datetime: For managing the date and time
     - uuid: For generating unique identifiers
     - json: For managing JSON data
     - functools: For managing the decorators
     - Levenshtein: For calculating the Levenshtein distance
-    - GoogleImagesSearch: For searching images on Google
-    - gTTS: For generating audio from text
-    - BytesIO: For managing the audio bytes
+    - image_cache: For getting the images of the words
+    - image_proxy: For serving the images of the words from our origin
+    - tts_cache: For generating audio from text (once per text)
+    - gtts: For the errors of the TTS service
+    - requests: For the errors of the TTS service (unavailable or circuit breaker open)
+    - audio_pipeline: For checking if the audio of the list is ready
     - logging: For logging errors
     - time: For managing the time
+    - concurrent.futures: For searching the images at the same time
+    - distractors: For getting the similar words
     
 Blueprints:
     - quiz_bp: The blueprint of the quiz game
@@ -24,18 +30,23 @@ Blueprints:
 from flask import Blueprint, render_template, redirect, url_for, jsonify, request, session, abort, make_response, Response
 from flask_login import login_user, login_required, logout_user, current_user
 from root import *
+from targets import refresh_targets
 import random as random
 import datetime as datetime
 import uuid as uuid
 import json
 from functools import wraps
 import Levenshtein 
-from google_images_search import GoogleImagesSearch
-from gtts import gTTS
-from io import BytesIO
+from tts_cache import send_audio
+from gtts import gTTSError
+import requests
+from audio_pipeline import get_status
 import logging
-import linecache
 import time
+from concurrent.futures import ThreadPoolExecutor
+from distractors import get_distractors, ENGLISH_INDEX, FRENCH_INDEX
+from image_cache import get_image_url
+from image_proxy import get_thumbnail
 
 
 quiz_bp = Blueprint('quiz', __name__)
@@ -56,6 +67,12 @@ Routes:
 # The id of the quiz lesson
 quiz_id = 8
 
+# The types of words (wrong answers of the questions about the type of a word)
+types_of_word = ["adjective", "adverb", "conjunction", "interjection", "noun", "preposition", "pronoun", "verb"]
+
+# Number of images searched at the same time when a game starts
+IMAGE_WORKERS = 4
+
 # All the question that can be asked
 quiz_types = [
     {
@@ -100,9 +117,14 @@ class quiz():
         - start (string): The time when the game started
         - current_quiz (dict): The current question
         - faults (int): The number of faults
+        - deck (list): The questions prepared at the start of the game
         
     Methods:
         - check_answer: Check the answer of the user
+        - start_timer: Start the timer of the game
+        - prepare_deck: Prepare all the questions of the game in advance
+        - _choose_question: Choose the type and the content of the question of a word
+        - _complete_question: Set the answers and the HTML content of a question
         - ask_next_question: Ask the next question
         - get_remaning_time: Get the remaining time
         - get_words_checked: Get the words that have been checked
@@ -118,10 +140,18 @@ class quiz():
         self.words = words
         self.words_to_check = words
         self.total_time = len(words) * 7
-        self.time = str(datetime.datetime.now() + datetime.timedelta(seconds=self.total_time))
-        self.start = str(datetime.datetime.now())
         self.current_quiz = None
         self.faults = 0
+        self.deck = []
+        self.start_timer()
+        
+    def start_timer(self):
+        """
+        Start the timer of the game (the player has total_time seconds from now)
+        """
+        now = datetime.datetime.now()
+        self.time = str(now + datetime.timedelta(seconds=self.total_time))
+        self.start = str(now)
         
     def check_answer(self, answer):
         """
@@ -151,6 +181,173 @@ class quiz():
                 else:
                    return self.ask_next_question(correct)
 
+    def prepare_deck(self):
+        """
+        Prepare all the questions of the game in advance
+        
+        The images of the image questions are searched concurrently, and the similar words
+        that have not been stored with the list are searched in one batch per dictionary.
+        Audio questions are asked only if the audio of the list is ready (otherwise it is generated
+        in the background for the next games).
+        If no question has been asked yet, the timer starts once the deck is ready, so the searches
+        do not count in the time of the player.
+        """
+        # Ask audio questions only if their audio has already been generated
+        audio_ready = get_status(self.list_id, self.words) == "ready"
+        words = random.sample(self.words_to_check, len(self.words_to_check))
+        questions = [self._choose_question(word, audio_ready) for word in words]
+        
+        # Search the images at the same time
+        image_questions = [question for question in questions if question["type"] == 3]
+        if image_questions:
+            with ThreadPoolExecutor(max_workers=IMAGE_WORKERS) as executor:
+                images = list(executor.map(self.get_image, [question["words"]["word"] for question in image_questions]))
+            for question, image in zip(image_questions, images):
+                # The thumbnail is served by our origin (url_for needs the request context, not available in the threads)
+                image = url_for('image_proxy.thumbnail', key=image) if image else ""
+                question["content"] = image
+                question["image"] = image
+        
+        # Search the missing similar words in one batch per dictionary
+        for dictionary in (ENGLISH_INDEX, FRENCH_INDEX):
+            missing = [question for question in questions if question["dictionary"] == dictionary and question["bad_answers"] is None]
+            if missing:
+                similar_words = get_distractors(dictionary, [question["answer"] for question in missing], fallback=False)
+                for question in missing:
+                    question["bad_answers"] = similar_words[question["answer"]]
+        
+        self.deck = [self._complete_question(question) for question in questions]
+        if self.current_quiz is None:
+            self.start_timer()
+        
+    def _choose_question(self, word_choosen, audio_ready=True):
+        """
+        Choose the type and the content of the question of a word
+        
+        Args:
+            word_choosen (dict): The word of the question
+            audio_ready (bool): If the audio of the list has been generated (audio questions are asked only if it is)
+            
+        Returns:
+            dict: The question, without its wrong answers if they must be searched in a dictionary
+        """
+        is_example = word_choosen["examples"] # Check if the word has examples
+        is_type_noun = word_choosen["type"] == "noun" # Check if the word is a noun
+         
+        # According to the data of the word, choose the type of the question
+        if is_example and is_type_noun:
+            lesson_type = random.choice([2, 3, 4] if audio_ready else [2, 3])
+        elif is_example:
+            lesson_type = random.choice([1, 2, 4] if audio_ready else [1, 2])
+        elif is_type_noun:
+            lesson_type = random.choice([1, 3])
+        else:
+            lesson_type = 1
+    
+        # Get all the english words
+        words = ENGLISH_INDEX
+        
+        audio = ""
+        image = ""
+        bad_answers = []
+        # If the question is a simple question
+        if lesson_type == 1:
+            # Set the possibilities
+            possibilities = [
+                ("Quel est le type du mot suivant: « "+word_choosen["word"]+" » ?", word_choosen["type"]),
+                ("Que signifie le mot suivant: « "+word_choosen["word"]+" » ?", word_choosen["trans_word"])
+            ]
+            # Choose a possibility
+            choosen = random.choice(possibilities)
+            content = choosen[0]
+            answer = choosen[1]
+            # If the question is about the type of the word
+            if content[0:4] == "Quel":
+                bad_answers = [word for word in types_of_word if word != word_choosen["type"]][0:3]
+            else:
+                # Get all the french words
+                words = FRENCH_INDEX
+        # If the question is an example question                   
+        elif lesson_type == 2:
+            content = "Quel mot anglais constitue cet exemple « " + word_choosen["trans_examples"][0] + " » ?"
+            answer = word_choosen["word"]
+        # If the question is an image question (the image is searched later)
+        elif lesson_type == 3:
+            content = ""
+            answer = word_choosen["word"]
+        # If the question is an audio question
+        elif lesson_type == 4:
+            content = "/dashboard/games/quiz/"+self.id+"/audio" # Set the audio URL
+            audio = word_choosen["examples"][0]
+            answer = word_choosen["word"]
+        
+        # Use the similar words stored with the list, or search them later if they have not been stored
+        if not bad_answers:
+            bad_answers = word_choosen.get("distractors" if words == ENGLISH_INDEX else "trans_distractors")
+        
+        return {
+            "type": lesson_type,
+            "words": word_choosen,
+            "answer": answer,
+            "bad_answers": bad_answers,
+            "dictionary": words,
+            "content": content,
+            "audio": audio,
+            "image": image
+        }
+        
+    def _complete_question(self, question):
+        """
+        Set the answers and the HTML content of a question
+        
+        Args:
+            question (dict): The question chosen by _choose_question
+            
+        Returns:
+            dict: The question ready to be asked
+                - type (int): The type of the question
+                - words (dict): The word of the question
+                - answer (int): The position of the answer
+                - answers (list): The answers of the question
+                - html (string): The template of the question
+                - rendered (string): The HTML content of the question
+                - content (string): The content of the question
+                - audio (string): The text of the audio question
+                - image (string): The URL of the image question
+        """
+        word_choosen = question["words"]
+        lesson_type = question["type"]
+        content = question["content"]
+        answer = question["answer"]
+        bad_answers = question["bad_answers"]
+        
+        # Without enough wrong answers (or without image), ask the type of the word
+        if not bad_answers or len(bad_answers) < 3 or (lesson_type == 3 and not question["image"]):
+            content = "Quel est le type du mot suivant: « "+word_choosen["word"]+" » ?"
+            lesson_type = 1
+            answer = word_choosen["type"]
+            bad_answers = [word for word in types_of_word if word != word_choosen["type"]]
+        bad_answers = bad_answers[0:3]
+        
+        # Set the HTML content of the question
+        html = 'games/quiz-content/'+str(quiz_types[lesson_type-1]["type"])+'.html'
+
+        # Choose the position of the answer
+        position = random.randint(1, 4)
+        answers = bad_answers[0:position-1] + [answer] + bad_answers[position-1:]
+        
+        return {
+            "type": lesson_type,
+            "words": word_choosen,
+            "answer": position,
+            "answers": answers,
+            "html": html,
+            "rendered": render_template(html, question_content=content),
+            "content": content,
+            "audio": question["audio"] if lesson_type == 4 else "",
+            "image": question["image"] if lesson_type == 3 else ""
+        }
+
     def ask_next_question(self, correct=False):
         """
         Get the next question
@@ -175,142 +372,21 @@ class quiz():
         """
         # Check if there are remaining words
         if len(self.words_to_check) > 0:
-            # Choose the type of the question
-            word_choosen = random.choice(self.words_to_check)
-            is_example = word_choosen["examples"] # Check if the word has examples
-            is_type_noun = word_choosen["type"] == "noun" # Check if the word is a noun
-             
-            # According to the data of the word, choose the type of the question
-            if is_example and is_type_noun:
-                lesson_type = random.choice([2, 3, 4])
-            elif is_example:
-                lesson_type = random.choice([1, 2, 4])
-            elif is_type_noun:
-                lesson_type = random.choice([1, 3])
-            else:
-                lesson_type = 1
-        
-            # Get all the english words
-            words = 'static/similar_words_levenshtein'
+            # Prepare the questions if they have not been prepared at the start of the game
+            if not self.deck:
+                self.prepare_deck()
             
-            audio = ""
-            image = ""
-            bad_answers = []
-            # If the question is a simple question
-            if lesson_type == 1:
-                # Set the possibilities
-                possibilities = [
-                    ("Quel est le type du mot suivant: « "+word_choosen["word"]+" » ?", word_choosen["type"]),
-                    ("Que signifie le mot suivant: « "+word_choosen["word"]+" » ?", word_choosen["trans_word"])
-                ]
-                # Choose a possibility
-                choosen = random.choice(possibilities)
-                content = choosen[0]
-                answer = choosen[1]
-                # If the question is about the type of the word
-                if content[0:4] == "Quel":
-                    types_of_word = ["adjective", "adverb", "conjunction", "interjection", "noun", "preposition", "pronoun", "verb"]
-                    bad_answers = [word for word in types_of_word if word != word_choosen["type"]][0:3]
-                else:
-                    # Get all the french words
-                    words = 'static/similar_mots_levenshtein'
-            # If the question is an example question                   
-            elif lesson_type == 2:
-                content = "Quel mot anglais constitue cet exemple « " + word_choosen["trans_examples"][0] + " » ?"
-                answer = word_choosen["word"]
-            # If the question is an image question
-            elif lesson_type == 3:
-                content = self.get_image(word_choosen["word"]) # Get the image
-                image = content
-                answer = word_choosen["word"]
-            # If the question is an audio question
-            elif lesson_type == 4:
-                content = "/dashboard/games/quiz/"+self.id+"/audio" # Set the audio URL
-                audio = word_choosen["examples"][0]
-                answer = word_choosen["word"]
-                
-            def get_similar_words(file_path, word, max_len):
-                """
-                Use the dichotomic search to find the word in the list of words
-                
-                Args:
-                    word (string): The word to search
-                    
-                Returns:
-                    string: The list of similar words
-                """
-                # Set the list of words
-                min_len = 0
-                max_len = max_len
-                if file_path == "static/similar_words_levenshtein":
-                    if word < "micronization":
-                        file_path = str(os.getenv("DIRECTORY_PATH")) + file_path + "_1.txt"
-                    else:
-                        file_path = str(os.getenv("DIRECTORY_PATH")) + file_path + "_2.txt"
-                else:
-                    if word < "grand-mamans":
-                        file_path = str(os.getenv("DIRECTORY_PATH")) + file_path + "_1.txt"
-                        max_len = 185053
-                    else:
-                        file_path = str(os.getenv("DIRECTORY_PATH")) + file_path + "_2.txt"
-                while min_len < max_len:
-                    mid = (min_len + max_len) // 2
-                    line = linecache.getline(file_path, mid).split(":")
-                    if str(line[0]) == word:
-                        return line[1]
-                    elif str(line[0]) < word:
-                        min_len = mid + 1
-                    else:
-                        max_len = mid
-                return None
-            
-            # If the bad answers are not set
-            if not bad_answers:
-                max_len = 185052 if words == 'static/similar_words_levenshtein' else 168266
-                bad_answers = get_similar_words(words, answer, max_len)
-                if bad_answers:
-                    bad_answers = bad_answers.split(",")[0:3]
-                else:
-                    content = "Quel est le type du mot suivant: « "+word_choosen["word"]+" » ?"
-                    lesson_type = 1
-                    answer = word_choosen["type"]
-                    types_of_word = ["adjective", "adverb", "conjunction", "interjection", "noun", "preposition", "pronoun", "verb"]
-                    bad_answers = [word for word in types_of_word if word != word_choosen["type"]][0:3]
-            
-            # Set the HTML content of the question
-            html = 'games/quiz-content/'+str(quiz_types[lesson_type-1]["type"])+'.html'
- 
             last_position = self.current_quiz["answer"] if self.current_quiz else 0
-            # Choose the position of the answer
-            position = random.randint(1, 4)
-            answers = []
-            
-            # Set the answers
-            while len(answers) < 4:
-                if len(answers) == position-1:
-                    answers.append(answer)
-                else:
-                    answers.append(bad_answers.pop(0))
-
-            # Store the current question    
-            self.current_quiz = {
-                "type": lesson_type,
-                "words": word_choosen,
-                "answer": position,
-                "answers": answers,
-                "html": html,
-                "content": content,
-                "audio": audio,
-                "image": image
-            }
+            # Store the current question
+            self.current_quiz = self.deck.pop(0)
             
             # Return the response
             return jsonify({
                 "code": 200,
                 "message": "correct" if correct else "incorrect",
                 "result": {
-                    "html": render_template(html, question_content=content),
-                    "answers": answers,
+                    "html": self.current_quiz["rendered"],
+                    "answers": self.current_quiz["answers"],
                     "last_position": last_position,
                     "score": len(self.words) - len(self.words_to_check) - self.faults,
                     "remaining": len(self.words_to_check),
@@ -323,30 +399,15 @@ class quiz():
         
     def get_image(self, word):
         """
-        Get an image from Google
+        Get the thumbnail of the image of a word (from the image cache, or from Google)
         
         Args:
             word (string): The word to search
             
         Returns:
-            string: The URL of the image
+            string: The key of the thumbnail, or None if there is no image
         """
-        # Set the Google API key and the search engine ID
-        gis = GoogleImagesSearch(os.environ.get('GOOGLE_SEARCH_API_KEY'), os.environ.get('GOOGLE_SEARCH_ENGINE_ID'))
-        # Set the search parameterss
-        _search_params = {
-            'q': ''+word+'+illustration',
-            'num': 1,
-            'fileType': 'jpg|gif|png',
-            'safe': 'safeUndefined',
-            'imgColorType': 'imgColorTypeUndefined',
-            'imgType': 'photo',
-        }
-
-        # Get the image
-        gis.search(search_params=_search_params)
-        for image in gis.results():
-            return image.url
+        return get_thumbnail(get_image_url(word))
     
     def get_remaning_time(self):
         """
@@ -446,6 +507,9 @@ class quiz():
             # Save the results in the database
             cursor.execute("INSERT INTO lessons_log (user_id, list_id, lesson_id, xp, lost_lives, time) VALUES (%s, %s, %s, %s, %s, %s)", (current_user.id, self.list_id, self.lesson_id, xp, lives_to_lose, time_passed))
             cursor.execute("INSERT INTO user_statements SET user_id= %s, transaction_type = 'xp', transaction = %s", ( current_user.id, xp))
+            # Update the user's daily targets if the lesson has been completed
+            if lives_to_lose == 0:
+                refresh_targets(cursor, current_user.id)
             conn.commit()
             
             response = jsonify({
@@ -507,6 +571,7 @@ class quiz():
         to_extract.start = json_dict["start"]
         to_extract.current_quiz = json_dict["current_quiz"]
         to_extract.faults = json_dict["faults"]
+        to_extract.deck = json_dict.get("deck", [])
         return to_extract    
 
 
@@ -580,11 +645,13 @@ def index(list_id):
     for index, game in enumerate(list_result["lessons"]):
         if index == 0 and game["lesson_id"] == quiz_id:
             game = quiz(list_result["id"], game["id"], list_result["words"])
+            game.prepare_deck()
             id = game.id
             session['game'] = game.to_json()
             return redirect(url_for('quiz.start', session_id=id))
         elif index > 0 and list_result["lessons"][index-1]["completed"] == 1 and game["lesson_id"] == quiz_id:
             game = quiz(list_result["id"], game["id"], list_result["words"])
+            game.prepare_deck()
             id = game.id
             session['game'] = game.to_json()
             return redirect(url_for('quiz.start', session_id=id))
@@ -640,17 +707,17 @@ def audio(session_id):
     
     # Check if the audio exists
     if game.current_quiz["audio"]:
-        # Generate the audio
-        tts = gTTS(game.current_quiz["audio"], lang='en')
-        # Save the audio in a BytesIO object
-        audio_bytes = BytesIO()
-        # Write the audio in the BytesIO object
-        tts.write_to_fp(audio_bytes)
-        # Set the position of the BytesIO object to 0
-        audio_bytes.seek(0)
-        
-        # Return the audio
-        return Response(audio_bytes, mimetype="audio/mp3")
+        # Return the audio (synthesized only if it is not in the cache)
+        try:
+            return send_audio(game.current_quiz["audio"], lang='en')
+        except (requests.exceptions.RequestException, gTTSError) as e:
+            # The TTS service is unavailable (or its circuit breaker is open): the game goes on without audio
+            logging.error("Error while generating the audio: " + str(e))
+            return jsonify({
+                "code": 503,
+                "message": "Le fichier audio n'est pas disponible pour le moment!",
+                "result": []
+            }), 503
     return jsonify({
         "code": 404,
         "message": "Le fichier audio a été trouvé!",
@@ -0,0 +1,367 @@
+"""
+This module contains the HTTP client of the calls to the external services (Collins, Google, gTTS, images).
+
+Each service has its own session, so the connections are kept alive and reused (one pool per host),
+with its own connect and read timeouts and its own number of retries (UPSTREAMS).
+The client libraries using their own connections (gTTS) only use the timeouts and the circuit breaker of their service (guard).
+The latency of each service is counted in a histogram (LATENCY_BUCKETS, in seconds).
+The services with a circuit breaker are not called anymore when too many of their last calls failed:
+    - the breaker opens when BREAKER_FAILURE_RATE of the last BREAKER_WINDOW calls failed,
+    - it lets one call through after BREAKER_OPEN_SECONDS (half-open), and closes again if this call succeeds,
+    - while it is open, the calls fail immediately with CircuitOpenError, so the callers use their fallback.
+
+Imports:
+    - requests: For the HTTP requests.
+    - urllib3: For the retries.
+    - metrics: For exposing the latency of the services.
+    - collections: For the last calls of the circuit breakers.
+    - threading: For protecting the sessions and the histograms.
+    - time: For measuring the latency.
+
+Classes:
+    - CircuitOpenError: The error of a call to a service whose circuit breaker is open.
+    - CircuitBreaker: The circuit breaker of a service.
+
+Functions:
+    - get_session: Get the session of a service.
+    - get_timeout: Get the timeouts of a service.
+    - get: Send a GET request to a service.
+    - guard: Call a client library of a service through its circuit breaker.
+    - observe: Count a call to a service in its histogram.
+    - is_available: Check if a service can be called.
+    - get_stats: Get the histograms of the services.
+    - get_breakers: Get the state of the circuit breakers.
+"""
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from metrics import register_metrics
+from collections import deque
+import requests
+import threading
+import time
+
+# The timeouts (in seconds), the number of retries and the circuit breaker of each service
+# (gTTS uses its own connections, so the TTS service has no retries)
+# (the images are downloaded from many hosts, so the failure of one host must not block the others)
+UPSTREAMS = {
+    "collins": {"connect": 3, "read": 10, "retries": 2, "breaker": True},
+    "google_images": {"connect": 3, "read": 10, "retries": 1, "breaker": True},
+    "images": {"connect": 3, "read": 10, "retries": 0, "breaker": False},
+    "tts": {"connect": 3, "read": 15, "breaker": True},
+}
+# Maximum number of connections kept alive per host
+POOL_SIZE = 10
+# The upper bounds of the buckets of the latency histograms, in seconds
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Number of last calls used to compute the failure rate of a service
+BREAKER_WINDOW = 20
+# Minimum number of calls in the window before the breaker can open
+BREAKER_MIN_CALLS = 5
+# Failure rate opening the breaker
+BREAKER_FAILURE_RATE = 0.5
+# Number of seconds before a call is let through an open breaker
+BREAKER_OPEN_SECONDS = 30
+# The client errors counting as failures of the service (rejected key, quota exceeded, rate limit)
+FAILURE_STATUSES = (401, 403, 429)
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """
+    The error of a call to a service whose circuit breaker is open (handled like a connection error).
+    """
+
+
+class CircuitBreaker:
+    """
+    Represents the circuit breaker of a service.
+
+    Attributes:
+        - name (string): The name of the service.
+        - state (string): closed (the calls are sent), open (the calls fail immediately)
+          or half_open (one call is sent to check if the service is back).
+        - opened (int): The number of times the breaker opened.
+        - rejected (int): The number of calls rejected because the breaker was open.
+
+    Methods:
+        - allow: Check if a call can be sent.
+        - is_open: Check if the calls fail immediately.
+        - record: Record the result of a call.
+        - get_state: Get the state of the breaker.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.state = "closed"
+        self.opened = 0
+        self.rejected = 0
+        self._results = deque(maxlen=BREAKER_WINDOW)
+        self._opened_at = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """
+        Check if a call can be sent (only one call at a time when the breaker is half-open).
+
+        Returns:
+            bool: True if the call can be sent.
+        """
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self._opened_at >= BREAKER_OPEN_SECONDS:
+                self.state = "half_open"
+                self._probing = False
+            if self.state == "closed" or (self.state == "half_open" and not self._probing):
+                self._probing = self.state == "half_open"
+                return True
+            self.rejected += 1
+            return False
+
+    def is_open(self):
+        """
+        Check if the calls fail immediately (the breaker is open and no call can be let through yet).
+
+        Returns:
+            bool: True if the breaker is open.
+        """
+        with self._lock:
+            return self.state == "open" and time.monotonic() - self._opened_at < BREAKER_OPEN_SECONDS
+
+    def record(self, success):
+        """
+        Record the result of a call, and open or close the breaker.
+
+        Args:
+            success (bool): If the call succeeded.
+        """
+        with self._lock:
+            if self.state == "half_open":
+                self._probing = False
+                if success:
+                    self.state = "closed"
+                    self._results.clear()
+                else:
+                    self._open()
+                return
+            self._results.append(success)
+            failures = self._results.count(False)
+            if self.state == "closed" and len(self._results) >= BREAKER_MIN_CALLS and failures / len(self._results) >= BREAKER_FAILURE_RATE:
+                self._open()
+
+    def _open(self):
+        self.state = "open"
+        self.opened += 1
+        self._opened_at = time.monotonic()
+        self._results.clear()
+
+    def get_state(self):
+        """
+        Get the state of the breaker.
+
+        Returns:
+            dict: The state of the breaker.
+                - state (string): closed, open or half_open.
+                - failure_rate (float): The failure rate of the last calls.
+                - opened (int): The number of times the breaker opened.
+                - rejected (int): The number of calls rejected because the breaker was open.
+        """
+        with self._lock:
+            failures = self._results.count(False)
+            return {
+                "state": self.state,
+                "failure_rate": round(failures / len(self._results), 3) if self._results else 0.0,
+                "opened": self.opened,
+                "rejected": self.rejected
+            }
+
+
+_sessions = {}
+_histograms = {}
+_breakers = {name: CircuitBreaker(name) for name, upstream in UPSTREAMS.items() if upstream["breaker"]}
+_lock = threading.Lock()
+
+
+def get_session(name):
+    """
+    Get the session of a service (created at the first call).
+
+    The failed connections and the 502, 503 and 504 answers of the idempotent requests are retried,
+    with an exponential backoff.
+
+    Args:
+        name (string): The name of the service (key of UPSTREAMS).
+
+    Returns:
+        requests.Session: The session of the service.
+    """
+    with _lock:
+        session = _sessions.get(name)
+        if session is None:
+            retries = Retry(total=UPSTREAMS[name].get("retries", 0), backoff_factor=0.3,
+                            status_forcelist=(502, 503, 504), raise_on_status=False)
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=retries)
+            session = requests.Session()
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _sessions[name] = session
+        return session
+
+
+def get_timeout(name):
+    """
+    Get the timeouts of a service.
+
+    Args:
+        name (string): The name of the service (key of UPSTREAMS).
+
+    Returns:
+        tuple: The connect and read timeouts, in seconds.
+    """
+    return (UPSTREAMS[name]["connect"], UPSTREAMS[name]["read"])
+
+
+def observe(name, seconds, error=False):
+    """
+    Count a call to a service in its histogram.
+
+    Args:
+        name (string): The name of the service.
+        seconds (float): The latency of the call.
+        error (bool): If the call failed.
+    """
+    with _lock:
+        histogram = _histograms.setdefault(name, {"count": 0, "errors": 0, "sum": 0.0, "buckets": [0] * (len(LATENCY_BUCKETS) + 1)})
+        histogram["count"] += 1
+        histogram["sum"] += seconds
+        if error:
+            histogram["errors"] += 1
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                break
+        else:
+            index = len(LATENCY_BUCKETS)
+        histogram["buckets"][index] += 1
+
+
+def is_available(name):
+    """
+    Check if a service can be called (its circuit breaker is not open).
+
+    Args:
+        name (string): The name of the service (key of UPSTREAMS).
+
+    Returns:
+        bool: False if the calls to the service fail immediately.
+    """
+    breaker = _breakers.get(name)
+    return breaker is None or not breaker.is_open()
+
+
+def _call(name, func, *args, **kwargs):
+    breaker = _breakers.get(name)
+    if breaker and not breaker.allow():
+        raise CircuitOpenError(f"The circuit breaker of {name} is open")
+    kwargs.setdefault('timeout', get_timeout(name))
+    start = time.perf_counter()
+    try:
+        response = func(*args, **kwargs)
+    except Exception:
+        observe(name, time.perf_counter() - start, error=True)
+        if breaker:
+            breaker.record(False)
+        raise
+    observe(name, time.perf_counter() - start, error=response.status_code >= 500)
+    if breaker:
+        # The rate limits and the rejected keys (quota exceeded, revoked key) count as failures
+        breaker.record(response.status_code < 500 and response.status_code not in FAILURE_STATUSES)
+    return response
+
+
+def get(name, url, **kwargs):
+    """
+    Send a GET request to a service.
+
+    Args:
+        name (string): The name of the service (key of UPSTREAMS).
+        url (string): The URL of the request.
+        **kwargs: The arguments of requests (the timeouts of the service are used by default).
+
+    Returns:
+        requests.Response: The response (the latency is counted until the headers are received).
+
+    Raises:
+        requests.exceptions.RequestException: If the service did not answer.
+        CircuitOpenError: If the circuit breaker of the service is open.
+    """
+    return _call(name, get_session(name).get, url, **kwargs)
+
+
+def guard(name, func, *args, **kwargs):
+    """
+    Call a client library of a service (gTTS for example) through its circuit breaker.
+
+    The library uses its own connections and timeouts: any exception of the call counts as a failure of the service.
+
+    Args:
+        name (string): The name of the service (key of UPSTREAMS).
+        func (function): The function calling the service.
+        *args, **kwargs: The arguments of the function.
+
+    Returns:
+        The result of the function.
+
+    Raises:
+        Exception: The error of the function.
+        CircuitOpenError: If the circuit breaker of the service is open.
+    """
+    breaker = _breakers.get(name)
+    if breaker and not breaker.allow():
+        raise CircuitOpenError(f"The circuit breaker of {name} is open")
+    start = time.perf_counter()
+    try:
+        result = func(*args, **kwargs)
+    except Exception:
+        observe(name, time.perf_counter() - start, error=True)
+        if breaker:
+            breaker.record(False)
+        raise
+    observe(name, time.perf_counter() - start)
+    if breaker:
+        breaker.record(True)
+    return result
+
+
+def get_stats():
+    """
+    Get the latency histograms of the services since the start of the process.
+
+    Returns:
+        dict: The histogram of each service.
+            - count (int): The number of calls.
+            - errors (int): The number of calls without answer or with a 5xx answer.
+            - sum (float): The total latency, in seconds.
+            - buckets (dict): The number of calls with a latency lower than each bound (cumulative, "+Inf" for all).
+    """
+    with _lock:
+        histograms = {name: dict(histogram, buckets=list(histogram["buckets"])) for name, histogram in _histograms.items()}
+    stats = {}
+    for name, histogram in histograms.items():
+        buckets = {}
+        total = 0
+        for bound, count in zip(list(LATENCY_BUCKETS) + ["+Inf"], histogram["buckets"]):
+            total += count
+            buckets[str(bound)] = total
+        stats[name] = {"count": histogram["count"], "errors": histogram["errors"], "sum": round(histogram["sum"], 3), "buckets": buckets}
+    return stats
+
+
+def get_breakers():
+    """
+    Get the state of the circuit breakers.
+
+    Returns:
+        dict: The state of the breaker of each service (see CircuitBreaker.get_state).
+    """
+    return {name: breaker.get_state() for name, breaker in _breakers.items()}
+
+
+register_metrics("http", get_stats)
+register_metrics("breakers", get_breakers)
@@ -0,0 +1,189 @@
+"""
+This module contains the cache of the images of the words (used by the image questions of the quiz).
+
+The URL of the image of each word is stored in the image_cache table, shared by every process:
+    - an image is kept for IMAGE_TTL days, a search without result for NEGATIVE_TTL days,
+    - the table is limited to MAX_ENTRIES words, the least recently used ones are deleted first.
+The hits and misses of the process are counted.
+
+Imports:
+    - root: For the connection to the database.
+    - metrics: For exposing the counters of the cache.
+    - http_client: For searching images on Google.
+    - threading: For protecting the counters.
+    - logging: For logging errors.
+
+Functions:
+    - normalize_word: Normalize a word before searching its image.
+    - search_image: Search the image of a word on Google.
+    - get_image_url: Get the image of a word, from the cache if possible.
+    - get_stats: Get the counters of the cache.
+"""
+from root import *
+from metrics import register_metrics
+import http_client
+import threading
+import logging
+
+# Number of days an image is kept
+IMAGE_TTL = 30
+# Number of days a search without result is kept
+NEGATIVE_TTL = 1
+# Maximum number of words in the cache
+MAX_ENTRIES = 20000
+# Number of new words between two evictions
+EVICTION_INTERVAL = 100
+# The Custom Search API
+SEARCH_URL = 'https://www.googleapis.com/customsearch/v1'
+
+_stats = {"hits": 0, "negative_hits": 0, "misses": 0, "errors": 0, "unavailable": 0, "evicted": 0}
+_stored = 0
+_lock = threading.Lock()
+
+
+def normalize_word(word):
+    """
+    Normalize a word before searching its image.
+
+    Args:
+        word (string): The word.
+
+    Returns:
+        string: The normalized word.
+    """
+    return " ".join(word.lower().split())
+
+
+def search_image(word):
+    """
+    Search the image of a word on Google.
+
+    Args:
+        word (string): The word to search.
+
+    Returns:
+        string: The URL of the image, or None if there is no result.
+    """
+    # Search the image with the Custom Search API
+    params = {
+        'key': os.environ.get('GOOGLE_SEARCH_API_KEY'),
+        'cx': os.environ.get('GOOGLE_SEARCH_ENGINE_ID'),
+        'q': ''+word+'+illustration',
+        'searchType': 'image',
+        'num': 1,
+        'fileType': 'jpg|gif|png',
+        'safe': 'off',
+        'imgType': 'photo',
+    }
+    response = http_client.get("google_images", SEARCH_URL, params=params)
+    response.raise_for_status()
+
+    # Get the image
+    for image in response.json().get('items', []):
+        return image['link']
+    return None
+
+
+def _count(counter, value=1):
+    with _lock:
+        _stats[counter] += value
+
+
+def _evict(cursor):
+    """
+    Delete the least recently used words if the cache is full.
+
+    Args:
+        cursor (mysql.connector.cursor.MySQLCursor): The cursor of the connection.
+    """
+    cursor.execute("DELETE FROM image_cache WHERE expires_at < NOW()")
+    evicted = cursor.rowcount
+    cursor.execute("SELECT COUNT(*) FROM image_cache")
+    extra = cursor.fetchone()[0] - MAX_ENTRIES
+    if extra > 0:
+        cursor.execute("DELETE FROM image_cache ORDER BY last_used_at LIMIT %s", (extra,))
+        evicted += cursor.rowcount
+    _count("evicted", evicted)
+
+
+def get_image_url(word):
+    """
+    Get the image of a word, from the cache if possible.
+
+    The errors of the search are not cached, the searches without result are.
+
+    Args:
+        word (string): The word.
+
+    Returns:
+        string: The URL of the image, or None if there is no image.
+    """
+    global _stored
+    word = normalize_word(word)
+    conn = None
+    cursor = None
+    try:
+        conn = create_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT url FROM image_cache WHERE word = %s AND expires_at > NOW()", (word,))
+        result = cursor.fetchone()
+        if result:
+            cursor.execute("UPDATE image_cache SET last_used_at = NOW() WHERE word = %s", (word,))
+            conn.commit()
+            _count("hits" if result[0] else "negative_hits")
+            return result[0]
+
+        _count("misses")
+        try:
+            url = search_image(word)
+        except http_client.CircuitOpenError:
+            # Google is unavailable, the question is asked without image
+            _count("unavailable")
+            return None
+        except Exception as e:
+            logging.error(f"Error while searching the image of {word}: {e}")
+            _count("errors")
+            return None
+
+        ttl = IMAGE_TTL if url else NEGATIVE_TTL
+        cursor.execute("REPLACE INTO image_cache (word, url, expires_at) VALUES (%s, %s, NOW() + INTERVAL %s DAY)", (word, url, ttl))
+        with _lock:
+            _stored += 1
+            evict = _stored % EVICTION_INTERVAL == 0
+        if evict:
+            _evict(cursor)
+        conn.commit()
+        return url
+    except mysql.connector.Error as e:
+        logging.error(f"Error while reading the image cache: {e}")
+        _count("errors")
+        return None
+    finally:
+        if cursor:
+            cursor.close()
+        if conn:
+            conn.close()
+
+
+def get_stats():
+    """
+    Get the counters of the cache since the start of the process.
+
+    Returns:
+        dict: The counters of the cache.
+            - hits (int): The number of images found in the cache.
+            - negative_hits (int): The number of searches without result found in the cache.
+            - misses (int): The number of images searched on Google.
+            - errors (int): The number of errors.
+            - unavailable (int): The number of searches not sent because Google was unavailable.
+            - evicted (int): The number of words deleted from the cache.
+            - hit_rate (float): The proportion of requests answered by the cache.
+    """
+    with _lock:
+        stats = dict(_stats)
+    total = stats["hits"] + stats["negative_hits"] + stats["misses"]
+    stats["hit_rate"] = round((stats["hits"] + stats["negative_hits"]) / total, 3) if total else 0.0
+    return stats
+
+
+register_metrics("image_cache", get_stats)
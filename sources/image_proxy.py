@@ -0,0 +1,263 @@
+"""
+This module contains the image proxy of the application (used by the image questions of the quiz).
+
+Each remote image is downloaded once, downscaled to a thumbnail and stored on disk under the hash
+of its content, so the pages only load images from our origin, at a predictable size.
+    - the thumbnails are stored in IMAGE_CACHE_DIR, the URLs already downloaded in IMAGE_CACHE_DIR/urls,
+    - the cache is limited to IMAGE_CACHE_SIZE megabytes, the least recently used thumbnails are deleted first,
+    - the thumbnails never change (their name is their hash), so they are served with long-lived cache headers.
+
+Imports:
+    - flask: For serving the thumbnails.
+    - root: For the environment variables.
+    - metrics: For exposing the counters of the proxy.
+    - PIL: For downscaling the images.
+    - http_client: For downloading the images.
+    - hashlib: For the names of the files.
+    - io: For reading the downloaded images.
+    - re: For checking the names of the thumbnails.
+    - threading: For downloading each image once.
+    - logging: For logging errors.
+
+Functions:
+    - get_thumbnail: Get the thumbnail of a remote image, downloading it if necessary.
+    - evict: Delete the least recently used thumbnails if the cache is full.
+    - get_stats: Get the counters of the proxy.
+
+Blueprints:
+    - image_proxy_bp: The blueprint of the thumbnails route.
+"""
+from flask import Blueprint, send_file, abort
+from root import *
+from metrics import register_metrics
+from PIL import Image
+import http_client
+import hashlib
+import io
+import re
+import threading
+import logging
+
+# The directory of the thumbnails
+IMAGE_CACHE_DIR = os.getenv('IMAGE_CACHE_DIR', '/tmp/word_quest_images')
+# Maximum size of the cache in megabytes
+IMAGE_CACHE_SIZE = int(os.getenv('IMAGE_CACHE_SIZE', 200))
+# Maximum size of the thumbnails in pixels
+THUMBNAIL_SIZE = (400, 300)
+# Maximum size of a downloaded image in bytes
+MAX_IMAGE_BYTES = 5 * 1024 * 1024
+# Number of new thumbnails between two evictions
+EVICTION_INTERVAL = 50
+# Number of seconds the browsers keep a thumbnail
+CACHE_MAX_AGE = 365 * 24 * 3600
+
+_stats = {"hits": 0, "downloads": 0, "errors": 0, "evicted": 0}
+_stored = 0
+_lock = threading.Lock()
+# The locks of the URLs being downloaded
+_downloads = {}
+
+_KEY = re.compile(r'^[0-9a-f]{64}$')
+
+
+def _count(counter, value=1):
+    with _lock:
+        _stats[counter] += value
+
+
+def _thumbnail_path(key):
+    return os.path.join(IMAGE_CACHE_DIR, key + '.jpg')
+
+
+def _reference_path(url):
+    return os.path.join(IMAGE_CACHE_DIR, 'urls', hashlib.sha256(url.encode('utf-8')).hexdigest())
+
+
+def _write(path, data):
+    """
+    Write a file atomically (the readers never see a partial file).
+    """
+    tmp_path = path + '.' + str(threading.get_ident()) + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _download(url):
+    """
+    Download an image and downscale it.
+
+    Args:
+        url (string): The URL of the image.
+
+    Returns:
+        bytes: The thumbnail (JPEG).
+    """
+    with http_client.get("images", url, stream=True, headers={'User-Agent': 'WordQuest image proxy'}) as response:
+        response.raise_for_status()
+        if not response.headers.get('Content-Type', '').startswith('image/'):
+            raise ValueError(f"not an image ({response.headers.get('Content-Type')})")
+        data = b''
+        for chunk in response.iter_content(64 * 1024):
+            data += chunk
+            if len(data) > MAX_IMAGE_BYTES:
+                raise ValueError("image too large")
+
+    image = Image.open(io.BytesIO(data))
+    image.thumbnail(THUMBNAIL_SIZE)
+    # Put the transparent images on a white background
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.split()[-1])
+        image = background
+    elif image.mode != 'RGB':
+        image = image.convert('RGB')
+    output = io.BytesIO()
+    image.save(output, 'JPEG', quality=85, optimize=True)
+    return output.getvalue()
+
+
+def get_thumbnail(url):
+    """
+    Get the thumbnail of a remote image, downloading it if necessary.
+
+    Each URL is downloaded once, even if several threads ask for it at the same time.
+
+    Args:
+        url (string): The URL of the image.
+
+    Returns:
+        string: The key of the thumbnail (the hash of its content), or None if the image is unavailable.
+    """
+    global _stored
+    if not url:
+        return None
+    reference = _reference_path(url)
+    with _lock:
+        url_lock = _downloads.setdefault(reference, threading.Lock())
+    try:
+        with url_lock:
+            # Already downloaded
+            try:
+                with open(reference, 'r') as f:
+                    key = f.read().strip()
+                if os.path.exists(_thumbnail_path(key)):
+                    _count("hits")
+                    return key
+            except OSError:
+                pass
+
+            try:
+                thumbnail = _download(url)
+            except Exception as e:
+                logging.error(f"Error while downloading the image {url}: {e}")
+                _count("errors")
+                return None
+
+            key = hashlib.sha256(thumbnail).hexdigest()
+            os.makedirs(os.path.dirname(reference), exist_ok=True)
+            _write(_thumbnail_path(key), thumbnail)
+            _write(reference, key.encode('utf-8'))
+    finally:
+        with _lock:
+            _downloads.pop(reference, None)
+
+    with _lock:
+        _stats["downloads"] += 1
+        _stored += 1
+        check = _stored % EVICTION_INTERVAL == 0
+    if check:
+        evict()
+    return key
+
+
+def evict():
+    """
+    Delete the least recently used thumbnails if the cache is full (until it is 90% full),
+    and the references to the deleted thumbnails.
+    """
+    try:
+        thumbnails = []
+        for entry in os.scandir(IMAGE_CACHE_DIR):
+            if entry.is_file() and entry.name.endswith('.jpg'):
+                stat = entry.stat()
+                thumbnails.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for mtime, size, path in thumbnails)
+        limit = IMAGE_CACHE_SIZE * 1024 * 1024
+        if total <= limit:
+            return
+
+        evicted = 0
+        for mtime, size, path in sorted(thumbnails):
+            if total <= limit * 0.9:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                evicted += 1
+            except OSError:
+                pass
+        _count("evicted", evicted)
+
+        for entry in os.scandir(os.path.join(IMAGE_CACHE_DIR, 'urls')):
+            try:
+                with open(entry.path, 'r') as f:
+                    key = f.read().strip()
+                if not os.path.exists(_thumbnail_path(key)):
+                    os.remove(entry.path)
+            except OSError:
+                pass
+    except OSError as e:
+        logging.error(f"Error while cleaning the image cache: {e}")
+
+
+def get_stats():
+    """
+    Get the counters of the proxy since the start of the process.
+
+    Returns:
+        dict: The counters of the proxy.
+            - hits (int): The number of images found in the cache.
+            - downloads (int): The number of images downloaded.
+            - errors (int): The number of images that could not be downloaded.
+            - evicted (int): The number of thumbnails deleted from the cache.
+    """
+    with _lock:
+        return dict(_stats)
+
+
+register_metrics("image_proxy", get_stats)
+
+
+image_proxy_bp = Blueprint('image_proxy', __name__)
+"""
+The blueprint of the thumbnails route.
+
+Routes:
+    - /images/<key>.jpg: Get a thumbnail.
+"""
+
+@image_proxy_bp.route('/images/<string:key>.jpg')
+def thumbnail(key):
+    """
+    Get a thumbnail.
+
+    Args:
+        key (string): The key of the thumbnail (the hash of its content).
+
+    Returns:
+        flask.Response: The thumbnail, cached by the browsers for a year.
+        abort: Return a 404 error if the thumbnail does not exist.
+    """
+    if not _KEY.match(key):
+        abort(404)
+    path = _thumbnail_path(key)
+    try:
+        # Mark the thumbnail as recently used
+        os.utime(path)
+    except OSError:
+        abort(404)
+    response = send_file(path, mimetype='image/jpeg', etag=key, conditional=True, max_age=CACHE_MAX_AGE)
+    response.headers['Cache-Control'] = f'public, max-age={CACHE_MAX_AGE}, immutable'
+    return response
@@ -0,0 +1,93 @@
+"""
+This module contains the cache of the images attached to the outgoing emails.
+
+Each image is read and base64-encoded once, and the encoded MIME part is reused by every email.
+The file is reloaded when its modification time changes.
+The cached parts are shared between the emails: they must not be modified.
+
+Imports:
+    - email.mime.image: MIMEImage class for creating email messages.
+    - os: For the modification time of the files.
+    - threading: For protecting the cache.
+    - time: For limiting the number of modification time checks.
+    - logging: For logging errors.
+
+Functions:
+    - get_image: Get the MIME part of an image.
+    - preload: Load and encode images in advance.
+"""
+from email.mime.image import MIMEImage
+import os
+import threading
+import time
+import logging
+
+# Minimum number of seconds between two modification time checks of the same file
+CHECK_INTERVAL = 5
+
+# The cached parts, indexed by (path, content_id)
+_cache = {}
+_lock = threading.Lock()
+
+
+def _load(path, content_id):
+    """
+    Read and encode an image.
+
+    Args:
+        path (string): The path to the image.
+        content_id (string): The Content-ID of the image in the email.
+
+    Returns:
+        dict: The cache entry.
+            - part (MIMEImage): The encoded MIME part.
+            - mtime (float): The modification time of the file.
+            - checked (float): The time of the last modification time check.
+    """
+    mtime = os.stat(path).st_mtime
+    with open(path, 'rb') as fp:
+        part = MIMEImage(fp.read())
+    part.add_header('Content-ID', '<{}>'.format(content_id))
+    return {"part": part, "mtime": mtime, "checked": time.monotonic()}
+
+
+def get_image(path, content_id):
+    """
+    Get the MIME part of an image.
+
+    Args:
+        path (string): The path to the image.
+        content_id (string): The Content-ID of the image in the email.
+
+    Returns:
+        MIMEImage: The encoded MIME part, shared between the emails.
+    """
+    key = (path, content_id)
+    with _lock:
+        entry = _cache.get(key)
+    now = time.monotonic()
+    if entry is not None:
+        if now - entry["checked"] < CHECK_INTERVAL:
+            return entry["part"]
+        # Reload the image if the file has changed
+        if os.stat(path).st_mtime == entry["mtime"]:
+            entry["checked"] = now
+            return entry["part"]
+    entry = _load(path, content_id)
+    with _lock:
+        _cache[key] = entry
+    return entry["part"]
+
+
+def preload(images):
+    """
+    Load and encode images in advance.
+
+    Args:
+        images (list): The images to load, as (path, content_id) tuples.
+    """
+    for path, content_id in images:
+        try:
+            get_image(path, content_id)
+        except OSError as e:
+            logging.error(f'Error while loading email image {path}: {e}')
@@ -0,0 +1,332 @@
+"""
+This module contains the mail transport of the application.
+
+The transport keeps authenticated SMTP sessions open and reuses them across messages,
+instead of opening a new connection (and doing STARTTLS and login) for every email.
+Sessions that have been idle for too long or that have been closed by the server are reopened.
+Batches of messages are sent over a bounded pool of worker threads.
+
+Imports:
+    - smtplib: SMTP protocol client.
+    - dotenv: For loading the environment variables.
+    - queue: For storing the idle SMTP sessions.
+    - threading: For protecting the counters and the token buckets.
+    - concurrent.futures: For the pool of send workers.
+    - os: For the environment variables.
+    - time: For measuring the idle time and the throughput.
+    - logging: For logging errors.
+
+Classes:
+    - TokenBucket: Limit the rate of an action with a token bucket.
+    - MailTransport: Send emails over a pool of persistent SMTP sessions.
+
+Functions:
+    - set_transport: Replace the mail transport of the process.
+    - get_transport: Get the mail transport of the process.
+"""
+import smtplib
+from dotenv import load_dotenv
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import os
+import time
+import logging
+
+load_dotenv()
+
+# SMTP relay used to send the emails
+SMTP_HOST = os.getenv('SMTP_HOST', 'smtp.ionos.fr')
+SMTP_PORT = int(os.getenv('SMTP_PORT', 587))
+SMTP_USER = os.getenv('SMTP_USER', 'no-reply@word-quest.com')
+SMTP_PASSWORD = os.getenv('SMTP_PASSWORD', os.getenv('EMAILING_SERVICE_PASSWORD'))
+SMTP_STARTTLS = os.getenv('SMTP_STARTTLS', '1') == '1'
+
+# Maximum number of SMTP sessions (and send workers) of the process
+MAX_CONNECTIONS = 4
+# Number of seconds after which an idle SMTP session is reopened
+MAX_IDLE_TIME = 60
+
+
+class TokenBucket:
+    """
+    Limit the rate of an action with a token bucket.
+
+    The bucket is refilled continuously at the given rate, up to its capacity (the burst).
+    Each action takes one token, and waits if the bucket is empty.
+
+    Attributes:
+        - rate: The number of tokens added per second.
+        - burst: The maximum number of tokens in the bucket.
+
+    Methods:
+        - acquire: Take a token, waiting if necessary.
+    """
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Take a token, waiting if necessary.
+
+        Returns:
+            float: The number of seconds waited.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class MailTransport:
+    """
+    Send emails over a pool of persistent SMTP sessions.
+
+    Attributes:
+        - host: The SMTP host.
+        - port: The SMTP port.
+        - user: The SMTP login.
+        - password: The SMTP password (no login if None).
+        - starttls: Whether the session is upgraded with STARTTLS.
+        - max_connections: The maximum number of SMTP sessions.
+        - max_idle_time: The number of seconds after which an idle session is reopened.
+
+    Methods:
+        - send: Send one email.
+        - send_many: Send many emails over the pool of workers.
+        - get_stats: Get the counters of the transport.
+        - close: Close all the idle SMTP sessions.
+    """
+    def __init__(self, host, port, user, password, starttls=True, max_connections=MAX_CONNECTIONS, max_idle_time=MAX_IDLE_TIME):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.max_connections = max_connections
+        self.max_idle_time = max_idle_time
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._lock = threading.Lock()
+        self._stats = {"sent": 0, "failed": 0, "connections": 0, "reconnections": 0, "send_time": 0.0}
+
+    def _connect(self):
+        """
+        Open and authenticate a new SMTP session.
+
+        Returns:
+            smtplib.SMTP: The SMTP session.
+        """
+        server = smtplib.SMTP(self.host, self.port, timeout=30)
+        if self.starttls:
+            server.starttls()
+        if self.user and self.password:
+            server.login(self.user, self.password)
+        with self._lock:
+            self._stats["connections"] += 1
+        return server
+
+    def _close(self, server):
+        """
+        Close an SMTP session, ignoring the errors.
+
+        Args:
+            server (smtplib.SMTP): The SMTP session to close.
+        """
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    def _acquire(self):
+        """
+        Get an SMTP session, reusing an idle one if possible.
+
+        Returns:
+            smtplib.SMTP: The SMTP session.
+        """
+        while True:
+            try:
+                server, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            # Reopen the sessions that the server has probably dropped
+            if time.monotonic() - last_used > self.max_idle_time:
+                self._close(server)
+                continue
+            return server
+
+    def _release(self, server):
+        """
+        Give back an SMTP session to the pool and free its slot.
+
+        Args:
+            server (smtplib.SMTP): The SMTP session, or None if it has been closed.
+        """
+        if server is not None:
+            self._idle.put((server, time.monotonic()))
+        self._slots.release()
+
+    def send(self, message):
+        """
+        Send one email.
+
+        If the session has been closed by the server, a new one is opened and the email is sent again.
+
+        Args:
+            message (email.message.Message): The email to send.
+
+        Returns:
+            bool: True if the email was sent successfully, False otherwise.
+        """
+        start = time.monotonic()
+        server = None
+        self._slots.acquire()
+        try:
+            server = self._acquire()
+            try:
+                server.sendmail(message['From'], message['To'], message.as_string())
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError):
+                # Refused by the server (SMTPException is an OSError): the session is fine, do not reconnect
+                raise
+            except (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, OSError):
+                # The session is broken: reconnect and try again once
+                self._close(server)
+                server = None
+                server = self._connect()
+                with self._lock:
+                    self._stats["reconnections"] += 1
+                server.sendmail(message['From'], message['To'], message.as_string())
+            with self._lock:
+                self._stats["sent"] += 1
+                self._stats["send_time"] += time.monotonic() - start
+            return True
+        except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError) as e:
+            # The email has been refused but the session is still usable
+            logging.error(f'Error sending email: {e}')
+            with self._lock:
+                self._stats["failed"] += 1
+                self._stats["send_time"] += time.monotonic() - start
+            return False
+        except Exception as e:
+            logging.error(f'Error sending email: {e}')
+            if server is not None:
+                self._close(server)
+                server = None
+            with self._lock:
+                self._stats["failed"] += 1
+                self._stats["send_time"] += time.monotonic() - start
+            return False
+        finally:
+            self._release(server)
+
+    def send_many(self, messages, rate_limiter=None):
+        """
+        Send many emails over the pool of workers.
+
+        Args:
+            messages (list): The emails to send.
+            rate_limiter (TokenBucket): The limiter of the sending rate, or None to send as fast as possible.
+
+        Returns:
+            dict: The report of the batch.
+                - sent (int): The number of emails sent.
+                - failed (int): The number of emails that could not be sent.
+                - elapsed (float): The duration of the batch in seconds.
+                - rate (float): The throughput of the batch in emails per second.
+                - results (list): True for each email sent successfully, False otherwise.
+        """
+        if rate_limiter is None:
+            send = self.send
+        else:
+            def send(message):
+                rate_limiter.acquire()
+                return self.send(message)
+
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.max_connections) as executor:
+            results = list(executor.map(send, messages))
+        elapsed = time.monotonic() - start
+        sent = sum(1 for result in results if result)
+        return {
+            "sent": sent,
+            "failed": len(results) - sent,
+            "elapsed": round(elapsed, 3),
+            "rate": round(len(results) / elapsed, 2) if elapsed > 0 else 0.0,
+            "results": results
+        }
+
+    def get_stats(self):
+        """
+        Get the counters of the transport since the start of the process.
+
+        Returns:
+            dict: The counters of the transport.
+                - sent (int): The number of emails sent.
+                - failed (int): The number of emails that could not be sent.
+                - connections (int): The number of SMTP sessions opened.
+                - reconnections (int): The number of SMTP sessions reopened after a failure.
+                - rate (float): The throughput of a worker in emails per second.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        total = stats["sent"] + stats["failed"]
+        stats["rate"] = round(total / stats["send_time"], 2) if stats["send_time"] > 0 else 0.0
+        del stats["send_time"]
+        return stats
+
+    def close(self):
+        """
+        Close all the idle SMTP sessions.
+        """
+        while True:
+            try:
+                server, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._close(server)
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+def set_transport(transport):
+    """
+    Replace the mail transport of the process (to send the emails to another relay, a local sink for example).
+
+    Args:
+        transport (MailTransport): The new mail transport.
+    """
+    global _transport
+    with _transport_lock:
+        if _transport is not None:
+            _transport.close()
+        _transport = transport
+
+def get_transport():
+    """
+    Get the mail transport of the process.
+
+    Returns:
+        MailTransport: The mail transport, created on the first call.
+    """
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = MailTransport(SMTP_HOST, SMTP_PORT, SMTP_USER, SMTP_PASSWORD, SMTP_STARTTLS)
+        return _transport
@@ -29,6 +29,9 @@ Imports:
     - discover: The blueprint for the discover routes
     - user_data: The blueprint for the user data routes
     - emailing: The blueprint for the emailing routes
+    - metrics: The blueprint for the metrics route
+    - image_proxy: The blueprint for the thumbnails of the quiz images
+    - outbox: The background sender of the transactional emails
     - models: The User model
     - root: The root of the application
     - os: For handling the environment variables
@@ -49,7 +52,10 @@ from quests import quests_bp
 from discover import discover_bp
 from user_data import user_data_bp
 from emailing import emailing_bp
+from metrics import metrics_bp
+from image_proxy import image_proxy_bp
 from help import help_bp
+from outbox import start_sender_thread
 from models import User
 from root import *
 import os
@@ -116,8 +122,9 @@ csp = {
         '\'unsafe-inline\'' # Low security, but necessary for the use of the library 'typeit'
     ],
     'img-src': [
-        '*', # Super low security, but necessary for the use of the quiz game that looks for images on the web
-        'data:'
+        '\'self\'', # The images of the quiz are served by the image proxy
+        'data:',
+        'https://github.githubassets.com'
     ],
     'frame-src': [
         'https://www.google.com/recaptcha/', 
@@ -173,8 +180,14 @@ app.register_blueprint(discover_bp)
 app.register_blueprint(user_data_bp)
 app.register_blueprint(emailing_bp)
 app.register_blueprint(help_bp)
+app.register_blueprint(metrics_bp)
+app.register_blueprint(image_proxy_bp)
 csrf.exempt(emailing_bp) # Exempt the emailing blueprint from CSRF protection because it uses a POST request from an external source
 
+# Background sender of the transactional emails (unless it runs as a separate process: python outbox.py)
+if os.getenv('OUTBOX_SENDER', 'thread') == 'thread':
+    start_sender_thread()
+
 # Importation of games blueprints
 from games.hangman import hangman_bp
 app.register_blueprint(hangman_bp)
@@ -0,0 +1,110 @@
+"""
+This module contains the metrics of the application (counters of the caches, of the external services...).
+
+The modules register a function returning their counters, and the /api/metrics route returns
+the counters of every registered module of the process.
+
+Imports:
+    - flask: For handling the requests and responses.
+    - functools: For the decorators.
+    - threading: For protecting the registry.
+    - logging: For logging errors.
+    - os: For the token of the scheduled jobs.
+
+Functions:
+    - register_metrics: Register the counters of a module.
+    - get_metrics: Get the counters of every registered module.
+    - token_required: Check that a request comes from our scheduled jobs (x-access-token header).
+
+Blueprints:
+    - metrics_bp: The blueprint of the metrics route.
+"""
+from flask import Blueprint, jsonify, request
+from functools import wraps
+import threading
+import logging
+import os
+
+_registry = {}
+_lock = threading.Lock()
+
+
+def register_metrics(name, func):
+    """
+    Register the counters of a module.
+
+    Args:
+        name (string): The name of the module in the metrics.
+        func (function): The function returning the counters of the module (dict).
+    """
+    with _lock:
+        _registry[name] = func
+
+
+def get_metrics():
+    """
+    Get the counters of every registered module.
+
+    Returns:
+        dict: The counters of each module (None if they could not be read).
+    """
+    with _lock:
+        registry = dict(_registry)
+    metrics = {}
+    for name, func in registry.items():
+        try:
+            metrics[name] = func()
+        except Exception as e:
+            logging.error(f"Error while reading the metrics of {name}: {e}")
+            metrics[name] = None
+    return metrics
+
+
+def token_required(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        """
+        Decorator function to check if the request has a valid token.
+
+        Returns:
+            dict: The response object.
+                - code (int): The status code of the response.
+                    -> 401: Unauthorized.
+                - message (string): The message of the response.
+            function: The decorated function.
+        """
+        token = None
+        # Check if the token is in the request headers
+        if 'x-access-token' in request.headers:
+            token = request.headers['x-access-token'] 
+        if not token:
+            return jsonify({"code": 401, "message": "Unauthorized"}), 401
+        # Check if the token is valid
+        if token != os.environ.get('EMAILING_SERVICE_TOKEN'):
+            return jsonify({"code": 401, "message": "Unauthorized"}), 401
+        return f(*args, **kwargs)
+    return decorated
+
+
+metrics_bp = Blueprint('metrics', __name__)
+"""
+The blueprint of the metrics route.
+
+Routes:
+    - /api/metrics: Get the counters of the process.
+"""
+
+@metrics_bp.route('/api/metrics')
+@token_required
+def metrics():
+    """
+    Get the counters of the process (requires the x-access-token header).
+
+    Returns:
+        dict: The response object.
+            - code (int): The status code of the response.
+                -> 200: Success.
+                -> 401: Unauthorized.
+            - metrics (dict): The counters of each module.
+    """
+    return jsonify({"code": 200, "metrics": get_metrics()}), 200
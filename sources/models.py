@@ -64,7 +64,7 @@ class User(UserMixin):
             list_ids =[lst[0] for lst in lists]
             list_ids = ",".join("'" + str(x) + "'" for x in list_ids)
             
-            cursor.execute('SELECT id, list_id, word, word_type, examples, trans_word, trans_examples FROM list_content WHERE list_id IN ('+ list_ids +')',) # Execute the SQL query.
+            cursor.execute('SELECT id, list_id, word, word_type, examples, trans_word, trans_examples, distractors, trans_distractors FROM list_content WHERE list_id IN ('+ list_ids +')',) # Execute the SQL query.
             words = cursor.fetchall()
             
             cursor.execute('SELECT id, list_id, lesson_id, odr, completed FROM lessons WHERE list_id IN ('+ list_ids +')',) # Execute the SQL query.
@@ -89,7 +89,10 @@ class User(UserMixin):
                             "type": word[3],
                             "examples": json.loads(word[4]),
                             "trans_word": word[5],
-                            "trans_examples": json.loads(word[6])
+                            "trans_examples": json.loads(word[6]),
+                            # The similar words stored with the list (None if they have not been computed)
+                            "distractors": json.loads(word[7]) if word[7] is not None else None,
+                            "trans_distractors": json.loads(word[8]) if word[8] is not None else None
                         })
 
                 # Get the lessons in the list.
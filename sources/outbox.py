@@ -0,0 +1,180 @@
+"""
+This module contains the outbox of the transactional emails (2FA codes, password recovery...).
+
+The request handlers only store the emails in the mail_outbox table. A background sender
+(a thread of the web process or a separate process: `python outbox.py`) sends them, the most
+urgent first, and retries the failed ones with an exponential backoff.
+
+Imports:
+    - root: For the connection to the database.
+    - sendmails: For building the emails.
+    - mailer: The mail transport of the application.
+    - threading: For running the sender in a thread.
+    - uuid: For identifying the emails claimed by a sender.
+    - time: For waiting between two polls.
+    - logging: For logging errors.
+
+Functions:
+    - enqueue_mail: Store an email in the outbox.
+    - process_outbox: Send the pending emails of the outbox.
+    - run_sender: Send the emails of the outbox forever.
+    - start_sender_thread: Start the sender in a background thread.
+"""
+from root import *
+from sendmails import build_mail
+from mailer import get_transport
+import threading
+import uuid
+import time
+import logging
+
+# Priorities of the emails (the lowest is sent first)
+PRIORITY_2FA = 0
+PRIORITY_RECOVERY = 1
+PRIORITY_DEFAULT = 5
+
+# Number of emails claimed at once by a sender
+BATCH_SIZE = 20
+# Number of seconds between two polls when the outbox is empty
+POLL_INTERVAL = 1
+# Number of attempts before an email is marked as failed
+MAX_ATTEMPTS = 6
+# Delay before the first retry (doubled at each attempt) and maximum delay, in seconds
+RETRY_DELAY = 30
+MAX_RETRY_DELAY = 3600
+# Number of minutes after which an email claimed by a crashed sender is released
+CLAIM_TIMEOUT = 10
+
+
+def enqueue_mail(to, subject, body, priority=PRIORITY_DEFAULT):
+    """
+    Store an email in the outbox.
+
+    Args:
+        to (string): The recipient's email address.
+        subject (string): The subject of the email.
+        body (string): The body of the email.
+        priority (int): The priority of the email (the lowest is sent first).
+
+    Returns:
+        bool: True if the email was stored successfully, False otherwise.
+    """
+    conn = None
+    cursor = None
+    try:
+        conn = create_connection()
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO mail_outbox (priority, recipient, subject, body) VALUES (%s, %s, %s, %s)", (priority, to, subject, body))
+        conn.commit()
+        return True
+    except Exception as e:
+        logging.error(f'Error while storing email in the outbox: {e}')
+        return False
+    finally:
+        if cursor:
+            cursor.close()
+        if conn:
+            conn.close()
+
+
+def process_outbox(batch_size=BATCH_SIZE):
+    """
+    Send the pending emails of the outbox.
+
+    The emails are claimed with a single UPDATE, so several senders can run at the same time
+    without sending an email twice. An email that cannot be built is retried like an email that could not be sent.
+
+    Args:
+        batch_size (int): The maximum number of emails to send.
+
+    Returns:
+        int: The number of emails processed.
+    """
+    conn = None
+    cursor = None
+    try:
+        conn = create_connection()
+        cursor = conn.cursor()
+
+        # Release the emails claimed by a crashed sender and purge the old sent emails
+        cursor.execute("UPDATE mail_outbox SET status = 'pending', claimed_by = NULL WHERE status = 'sending' \
+            AND claimed_at < NOW() - INTERVAL %s MINUTE", (CLAIM_TIMEOUT,))
+        cursor.execute("DELETE FROM mail_outbox WHERE status = 'sent' AND sent_at < NOW() - INTERVAL 7 DAY")
+
+        # Claim the most urgent emails
+        claim = str(uuid.uuid4())
+        cursor.execute("UPDATE mail_outbox SET status = 'sending', claimed_by = %s, claimed_at = NOW() \
+            WHERE status = 'pending' AND next_attempt_at <= NOW() ORDER BY priority, id LIMIT %s", (claim, batch_size))
+        conn.commit()
+        cursor.execute("SELECT id, recipient, subject, body, attempts FROM mail_outbox \
+            WHERE claimed_by = %s AND status = 'sending' ORDER BY priority, id", (claim,))
+        emails = cursor.fetchall()
+        if not emails:
+            return 0
+
+        # Build the emails one by one, so that a bad email does not block the others
+        messages = []
+        built = []
+        for email in emails:
+            try:
+                messages.append(build_mail(email[1], email[2], email[3]))
+                built.append(True)
+            except Exception as e:
+                logging.error(f'Error while building email {email[0]}: {e}')
+                built.append(False)
+
+        # Send the emails over the pool of workers
+        report = get_transport().send_many(messages)
+        results = iter(report["results"])
+
+        for email, is_built in zip(emails, built):
+            sent = is_built and next(results)
+            if sent:
+                # The body may contain a code: do not keep it
+                cursor.execute("UPDATE mail_outbox SET status = 'sent', body = '', sent_at = NOW(), attempts = attempts + 1 WHERE id = %s", (email[0],))
+            elif email[4] + 1 >= MAX_ATTEMPTS:
+                cursor.execute("UPDATE mail_outbox SET status = 'failed', attempts = attempts + 1 WHERE id = %s", (email[0],))
+                logging.error(f'Email {email[0]} to {email[1]} failed after {MAX_ATTEMPTS} attempts')
+            else:
+                delay = min(RETRY_DELAY * 2 ** email[4], MAX_RETRY_DELAY)
+                cursor.execute("UPDATE mail_outbox SET status = 'pending', claimed_by = NULL, attempts = attempts + 1, \
+                    next_attempt_at = NOW() + INTERVAL %s SECOND WHERE id = %s", (delay, email[0]))
+        conn.commit()
+        return len(emails)
+    except Exception as e:
+        logging.error(f'Error while processing the outbox: {e}')
+        return 0
+    finally:
+        if cursor:
+            cursor.close()
+        if conn:
+            conn.close()
+
+
+def run_sender(poll_interval=POLL_INTERVAL):
+    """
+    Send the emails of the outbox forever.
+
+    Args:
+        poll_interval (int): The number of seconds between two polls when the outbox is empty.
+    """
+    while True:
+        if process_outbox() == 0:
+            time.sleep(poll_interval)
+
+
+def start_sender_thread():
+    """
+    Start the sender in a background thread.
+
+    Returns:
+        threading.Thread: The sender thread.
+    """
+    thread = threading.Thread(target=run_sender, name='mail-outbox', daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    run_sender()
@@ -2,20 +2,323 @@
 This module contains the profanity detector function.
 
 The profanity detector function is used to detect the presence of profanity in a text.
+The censored words are loaded once in a matcher, which is reloaded when the file changes.
+The exact words are searched in a single pass with one compiled regular expression.
+The words close to a censored word are searched in an index of the bigrams of the censored words:
+only the censored words that can reach the similarity threshold are compared.
+Batches of texts are normalized once, and the verdict of each word is computed once and kept in a LRU cache.
 
-Imports: 
+Imports:
     - re: For handling regular expressions
+    - math: For the bounds of the similarity search
+    - collections: For counting the bigrams and for the cache of the verdicts
     - Levenshtein: For handling the Levenshtein distance
+    - threading: For protecting the reload of the censored words
+    - time: For limiting the number of modification time checks
     - logging: For logging errors
-    
+
+Classes:
+    - ProfanityMatcher: Detects the censored words in texts
+
 Functions:
+    - normalize: Normalizes a text before the detection
+    - bigrams: Counts the bigrams of a word
+    - get_matcher: Gets the matcher of the censored words file
     - profanity_detector: Detects the presence of profanity in a text
+    - moderate_texts: Detects the presence of profanity in many texts
 """
 import re
+import math
+from collections import Counter, OrderedDict
 import Levenshtein
+import threading
+import time
 import logging
 from root import *
 
+# The file of the censored words (one word or expression per line)
+PROFANITY_FILE = str(os.getenv("DIRECTORY_PATH")) + "static/censored_words.txt"
+# Minimum number of seconds between two modification time checks of the file
+CHECK_INTERVAL = 5
+# Minimum Levenshtein ratio for a word to be considered as profanity
+SIMILARITY_THRESHOLD = 0.85
+# Minimum length of the words compared with the Levenshtein ratio
+SIMILARITY_MIN_LENGTH = 7
+# Maximum number of word verdicts kept in the cache
+VERDICT_CACHE_SIZE = 10000
+
+
+def normalize(text):
+    """
+    Normalizes a text before the detection (lowercase, no punctuation).
+
+    Args:
+        text (str): The text to normalize.
+
+    Returns:
+        str: The normalized text.
+    """
+    return re.sub(r'[^\w\s]', '', text.lower())
+
+
+def bigrams(word):
+    """
+    Counts the bigrams of a word.
+
+    Args:
+        word (str): The word.
+
+    Returns:
+        Counter: The number of occurrences of each bigram.
+    """
+    return Counter(word[i:i + 2] for i in range(len(word) - 1))
+
+
+class ProfanityMatcher:
+    """
+    Detects the censored words in texts.
+
+    The file is read once, the words are compiled into a single regular expression
+    and indexed by bigram and by length. The file is reloaded when its modification time changes.
+    The similarity verdicts of the words are kept in a LRU cache, emptied on reload.
+
+    Attributes:
+        - path: The file of the censored words.
+        - check_interval: The minimum number of seconds between two modification time checks.
+        - cache_size: The maximum number of word verdicts kept in the cache.
+
+    Methods:
+        - refresh: Reloads the censored words if the file has changed.
+        - contains_exact: Checks if a normalized text contains a censored word.
+        - is_similar: Checks if a word is close to a censored word.
+        - is_similar_cached: Checks if a word is close to a censored word, using the cache.
+        - contains_similar: Checks if a normalized text contains a word close to a censored word.
+        - moderate: Detects the presence of profanity in many texts.
+        - detect: Detects the presence of profanity in a text.
+        - get_stats: Gets the counters of the verdict cache.
+    """
+    def __init__(self, path=PROFANITY_FILE, check_interval=CHECK_INTERVAL, cache_size=VERDICT_CACHE_SIZE):
+        self.path = path
+        self.check_interval = check_interval
+        self.cache_size = cache_size
+        # (words, pattern, index, lengths), replaced at once on reload
+        self._data = None
+        self._mtime = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        self._verdicts = OrderedDict()
+        self._verdicts_lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0}
+
+    def _load(self, mtime):
+        """
+        Reads the censored words and compiles them.
+
+        Args:
+            mtime (float): The modification time of the file.
+        """
+        with open(self.path, "r") as f:
+            words = set(normalize(word).strip() for word in f.read().splitlines())
+        # The longest words first, so that an expression wins over one of its words
+        words = sorted((word for word in words if word), key=len, reverse=True)
+        pattern = re.compile(r"\b(?:" + "|".join(re.escape(word) for word in words) + r")\b") if words else None
+        # The positions of the words containing each bigram (with its number of occurrences), and of each length
+        index = {}
+        lengths = {}
+        for position, word in enumerate(words):
+            for bigram, count in bigrams(word).items():
+                index.setdefault(bigram, []).append((position, count))
+            lengths.setdefault(len(word), []).append(position)
+        self._data = (words, pattern, index, lengths)
+        self._mtime = mtime
+        with self._verdicts_lock:
+            self._verdicts.clear()
+
+    def refresh(self):
+        """
+        Reloads the censored words if the file has changed.
+
+        Returns:
+            tuple: The censored words, their compiled regular expression, their bigram index and their length index.
+        """
+        now = time.monotonic()
+        if self._data is not None and now - self._checked < self.check_interval:
+            return self._data
+        with self._lock:
+            if self._data is None or now - self._checked >= self.check_interval:
+                mtime = os.stat(self.path).st_mtime
+                if mtime != self._mtime:
+                    self._load(mtime)
+                self._checked = now
+        return self._data
+
+    def contains_exact(self, text):
+        """
+        Checks if a normalized text contains a censored word.
+
+        Args:
+            text (str): The normalized text.
+
+        Returns:
+            bool: True if the text contains a censored word, False otherwise.
+        """
+        words, pattern, index, lengths = self.refresh()
+        return pattern is not None and pattern.search(text) is not None
+
+    def is_similar(self, word):
+        """
+        Checks if a word is close to a censored word (Levenshtein ratio above the threshold).
+
+        The ratio is 1 - d / (la + lb), with d the number of insertions and deletions between the words.
+        The censored words whose length or number of shared bigrams cannot give such a ratio are skipped,
+        the others are compared starting with the most similar, until the first match.
+
+        Args:
+            word (str): The normalized word.
+
+        Returns:
+            bool: True if the word is close to a censored word, False otherwise.
+        """
+        words, pattern, index, lengths = self.refresh()
+        length = len(word)
+        threshold = SIMILARITY_THRESHOLD
+
+        # Number of bigrams shared with each censored word
+        shared = {}
+        for bigram, count in bigrams(word).items():
+            for position, word_count in index.get(bigram, ()):
+                shared[position] = shared.get(position, 0) + min(count, word_count)
+
+        # Maximum number of edits keeping the ratio above the threshold, and minimum number of shared bigrams
+        # (each edit destroys at most two bigrams of the longest word), for each length of censored word
+        slack = 1 - threshold
+        bounds = {}
+        for other_length in lengths:
+            # d >= |la - lb|, so only the close lengths can reach the threshold
+            if abs(length - other_length) < slack * (length + other_length):
+                edits = math.ceil(slack * (length + other_length)) - 1
+                bounds[other_length] = max(length, other_length) - 1 - 2 * edits
+
+        candidates = [(count, position) for position, count in shared.items()
+                      if count >= bounds.get(len(words[position]), math.inf)]
+        # The words sharing no bigram can only match if the bound allows it
+        for other_length, required in bounds.items():
+            if required <= 0:
+                candidates.extend((0, position) for position in lengths[other_length] if position not in shared)
+
+        # The most similar words first, stop at the first match
+        candidates.sort(reverse=True)
+        for count, position in candidates:
+            if Levenshtein.ratio(words[position], word) > threshold:
+                return True
+        return False
+
+    def is_similar_cached(self, word):
+        """
+        Checks if a word is close to a censored word, using the cache of the verdicts.
+
+        Args:
+            word (str): The normalized word.
+
+        Returns:
+            bool: True if the word is close to a censored word, False otherwise.
+        """
+        self.refresh()
+        with self._verdicts_lock:
+            verdict = self._verdicts.get(word)
+            if verdict is not None:
+                self._verdicts.move_to_end(word)
+                self._stats["hits"] += 1
+                return verdict
+            self._stats["misses"] += 1
+        verdict = self.is_similar(word)
+        with self._verdicts_lock:
+            self._verdicts[word] = verdict
+            if len(self._verdicts) > self.cache_size:
+                self._verdicts.popitem(last=False)
+        return verdict
+
+    def contains_similar(self, text):
+        """
+        Checks if a normalized text contains a long word close to a censored word.
+
+        Args:
+            text (str): The normalized text.
+
+        Returns:
+            bool: True if a word is close to a censored word, False otherwise.
+        """
+        for word in set(text.split()): # For each word in the text
+            if len(word) >= SIMILARITY_MIN_LENGTH and self.is_similar_cached(word):
+                return True
+        return False
+
+    def moderate(self, texts):
+        """
+        Detects the presence of profanity in many texts.
+
+        Each text is normalized once, and each long word of the batch is compared once
+        with the censored words, whatever the number of texts containing it.
+
+        Args:
+            texts (list): The texts to analyze.
+
+        Returns:
+            list: True for each text containing profanity, False otherwise.
+        """
+        texts = [normalize(text) for text in texts]
+        verdicts = [self.contains_exact(text) for text in texts]
+
+        # The long words of the texts without exact match
+        texts_words = [set() if verdict else set(word for word in text.split() if len(word) >= SIMILARITY_MIN_LENGTH)
+                       for text, verdict in zip(texts, verdicts)]
+        similar = {word: self.is_similar_cached(word) for word in set().union(*texts_words)}
+
+        return [verdict or any(similar[word] for word in words) for verdict, words in zip(verdicts, texts_words)]
+
+    def detect(self, text):
+        """
+        Detects the presence of profanity in a text.
+
+        Args:
+            text (str): The text to analyze.
+
+        Returns:
+            bool: True if the text contains profanity, False otherwise.
+        """
+        text = normalize(text)
+        return self.contains_exact(text) or self.contains_similar(text)
+
+    def get_stats(self):
+        """
+        Gets the counters of the verdict cache since the start of the process.
+
+        Returns:
+            dict: The counters of the cache.
+                - hits (int): The number of verdicts found in the cache.
+                - misses (int): The number of verdicts computed.
+                - size (int): The number of verdicts in the cache.
+        """
+        with self._verdicts_lock:
+            return dict(self._stats, size=len(self._verdicts))
+
+
+_matcher = None
+_matcher_lock = threading.Lock()
+
+def get_matcher():
+    """
+    Gets the matcher of the censored words file.
+
+    Returns:
+        ProfanityMatcher: The matcher, created on the first call.
+    """
+    global _matcher
+    with _matcher_lock:
+        if _matcher is None:
+            _matcher = ProfanityMatcher()
+        return _matcher
+
 
 def profanity_detector(text):
     """
@@ -28,34 +331,24 @@ def profanity_detector(text):
         bool: True if the text contains profanity, False otherwise.
     """
     try:
-        # Load the profanity file
-        with open(str(os.getenv("DIRECTORY_PATH")) + "static/censored_words.txt", "r") as f:
-            profanity_words = f.read().splitlines()
+        return get_matcher().detect(text)
+    except Exception as e:
+        logging.error(f"An error occurred while detecting profanity: {e}")
+        return False
 
-        # Convert the text to lowercase and remove accents
-        text = text.lower()
-        text = re.sub(r'[^\w\s]', '', text)
 
-        # Search for profanity in the text
-        for word in profanity_words:
-            if re.search(r"\b"+word+r"\b", text):
-                return True
+def moderate_texts(texts):
+    """
+    Detects the presence of profanity in many texts (the fields of a form, the words of an import...).
 
-        # If no profanity is found, compare the words with the profanity words
-        profanity_coef = []
-        for word in text.split(" "): # For each word in the text
-            if len(word) > 6:
-                for profanity_word in profanity_words: # For each profanity word
-                    # Calculate the Levenshtein distance between the word and the profanity word
-                    profanity_coef.append([profanity_word, Levenshtein.ratio(profanity_word, word)])
-        
-        # Sort the profanity words by the Levenshtein distance
-        profanity_coef = sorted(profanity_coef, key=lambda x: x[1], reverse=True)
-        if profanity_coef:
-            # If the Levenshtein distance is greater than 0.7, the word is considered as profanity
-            return True if profanity_coef[0][1] > 0.85 else False
-        else:
-            return False
+    Args:
+        texts (list): The texts to analyze.
+
+    Returns:
+        list: True for each text containing profanity, False otherwise.
+    """
+    try:
+        return get_matcher().moderate(texts)
     except Exception as e:
         logging.error(f"An error occurred while detecting profanity: {e}")
-        return False
\ No newline at end of file
+        return [False] * len(texts)
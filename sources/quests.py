@@ -9,6 +9,7 @@ Imports:
     - logging: For logging errors.
     - datetime: For manipulating dates and times.
     - locale: For formatting numbers and dates.
+    - targets: For getting the user's daily targets.
 
 Blueprints:
     - quests_bp: The blueprint for the quests routes.
@@ -21,6 +22,7 @@ import random as random
 import logging as logging
 from datetime import datetime, timedelta
 import locale
+from targets import get_targets
 
 quests_bp = Blueprint('quests', __name__)
 """
@@ -54,16 +56,7 @@ def quests():
         cursor = conn.cursor()
         
         # Get the user's targets
-        lists = current_user.get_lists()
-        current_date = datetime.now().date()
-        cursor.execute("SELECT lesson_id FROM lessons_log WHERE user_id = %s GROUP BY lesson_id HAVING DATE(MIN(created_at)) = %s;" , (current_user.id, current_date))
-        list_finished_today = cursor.fetchall()
-        list_finished_today = [lst[0] for lst in list_finished_today]
-        for lst in lists:
-            if not all(lesson["completed"] == 1 for lesson in lst["lessons"]) or any(lesson["id"] in list_finished_today for lesson in lst["lessons"]):
-                targets["games"] += lst["tgt_games"]
-                targets["xp"] += lst["tgt_xp"]
-                targets["time"] += lst["tgt_time"]
+        targets = get_targets(cursor, current_user.id)
         
         # Check if there are targets
         is_there_targets = targets["games"] != 0 or targets["xp"] != 0 or targets["time"] != 0
@@ -201,17 +194,7 @@ def reward():
             return redirect(url_for('quests.quests'))
         else:
             # Check if the user has completed his targets
-            targets = {"games": 0, "xp": 0,"time": 0}
-            lists = current_user.get_lists()
-            current_date = datetime.now().date()
-            cursor.execute("SELECT lesson_id FROM lessons_log WHERE user_id = %s GROUP BY lesson_id HAVING DATE(MIN(created_at)) = %s;" , (current_user.id, current_date))
-            list_finished_today = cursor.fetchall()
-            list_finished_today = [lst[0] for lst in list_finished_today]
-            for lst in lists:
-                if not all(lesson["completed"] == 1 for lesson in lst["lessons"]) or any(lesson["id"] in list_finished_today for lesson in lst["lessons"]):
-                    targets["games"] += lst["tgt_games"]
-                    targets["xp"] += lst["tgt_xp"]
-                    targets["time"] += lst["tgt_time"]
+            targets = get_targets(cursor, current_user.id)
 
             cursor.execute("SELECT COUNT(*), SUM(xp), SUM(time) FROM lessons_log WHERE user_id = %s AND DATE(created_at) = CURDATE()", (current_user.id,))
             result = cursor.fetchall()
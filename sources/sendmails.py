@@ -1,27 +1,28 @@
 """ 
-This module contains the send_mail function for the application.
+This module contains the build_mail and send_mail functions for the application.
 
 Imports:
-    - smtplib: SMTP protocol client.
     - MIMEText: Class for generating plain text email messages.
     - MIMEMultipart: Class for generating multipart email messages.
-    - MIMEImage: Class for generating image email messages.
     - os: Miscellaneous operating system interfaces.
+    - mailer: The mail transport of the application.
+    - mail_assets: The cache of the images attached to the emails.
 
 Functions:
+    - build_mail: Build an email.
     - send_mail: Send an email.
 """
-import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from email.mime.image import MIMEImage
 from root import *
 import logging
 import os
+from mailer import get_transport
+from mail_assets import get_image
 
-def send_mail(to, subject, body):
+def build_mail(to, subject, body):
     """
-    Send an email.
+    Build an email.
 
     Args:
         to (string): The recipient's email address.
@@ -29,7 +30,7 @@ def send_mail(to, subject, body):
         body (string): The body of the email.
 
     Returns:
-        bool: True if the email was sent successfully, False otherwise.
+        email.mime.multipart.MIMEMultipart: The email message.
     """
     
     # Create the email message
@@ -41,25 +42,30 @@ def send_mail(to, subject, body):
     # Attach the body to the message
     mess.attach(MIMEText(body, 'html'))
     
-    with open(str(os.getenv("DIRECTORY_PATH")) + 'static/imgs/app-main-logo.png', 'rb') as fp:
-        img = MIMEImage(fp.read())
-        img.add_header('Content-ID', '<{}>'.format('app-main-logo'))
-        mess.attach(img)
+    # Attach the logo (read and encoded once for all the emails)
+    mess.attach(get_image(str(os.getenv("DIRECTORY_PATH")) + 'static/imgs/app-main-logo.png', 'app-main-logo'))
+
+    return mess
+
+
+def send_mail(to, subject, body):
+    """
+    Send an email.
 
-    server = None
+    Args:
+        to (string): The recipient's email address.
+        subject (string): The subject of the email.
+        body (string): The body of the email.
+
+    Returns:
+        bool: True if the email was sent successfully, False otherwise.
+    """
     try:
-        # Send the email
-        server = smtplib.SMTP('smtp.ionos.fr', 587)
-        server.starttls()
-        server.login('no-reply@word-quest.com', os.environ.get('EMAILING_SERVICE_PASSWORD'))
-        server.sendmail(mess['From'], mess['To'], mess.as_string())
-        return True    
+        mess = build_mail(to, subject, body)
     except Exception as e:
-        logging.error(f'Error sending email: {e}')
+        logging.error(f'Error building email: {e}')
         return False
-    finally:
-        if server:
-            server.quit()
+    return get_transport().send(mess)
 
 # Example usage
 # to_address = 'recipient@example.com'
@@ -25,6 +25,10 @@ async function play(element) {
     audio.onended = () => {
         audio_el.classList.remove('active');
     }
+    // The audio is unavailable (TTS service down): skip it
+    audio.onerror = () => {
+        audio_el.classList.remove('active');
+    }
 }
 window.onload = () => {
     if (document.getElementById('audio-container')) {
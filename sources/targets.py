@@ -0,0 +1,71 @@
+"""
+This module contains the functions to maintain the users' daily targets.
+
+The daily targets of a user are the sum of the targets of his lists that are not finished yet,
+or that have been finished today. They are stored in the user_targets table and recomputed only
+when a list is created, updated, deleted or when a lesson is completed (and once a day, since a
+list finished yesterday no longer counts).
+
+Imports:
+    - datetime: For handling the current date.
+
+Functions:
+    - refresh_targets: Recompute and store the user's daily targets.
+    - get_targets: Get the user's daily targets.
+"""
+from datetime import datetime
+
+
+def refresh_targets(cursor, user_id):
+    """
+    Recompute and store the user's daily targets.
+
+    A list counts in the targets if one of its lessons is not completed yet, or if one of its
+    lessons has been played for the first time today.
+
+    Args:
+        cursor (mysql.connector.cursor.MySQLCursor): The cursor to use.
+        user_id (int): The ID of the user.
+
+    Returns:
+        dict: The user's daily targets.
+            - games (int): The number of games to play.
+            - xp (int): The experience points to earn.
+            - time (int): The time to spend (in minutes).
+    """
+    current_date = datetime.now().date()
+    cursor.execute("SELECT COALESCE(SUM(l.tgt_games), 0), COALESCE(SUM(l.tgt_xp), 0), COALESCE(SUM(l.tgt_time), 0) FROM lists l \
+        WHERE l.user_id = %s AND (EXISTS (SELECT 1 FROM lessons le WHERE le.list_id = l.id AND le.completed = 0) \
+        OR EXISTS (SELECT 1 FROM lessons le WHERE le.list_id = l.id AND le.id IN (SELECT lesson_id FROM lessons_log \
+        WHERE user_id = %s GROUP BY lesson_id HAVING DATE(MIN(created_at)) = %s)));", (user_id, user_id, current_date))
+    result = cursor.fetchone()
+    targets = {"games": int(result[0]), "xp": int(result[1]), "time": int(result[2])}
+
+    # Store the targets
+    cursor.execute("INSERT INTO user_targets (user_id, tgt_games, tgt_xp, tgt_time, computed_on) VALUES (%s, %s, %s, %s, %s) \
+        ON DUPLICATE KEY UPDATE tgt_games = VALUES(tgt_games), tgt_xp = VALUES(tgt_xp), tgt_time = VALUES(tgt_time), computed_on = VALUES(computed_on);",
+        (user_id, targets["games"], targets["xp"], targets["time"], current_date))
+    return targets
+
+
+def get_targets(cursor, user_id):
+    """
+    Get the user's daily targets.
+
+    The stored targets are used if they have been computed today, otherwise they are recomputed.
+
+    Args:
+        cursor (mysql.connector.cursor.MySQLCursor): The cursor to use.
+        user_id (int): The ID of the user.
+
+    Returns:
+        dict: The user's daily targets.
+            - games (int): The number of games to play.
+            - xp (int): The experience points to earn.
+            - time (int): The time to spend (in minutes).
+    """
+    cursor.execute("SELECT tgt_games, tgt_xp, tgt_time, computed_on FROM user_targets WHERE user_id = %s", (user_id,))
+    result = cursor.fetchone()
+    if not result or result[3] != datetime.now().date():
+        return refresh_targets(cursor, user_id)
+    return {"games": result[0], "xp": result[1], "time": result[2]}
@@ -0,0 +1,242 @@
+"""
+This module contains the cache of the audio of the games (generated with gTTS).
+
+Each audio is synthesized once and stored on disk under the hash of its text and language,
+so the replays and the reloads of the pages do not call gTTS again.
+    - the audio files are stored in TTS_CACHE_DIR,
+    - the cache is limited to TTS_CACHE_SIZE megabytes, the least recently used files are deleted first,
+    - the concurrent requests for the same text wait for a single synthesis,
+    - the audio is served with an ETag, so the browsers revalidate it instead of downloading it again.
+
+Imports:
+    - flask: For serving the audio.
+    - root: For the environment variables.
+    - metrics: For exposing the counters of the cache.
+    - gTTS: For generating audio from text.
+    - http_client: For the timeouts and the circuit breaker of the TTS service.
+    - hashlib: For the names of the files.
+    - threading: For synthesizing each audio once.
+    - logging: For logging errors.
+
+Functions:
+    - audio_key: Get the key of an audio.
+    - is_cached: Check if an audio is in the cache.
+    - get_audio: Get the file of an audio, synthesizing it if necessary.
+    - send_audio: Get the response of an audio.
+    - evict: Delete the least recently used audio files if the cache is full.
+    - get_stats: Get the counters of the cache.
+"""
+from flask import request, send_file, make_response
+from root import *
+from metrics import register_metrics
+from gtts import gTTS
+import http_client
+import hashlib
+import threading
+import logging
+
+# The directory of the audio files
+TTS_CACHE_DIR = os.getenv('TTS_CACHE_DIR', '/tmp/word_quest_audio')
+# Maximum size of the cache in megabytes
+TTS_CACHE_SIZE = int(os.getenv('TTS_CACHE_SIZE', 100))
+# Number of new audio files between two evictions
+EVICTION_INTERVAL = 50
+
+_stats = {"hits": 0, "misses": 0, "coalesced": 0, "not_modified": 0, "errors": 0, "evicted": 0}
+_stored = 0
+_lock = threading.Lock()
+# The locks of the audio being synthesized
+_syntheses = {}
+
+
+def _count(counter, value=1):
+    with _lock:
+        _stats[counter] += value
+
+
+def audio_key(text, lang='en'):
+    """
+    Get the key of an audio.
+
+    Args:
+        text (string): The text of the audio.
+        lang (string): The language of the audio.
+
+    Returns:
+        string: The key of the audio (the hash of its language and text).
+    """
+    return hashlib.sha256((lang + '\0' + text).encode('utf-8')).hexdigest()
+
+
+def _audio_path(key):
+    return os.path.join(TTS_CACHE_DIR, key + '.mp3')
+
+
+def is_cached(text, lang='en'):
+    """
+    Check if an audio is in the cache.
+
+    Args:
+        text (string): The text of the audio.
+        lang (string): The language of the audio.
+
+    Returns:
+        bool: True if the audio has already been synthesized.
+    """
+    return os.path.exists(_audio_path(audio_key(text, lang)))
+
+
+def _synthesize(text, lang, f):
+    """
+    Synthesize an audio with gTTS, through the circuit breaker of the TTS service.
+
+    Args:
+        text (string): The text of the audio.
+        lang (string): The language of the audio.
+        f (file): The file where the audio is written.
+
+    Raises:
+        gTTSError: If the TTS service did not return audio.
+        CircuitOpenError: If the circuit breaker of the TTS service is open.
+    """
+    tts = gTTS(text, lang=lang, timeout=http_client.get_timeout("tts"))
+    http_client.guard("tts", tts.write_to_fp, f)
+
+
+def get_audio(text, lang='en'):
+    """
+    Get the file of an audio, synthesizing it if necessary.
+
+    The audio is synthesized once, even if several requests ask for it at the same time.
+
+    Args:
+        text (string): The text of the audio.
+        lang (string): The language of the audio.
+
+    Returns:
+        string: The path of the audio file.
+
+    Raises:
+        Exception: If gTTS could not synthesize the audio.
+    """
+    global _stored
+    key = audio_key(text, lang)
+    path = _audio_path(key)
+    with _lock:
+        waiting = key in _syntheses
+        key_lock = _syntheses.setdefault(key, threading.Lock())
+    try:
+        with key_lock:
+            try:
+                # Mark the file as recently used
+                os.utime(path)
+                _count("coalesced" if waiting else "hits")
+                return path
+            except OSError:
+                pass
+
+            _count("misses")
+            tmp_path = path + '.' + str(threading.get_ident()) + '.tmp'
+            try:
+                os.makedirs(TTS_CACHE_DIR, exist_ok=True)
+                with open(tmp_path, 'wb') as f:
+                    _synthesize(text, lang, f)
+                os.replace(tmp_path, path)
+            except Exception:
+                _count("errors")
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                raise
+    finally:
+        with _lock:
+            if _syntheses.get(key) is key_lock:
+                del _syntheses[key]
+
+    with _lock:
+        _stored += 1
+        check = _stored % EVICTION_INTERVAL == 0
+    if check:
+        evict()
+    return path
+
+
+def send_audio(text, lang='en'):
+    """
+    Get the response of an audio.
+
+    The response has an ETag (the key of the audio), so a browser replaying the same audio
+    gets a 304 response without the audio being read or synthesized.
+
+    Args:
+        text (string): The text of the audio.
+        lang (string): The language of the audio.
+
+    Returns:
+        flask.Response: The audio, or an empty 304 response if the browser already has it.
+    """
+    key = audio_key(text, lang)
+    if key in request.if_none_match:
+        _count("not_modified")
+        response = make_response('', 304)
+    else:
+        response = send_file(get_audio(text, lang), mimetype='audio/mpeg', etag=key, conditional=True)
+    response.set_etag(key)
+    # The URL of the audio of a game changes of content with the questions, so it is always revalidated
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def evict():
+    """
+    Delete the least recently used audio files if the cache is full (until it is 90% full).
+    """
+    try:
+        files = []
+        for entry in os.scandir(TTS_CACHE_DIR):
+            if entry.is_file() and entry.name.endswith('.mp3'):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for mtime, size, path in files)
+        limit = TTS_CACHE_SIZE * 1024 * 1024
+        if total <= limit:
+            return
+
+        evicted = 0
+        for mtime, size, path in sorted(files):
+            if total <= limit * 0.9:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                evicted += 1
+            except OSError:
+                pass
+        _count("evicted", evicted)
+    except OSError as e:
+        logging.error(f"Error while cleaning the audio cache: {e}")
+
+
+def get_stats():
+    """
+    Get the counters of the cache since the start of the process.
+
+    Returns:
+        dict: The counters of the cache.
+            - hits (int): The number of audio files found in the cache.
+            - misses (int): The number of audio files synthesized.
+            - coalesced (int): The number of requests that waited for the synthesis of another request.
+            - not_modified (int): The number of audio already in the cache of the browser.
+            - errors (int): The number of syntheses that failed.
+            - evicted (int): The number of audio files deleted from the cache.
+            - hit_rate (float): The proportion of requests answered without synthesis.
+    """
+    with _lock:
+        stats = dict(_stats)
+    total = stats["hits"] + stats["coalesced"] + stats["not_modified"] + stats["misses"]
+    stats["hit_rate"] = round((total - stats["misses"]) / total, 3) if total else 0.0
+    return stats
+
+
+register_metrics("tts_cache", get_stats)
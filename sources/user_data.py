@@ -13,7 +13,7 @@ Imports:
     - bcrypt: For hashing the password.
     - pyotp: For handling the two-factor authentication.
     - time: For handling the time.
-    - send_mail: For sending emails.
+    - outbox: For sending emails in the background.
     - logging: For logging errors.
     
 Blueprints:
@@ -33,7 +33,7 @@ import pyotp
 import time
 import logging
 
-from sendmails import send_mail
+from outbox import enqueue_mail, PRIORITY_2FA
 
 user_data_bp = Blueprint('user_data', __name__)
 """
@@ -670,7 +670,8 @@ def change_user_infos():
                     
                     # Send the verification code to the user's email.
                     html = render_template('emails/2fa.html', name=name, code=totp.now())
-                    send_mail(email, "Code de vérification - WORD QUEST", html)
+                    if not enqueue_mail(email, "Code de vérification - WORD QUEST", html, PRIORITY_2FA):
+                        logging.error("The 2FA code email could not be stored in the outbox")
                     return jsonify({
                         "code": 201,
                         "message": "Un code de vérification a été envoyé à votre adresse mail."
@@ -832,6 +833,7 @@ def delete_account():
         cursor.execute("DELETE FROM user_statements WHERE user_id = %s;", (current_user.id,))
         cursor.execute("DELETE FROM lessons_log WHERE user_id = %s;", (current_user.id,))
         cursor.execute("DELETE FROM rewards WHERE user_id = %s;", (current_user.id,))
+        cursor.execute("DELETE FROM user_targets WHERE user_id = %s;", (current_user.id,))
         for list in current_user.get_lists():
             cursor.execute("DELETE FROM list_content WHERE list_id = %s;", (list["id"],))
             cursor.execute("DELETE FROM lessons WHERE list_id = %s;", (list["id"],))
@@ -23,6 +23,41 @@ SET time_zone = "+00:00";
 
 -- --------------------------------------------------------
 
+--
+-- Table structure for table `dictionary_cache`
+--
+
+DROP TABLE IF EXISTS `dictionary_cache`;
+CREATE TABLE IF NOT EXISTS `dictionary_cache` (
+  `direction` varchar(20) NOT NULL,
+  `word` varchar(100) NOT NULL,
+  `senses` mediumtext NOT NULL,
+  `latency` float NOT NULL DEFAULT '0',
+  `expires_at` datetime NOT NULL,
+  `created_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`direction`,`word`),
+  KEY `EXPIRES_AT` (`expires_at`)
+) ENGINE=MyISAM DEFAULT CHARSET=utf8mb4  ;
+
+-- --------------------------------------------------------
+
+--
+-- Table structure for table `image_cache`
+--
+
+DROP TABLE IF EXISTS `image_cache`;
+CREATE TABLE IF NOT EXISTS `image_cache` (
+  `word` varchar(100) NOT NULL,
+  `url` varchar(2048) DEFAULT NULL,
+  `expires_at` datetime NOT NULL,
+  `last_used_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  `created_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`word`),
+  KEY `LAST_USED_AT` (`last_used_at`)
+) ENGINE=MyISAM DEFAULT CHARSET=utf8mb4  ;
+
+-- --------------------------------------------------------
+
 --
 -- Table structure for table `lessons`
 --
@@ -538,6 +573,8 @@ CREATE TABLE IF NOT EXISTS `list_content` (
   `examples` varchar(2500) CHARACTER SET latin1 COLLATE latin1_swedish_ci NOT NULL,
   `trans_word` varchar(100) NOT NULL,
   `trans_examples` varchar(2500) CHARACTER SET latin1 COLLATE latin1_swedish_ci NOT NULL,
+  `distractors` varchar(2500) CHARACTER SET latin1 COLLATE latin1_swedish_ci DEFAULT NULL,
+  `trans_distractors` varchar(2500) CHARACTER SET latin1 COLLATE latin1_swedish_ci DEFAULT NULL,
   PRIMARY KEY (`id`)
 ) ENGINE=MyISAM AUTO_INCREMENT=478 DEFAULT CHARSET=latin1;
 
@@ -1037,6 +1074,73 @@ CREATE TABLE IF NOT EXISTS `list_likes` (
 
 -- --------------------------------------------------------
 
+--
+-- Table structure for table `mail_outbox`
+--
+
+DROP TABLE IF EXISTS `mail_outbox`;
+CREATE TABLE IF NOT EXISTS `mail_outbox` (
+  `id` int NOT NULL AUTO_INCREMENT,
+  `priority` tinyint NOT NULL DEFAULT '5',
+  `recipient` varchar(500) NOT NULL,
+  `subject` varchar(200) NOT NULL,
+  `body` mediumtext NOT NULL,
+  `status` varchar(10) NOT NULL DEFAULT 'pending',
+  `attempts` int NOT NULL DEFAULT '0',
+  `next_attempt_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  `claimed_by` varchar(36) DEFAULT NULL,
+  `claimed_at` datetime DEFAULT NULL,
+  `sent_at` datetime DEFAULT NULL,
+  `created_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`id`),
+  KEY `STATUS` (`status`, `priority`, `next_attempt_at`),
+  KEY `CLAIMED_BY` (`claimed_by`)
+) ENGINE=MyISAM DEFAULT CHARSET=utf8mb4  ;
+
+-- --------------------------------------------------------
+
+--
+-- Table structure for table `reminder_deliveries`
+--
+
+DROP TABLE IF EXISTS `reminder_deliveries`;
+CREATE TABLE IF NOT EXISTS `reminder_deliveries` (
+  `run_id` int NOT NULL,
+  `user_id` int NOT NULL,
+  `status` varchar(10) NOT NULL DEFAULT 'sent',
+  `created_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`run_id`, `user_id`)
+) ENGINE=MyISAM DEFAULT CHARSET=utf8mb4  ;
+
+-- --------------------------------------------------------
+
+--
+-- Table structure for table `reminder_runs`
+--
+
+DROP TABLE IF EXISTS `reminder_runs`;
+CREATE TABLE IF NOT EXISTS `reminder_runs` (
+  `id` int NOT NULL AUTO_INCREMENT,
+  `run_date` date NOT NULL,
+  `status` varchar(10) NOT NULL DEFAULT 'queued',
+  `slots` int NOT NULL DEFAULT '1',
+  `last_slot` int NOT NULL DEFAULT '0',
+  `last_user_id` int NOT NULL DEFAULT '0',
+  `total_users` int NOT NULL DEFAULT '0',
+  `processed_users` int NOT NULL DEFAULT '0',
+  `sent` int NOT NULL DEFAULT '0',
+  `failed` int NOT NULL DEFAULT '0',
+  `claim_token` varchar(36) DEFAULT NULL,
+  `started_at` datetime DEFAULT NULL,
+  `heartbeat_at` datetime DEFAULT NULL,
+  `finished_at` datetime DEFAULT NULL,
+  `created_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `RUN_DATE` (`run_date`)
+) ENGINE=MyISAM DEFAULT CHARSET=utf8mb4  ;
+
+-- --------------------------------------------------------
+
 --
 -- Table structure for table `rewards`
 --
@@ -1715,6 +1819,23 @@ INSERT INTO user_statements (id, user_id, transaction_type, transaction) VALUES
 (98, 49, 'xp', 2000),
 (99, 50, 'gems', 4000),
 (100, 50, 'xp', 1900);
+
+-- --------------------------------------------------------
+
+--
+-- Table structure for table `user_targets`
+--
+
+DROP TABLE IF EXISTS `user_targets`;
+CREATE TABLE IF NOT EXISTS `user_targets` (
+  `user_id` int NOT NULL,
+  `tgt_games` int NOT NULL DEFAULT '0',
+  `tgt_xp` int NOT NULL DEFAULT '0',
+  `tgt_time` int NOT NULL DEFAULT '0',
+  `computed_on` date NOT NULL,
+  `updated_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`user_id`)
+) ENGINE=MyISAM DEFAULT CHARSET=utf8mb4  ;
 COMMIT;
 
 /*!40101 SET CHARACTER_SET_CLIENT=@OLD_CHARACTER_SET_CLIENT */;